@@ -0,0 +1,155 @@
+from __future__ import print_function
+import io
+import os
+import time
+import pickle
+import sqlite3
+import hashlib
+
+
+"""Module that provides an on disk cache for parsed configurations.
+
+   Most configurations do not change between two runs. The ParseCache stores
+   the parsed objects in a SQLite database, an unchanged file is loaded from
+   the database instead of being parsed again.
+
+   >>> cache = ParseCache('parse_cache.sqlite')
+   >>> routers = read_files_to_objects(ROUTER_DIR, MPLSRouter, id='hostname', cache=cache)
+"""
+
+
+def _describe(function):
+    """Returns a stable description of a type conversion function, e.g. int or a lambda"""
+    code = getattr(function, '__code__', None)
+    if code is None:
+        return getattr(function, '__name__', repr(function))
+    consts = [c for c in code.co_consts if not hasattr(c, 'co_code')]
+    return repr((code.co_code, consts, code.co_names))
+
+
+def parser_fingerprint(cls):
+    """Returns a hash of the parser definition of a RegexStructure class.
+
+    The hash changes if the _single_attributes, the children or the
+    _parser_version of the class or one of its children change.
+    """
+    parts = [cls.__module__, cls.__name__, str(cls._parser_version)]
+    for name, (regex, result_type) in sorted(cls._single_attributes.items()):
+        parts.append(' '.join([name, regex, _describe(result_type)]))
+    for children in (cls._multiple_children, cls._single_children):
+        for name, (key, result_type) in sorted(children.items()):
+            parts.append(' '.join([name, key, parser_fingerprint(result_type)]))
+    return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+class ParseCache(object):
+    """Cache of parsed objects in a SQLite database.
+
+       An object is stored per (file path, parser class) together with the sha1
+       of the file content and the parser_fingerprint of the class. It is only
+       loaded if both are unchanged.
+
+       - filename is the SQLite database, it is created if it does not exist.
+       - max_bytes is the maximum size of the stored objects, the least recently
+         used objects are removed if the cache grows larger.
+
+       The cache can be passed to worker processes, every process opens its own
+       connection to the database.
+       The connection is not bound to the thread that opened it, e.g. the
+       InventoryService refreshes in a background thread, but it should not be
+       used by two threads at the same time.
+    """
+
+    def __init__(self, filename, max_bytes=1 << 30):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+
+    def __getstate__(self):
+        return {'filename': self.filename, 'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state['filename'], state['max_bytes'])
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            connection = sqlite3.connect(self.filename, timeout=60, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS objects ('
+                               'path TEXT, parser TEXT, digest TEXT, fingerprint TEXT, '
+                               'size INTEGER, last_used REAL, data BLOB, '
+                               'PRIMARY KEY (path, parser))')
+            connection.execute('CREATE INDEX IF NOT EXISTS objects_last_used ON objects (last_used)')
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def load(self, cls, filename):
+        """Returns the object of class cls for the file, parses the file if it is not cached.
+
+        The result is the same as cls.load, None is returned for files with less than 2 lines."""
+        if not os.path.isfile(filename):
+            return None
+        with open(filename, 'rb') as fp:
+            data = fp.read()
+        path = os.path.abspath(filename)
+        parser = cls.__module__ + '.' + cls.__name__
+        digest = hashlib.sha1(data).hexdigest()
+        fingerprint = parser_fingerprint(cls)
+
+        row = self.connection.execute('SELECT data FROM objects WHERE path=? AND parser=? '
+                                      'AND digest=? AND fingerprint=?',
+                                      (path, parser, digest, fingerprint)).fetchone()
+        if row:
+            self.hits += 1
+            with self.connection:
+                self.connection.execute('UPDATE objects SET last_used=? WHERE path=? AND parser=?',
+                                        (time.time(), path, parser))
+            return pickle.loads(row[0])
+
+        self.misses += 1
+        # split the lines as open() does in RegexStructure.load, str.splitlines also splits on \x0c etc.
+        lines = io.StringIO(data.decode('utf-8', 'replace'), newline=None).readlines()
+        result = cls.from_lines(lines)
+        if result is not None:
+            blob = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+            with self.connection:
+                self.connection.execute('INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                        (path, parser, digest, fingerprint, len(blob),
+                                         time.time(), sqlite3.Binary(blob)))
+            self._evict()
+        return result
+
+    def _evict(self):
+        """Removes the least recently used objects until the cache fits in max_bytes"""
+        total = self.size()
+        if total <= self.max_bytes:
+            return
+        rows = self.connection.execute('SELECT path, parser, size FROM objects '
+                                       'ORDER BY last_used').fetchall()
+        with self.connection:
+            for path, parser, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self.connection.execute('DELETE FROM objects WHERE path=? AND parser=?', (path, parser))
+                total -= size
+
+    def size(self):
+        """Returns the total size in bytes of the stored objects"""
+        return self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM objects').fetchone()[0]
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM objects').fetchone()[0]
+
+    def clear(self):
+        with self.connection:
+            self.connection.execute('DELETE FROM objects')
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,244 @@
+from __future__ import print_function
+import os
+import re
+import asyncio
+from MPLSinventory.telnet import ShowVersion, ShowIPInterfacesBrief, ShowIPBGPSum, ShowStandby, ShowInventory
+
+
+"""Module that collects the outputs of the show commands from many devices at once.
+
+   The Collector logs in to the devices concurrently with asyncio and writes
+   the outputs in the directory structure of ParseShowCommand.load:
+
+   +- telnet
+   |   +-- version
+   |   |   +-- 192.168.0.92.txt
+   |   +-- int
+   |       +-- 192.168.0.92.txt
+
+   >>> transport = functools.partial(TelnetTransport, username='user', password='secret')
+   >>> collector = Collector('telnet', transport=transport, concurrency=200, timeout=60)
+   >>> errors = collector.run(['192.168.0.92', '192.168.1.92'])
+   >>> store = TelnetStateStore('telnet')
+
+   The transport is pluggable: any callable that returns an object with the
+   coroutines connect(), run(command) and close() and the attribute hostname
+   for an ip can be used, e.g. for ssh.
+
+   The collector requires Python 3.7 or later.
+"""
+
+
+SHOW_COMMANDS = (ShowVersion, ShowIPInterfacesBrief, ShowIPBGPSum, ShowStandby, ShowInventory)
+
+IAC, DONT, DO, WONT, WILL, SB, SE = 255, 254, 253, 252, 251, 250, 240
+
+
+class TransportError(Exception):
+    pass
+
+
+class TelnetTransport(object):
+    """Executes cli commands on a Cisco device over telnet.
+
+        - ip is the address of the device, host and port can be used to connect
+          to another address, e.g. a terminal server or a test server
+        - username and password are sent when the device asks for them
+        - prompt is the regex for the cli prompt, the hostname is the first group
+
+        After the login the prompt is anchored to the hostname, an output line
+        that ends with '#' or '>' does not end the output. All telnet options
+        are refused, the device then uses a plain line based session.
+        'terminal length 0' disables the paging of outputs.
+    """
+
+    prompt = r'(?:^|\n)([\w.\-/:]+)[#>]\s*$'
+    login_prompts = {'username': r'(?i)(?:username|login):\s*$',
+                     'password': r'(?i)password:\s*$'}
+
+    def __init__(self, ip, host=None, port=23, username=None, password=None, prompt=None,
+                 encoding='utf-8'):
+        self.ip = str(ip)
+        self.host = host or self.ip
+        self.port = port
+        self.username = username
+        self.password = password
+        self.encoding = encoding
+        self.hostname = ''
+        self._prompt = re.compile(prompt or self.prompt)
+        self._login_prompts = dict((name, re.compile(regex)) for name, regex in self.login_prompts.items())
+        self._reader = None
+        self._writer = None
+        self._pending = b''
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        sent = set()
+        while True:
+            text = await self._read_until(self._prompt, *self._login_prompts.values())
+            match = self._prompt.search(text)
+            if match:
+                self.hostname = match.group(1)
+                self._prompt = re.compile(r'(?:^|\n)({})[#>]\s*$'.format(re.escape(self.hostname)))
+                break
+            for name in ('username', 'password'):
+                if self._login_prompts[name].search(text):
+                    if name in sent:
+                        raise TransportError('login failed on {}'.format(self.ip))
+                    sent.add(name)
+                    await self._send(getattr(self, name) or '')
+        await self.run('terminal length 0')
+
+    async def run(self, command):
+        """Executes the command, returns the output without the echoed command and the prompt"""
+        await self._send(command)
+        text = await self._read_until(self._prompt)
+        match = self._prompt.search(text)
+        lines = text[:match.start()].replace('\r', '').split('\n')
+        if lines and lines[0].strip() == command:
+            lines = lines[1:]
+        return '\n'.join(lines).strip('\n')
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (OSError, AttributeError):
+                pass
+            self._writer = None
+
+    async def _send(self, line):
+        self._writer.write(line.encode(self.encoding) + b'\r\n')
+        await self._writer.drain()
+
+    async def _read_until(self, *regexes):
+        """Reads from the device until the text ends with one of the regexes, returns the text"""
+        data = b''
+        while True:
+            chunk = await self._reader.read(4096)
+            if not chunk:
+                raise TransportError('connection closed by {}'.format(self.ip))
+            data += self._negotiate(chunk)
+            text = data.decode(self.encoding, 'replace')
+            if any(regex.search(text) for regex in regexes):
+                return text
+
+    def _negotiate(self, chunk):
+        """Removes the telnet commands from the data and refuses all options"""
+        data = self._pending + chunk
+        self._pending = b''
+        result = bytearray()
+        i = 0
+        while i < len(data):
+            byte = data[i]
+            if byte != IAC:
+                result.append(byte)
+                i += 1
+                continue
+            if i + 1 >= len(data):
+                self._pending = data[i:]
+                break
+            command = data[i + 1]
+            if command == IAC:
+                result.append(IAC)
+                i += 2
+            elif command in (DO, DONT, WILL, WONT):
+                if i + 2 >= len(data):
+                    self._pending = data[i:]
+                    break
+                if command in (DO, WILL):
+                    self._writer.write(bytes([IAC, WONT if command == DO else DONT, data[i + 2]]))
+                i += 3
+            elif command == SB:
+                end = data.find(bytes([IAC, SE]), i + 2)
+                if end == -1:
+                    self._pending = data[i:]
+                    break
+                i = end + 2
+            else:
+                i += 2
+        return bytes(result)
+
+
+class Collector(object):
+    """Collects the show command outputs of devices concurrently.
+
+        - path is the telnet directory, the outputs are written to path/_showcommand/ip.txt
+        - show_commands are the ParseShowCommand classes, their _cli_command is executed
+        - transport is a callable that returns a transport for an ip, see TelnetTransport
+        - concurrency is the maximum number of devices that are connected at the same time
+        - timeout is the maximum number of seconds per device, for all commands
+        - retries is the number of retries for a device, after retry_delay seconds
+
+        Any error of a device, also an unexpected one, is returned as the error
+        of its ip and does not stop the collection of the other devices. The
+        files of a device are only written if all commands succeeded, an
+        existing file is replaced at once, a parser never reads a partial file.
+    """
+
+    def __init__(self, path, show_commands=SHOW_COMMANDS, transport=TelnetTransport, concurrency=100,
+                 timeout=60, retries=2, retry_delay=1.0):
+        self.path = path
+        self.show_commands = tuple(show_commands)
+        self.transport = transport
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+    def run(self, ips):
+        """Collects the outputs of all ips, returns a dictionary ip -> error for the failed devices"""
+        return asyncio.run(self.collect(ips))
+
+    async def collect(self, ips):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        ips = [str(ip) for ip in ips]
+        results = await asyncio.gather(*[self._collect_limited(semaphore, ip) for ip in ips])
+        return dict((ip, error) for ip, error in zip(ips, results) if error)
+
+    async def _collect_limited(self, semaphore, ip):
+        async with semaphore:
+            return await self.collect_device(ip)
+
+    async def collect_device(self, ip):
+        """Collects and writes the outputs of a device, returns None or the error as a string"""
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.retry_delay)
+            try:
+                outputs, hostname = await asyncio.wait_for(self._run_commands(ip), self.timeout)
+                self._write(ip, outputs, hostname)
+                return None
+            except asyncio.TimeoutError:
+                error = 'timeout after {} seconds'.format(self.timeout)
+            except asyncio.CancelledError:
+                # an Exception before Python 3.8, the collection is cancelled and not the device
+                raise
+            except Exception as e:
+                error = '{}: {}'.format(type(e).__name__, e)
+        return error
+
+    async def _run_commands(self, ip):
+        transport = self.transport(ip)
+        try:
+            await transport.connect()
+            outputs = []
+            for show_command in self.show_commands:
+                output = await transport.run(show_command._cli_command)
+                outputs.append((show_command, output))
+            return outputs, transport.hostname
+        finally:
+            await transport.close()
+
+    def _write(self, ip, outputs, hostname):
+        """Writes an output as the command, the output and the hostname of the prompt"""
+        for show_command, output in outputs:
+            directory = os.path.join(self.path, show_command._showcommand)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            filename = os.path.join(directory, ip + '.txt')
+            with open(filename + '.tmp', 'w') as fp:
+                fp.write('{}\n{}\n{}\n'.format(show_command._cli_command, output, hostname))
+            os.replace(filename + '.tmp', filename)
@@ -0,0 +1,249 @@
+from __future__ import print_function
+import json
+from itertools import islice
+from collections import OrderedDict
+from MPLSinventory.tools import iter_dict_from_objects
+from MPLSinventory.ip_address_tools import ip_to_int, int_to_ip
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+"""Module that saves a dictionary of json_objects as a typed, columnar Parquet file.
+
+   The dictionaries of create_dict_from_objects are written in batches with a
+   column per attribute, the type of a column is chosen from the values:
+
+   - int, float and bool columns are stored as int64, float64 and bool
+   - IPv4 addresses ('10.0.0.1') are stored as uint32
+   - other strings, e.g. hostnames, are dictionary encoded
+   - lists, dictionaries and columns with mixed types are stored as json strings
+
+   The types are chosen from all rows, a column with an int in one row and an
+   IP address in another is stored as json. A missing value ('' or None) is
+   stored as null. read_parquet_as_dict returns the same dictionary as reading
+   the file of save_dict_as_json, it can be used for combine and combine3.
+   Only the ints in a column with floats, e.g. a bandwidth of 0, are read as
+   floats.
+
+   >>> save_dict_as_parquet(create_dict_from_objects(routers, attributes), 'routers.parquet')
+   >>> routers_d = read_parquet_as_dict('routers.parquet')
+
+   pyarrow is required for this module.
+"""
+
+
+KEY_COLUMN = '_key'
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError('pyarrow is required to save and read Parquet files')
+
+
+def _is_ip(value):
+    try:
+        ip_to_int(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _profile(values):
+    """Returns (types, missing values, all strings are IPs) for the values of a column"""
+    types = set()
+    missing = set()
+    ips = True
+    for value in values:
+        if value in ('', None):
+            missing.add(value)
+            continue
+        types.add(type(value))
+        if ips and isinstance(value, str):
+            ips = _is_ip(value)
+    return frozenset(types), frozenset(missing), ips
+
+
+def _merge_profiles(profile, other):
+    return profile[0] | other[0], profile[1] | other[1], profile[2] and other[2]
+
+
+def _profile_type(profile):
+    """Returns (type, missing value) for the profile of a column"""
+    types, missing, ips = profile
+    if len(missing) > 1:
+        return 'json', None
+    missing_value = next(iter(missing)) if missing else ''
+    if not types:
+        return 'str', missing_value
+    if types == {bool}:
+        return 'bool', missing_value
+    if bool not in types and types <= {int} | ({long} if str is bytes else set()):
+        return 'int', missing_value
+    if bool not in types and types <= {int, float}:
+        return 'float', missing_value
+    if types == {str}:
+        if ips:
+            return 'ipv4', missing_value
+        return 'str', missing_value
+    return 'json', None
+
+
+def _arrow_type(column_type):
+    return {'int': pa.int64(),
+            'float': pa.float64(),
+            'bool': pa.bool_(),
+            'ipv4': pa.uint32(),
+            'str': pa.dictionary(pa.int32(), pa.string()),
+            'json': pa.string()}[column_type]
+
+
+def _encode(column_type, missing_value, values):
+    if column_type == 'json':
+        return [json.dumps(value) for value in values]
+    if column_type == 'ipv4':
+        return [None if value == missing_value else ip_to_int(value) for value in values]
+    return [None if value == missing_value else value for value in values]
+
+
+def _decode(column_type, missing_value, values):
+    if column_type == 'json':
+        return [json.loads(value) for value in values]
+    if column_type == 'ipv4':
+        ips = {None: missing_value}
+        for value in set(values):
+            if value is not None:
+                ips[value] = int_to_ip(value)
+        return [ips[value] for value in values]
+    return [missing_value if value is None else value for value in values]
+
+
+def _to_pylist(column):
+    """Returns column.to_pylist(), the dictionary encoded chunks are decoded with their indices"""
+    result = []
+    for chunk in column.chunks:
+        if pa.types.is_dictionary(chunk.type):
+            dictionary = chunk.dictionary.to_pylist()
+            result.extend(None if i is None else dictionary[i] for i in chunk.indices.to_pylist())
+        else:
+            result.extend(chunk.to_pylist())
+    return result
+
+
+def _schema(columns, column_types):
+    fields = [pa.field(KEY_COLUMN, pa.dictionary(pa.int32(), pa.string()))]
+    for column in columns:
+        column_type, missing_value = column_types[column]
+        metadata = {'mpls.type': column_type, 'mpls.missing': json.dumps(missing_value)}
+        fields.append(pa.field(column, _arrow_type(column_type), metadata=metadata))
+    return pa.schema(fields, metadata={'mpls.key': KEY_COLUMN})
+
+
+def _profiles(batch, attributes=None):
+    """Returns {attribute: profile} of the rows in batch, for the attributes or all attributes of the rows"""
+    if attributes is None:
+        attributes = []
+        for key, json_object in batch:
+            for attribute in json_object:
+                if attribute not in attributes:
+                    attributes.append(attribute)
+    return OrderedDict((attribute, _profile([json_object.get(attribute, '') for _, json_object in batch]))
+                       for attribute in attributes)
+
+
+def _table(batch, attributes, column_types, schema):
+    arrays = [pa.array([str(key) for key, _ in batch], type=schema.field(KEY_COLUMN).type)]
+    for attribute in attributes:
+        column_type, missing_value = column_types[attribute]
+        values = [json_object.get(attribute, '') for _, json_object in batch]
+        arrays.append(pa.array(_encode(column_type, missing_value, values), type=_arrow_type(column_type)))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def save_dict_as_parquet(jdict, filename, attributes=None, batch_size=10000, compression='snappy'):
+    """Saves a dictionary of json_objects as a Parquet file, with a column per attribute.
+
+    The types of the columns are chosen from all rows. jdict can also be an
+    iterable of (key, json_object) pairs, e.g. from iter_dict_from_objects.
+    The pairs are then written in batches of batch_size rows and the types are
+    chosen from the first batch. If a later batch has a value that does not
+    fit the type of its column, or a new attribute, the types are widened and
+    the rows written so far are read back and written again.
+    """
+    _require_pyarrow()
+    if isinstance(jdict, dict):
+        items = iter(jdict.items())
+        profiles = _profiles(list(jdict.items()), attributes)
+    else:
+        items = iter(jdict)
+        profiles = None
+    batch = list(islice(items, batch_size))
+    if profiles is None:
+        profiles = _profiles(batch, attributes)
+    columns = list(profiles)
+    column_types = dict((column, _profile_type(profile)) for column, profile in profiles.items())
+    schema = _schema(columns, column_types)
+    writer = pq.ParquetWriter(filename, schema, compression=compression)
+    try:
+        while batch:
+            if not isinstance(jdict, dict):
+                batch_profiles = _profiles(batch, attributes)
+                for column, batch_profile in batch_profiles.items():
+                    if column not in profiles:
+                        # the rows written so far don't have the new attribute
+                        profiles[column] = _merge_profiles(_profile(['']), batch_profile)
+                    else:
+                        profiles[column] = _merge_profiles(profiles[column], batch_profile)
+                widened = dict((column, _profile_type(profile)) for column, profile in profiles.items())
+                if widened != column_types:
+                    writer.close()
+                    rows = _read_rows(filename)
+                    columns = list(profiles)
+                    column_types = widened
+                    schema = _schema(columns, column_types)
+                    writer = pq.ParquetWriter(filename, schema, compression=compression)
+                    for i in range(0, len(rows), batch_size):
+                        writer.write_table(_table(rows[i:i + batch_size], columns, column_types, schema))
+            writer.write_table(_table(batch, columns, column_types, schema))
+            batch = list(islice(items, batch_size))
+    finally:
+        writer.close()
+
+
+def save_objects_as_parquet(objects, filename, attributes=[], batch_size=10000):
+    """Saves objects, e.g. MPLSRouters, as Parquet without creating the complete dictionary first.
+
+    objects and attributes are the same as for create_dict_from_objects."""
+    save_dict_as_parquet(iter_dict_from_objects(objects, attributes), filename,
+                         attributes=attributes or None, batch_size=batch_size)
+
+
+def read_parquet_as_dict(filename, attributes=None):
+    """Reads a Parquet file of save_dict_as_parquet, returns the dictionary of json_objects.
+
+    attributes can be a list of columns, only these columns are read."""
+    _require_pyarrow()
+    return dict(_read_rows(filename, attributes))
+
+
+def _read_rows(filename, attributes=None):
+    """Returns the list of (key, json_object) in a Parquet file of save_dict_as_parquet"""
+    schema = pq.read_schema(filename)
+    columns = None
+    if attributes is not None:
+        columns = [KEY_COLUMN] + list(attributes)
+    table = pq.read_table(filename, columns=columns)
+    names = [name for name in table.column_names if name != KEY_COLUMN]
+    decoded = []
+    for name in names:
+        metadata = schema.field(name).metadata or {}
+        column_type = metadata.get(b'mpls.type', b'json').decode()
+        missing_value = json.loads(metadata.get(b'mpls.missing', b'""').decode())
+        decoded.append(_decode(column_type, missing_value, _to_pylist(table.column(name))))
+    keys = _to_pylist(table.column(KEY_COLUMN))
+    rows = zip(*decoded) if names else [()] * len(keys)
+    return [(key, dict(zip(names, row))) for key, row in zip(keys, rows)]
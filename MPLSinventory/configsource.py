@@ -0,0 +1,152 @@
+from __future__ import print_function
+import re
+import mmap
+from array import array
+
+
+"""Module that provides a memory mapped view on the lines of a config file.
+
+   Large configurations (full prefix-lists and ACLs) are not read into a list
+   of strings. The file is memory mapped and only the offsets of the lines are
+   stored, a line is decoded when it is accessed:
+
+   >>> config = map_config('pe-router-1.cfg')
+   >>> config[0]
+   'version 15.2'
+   >>> config[10:20]           # a view on the same buffer, no lines are copied
+   <ConfigLines 10 lines>
+
+   The lines are the same as [line.rstrip() for line in fp.readlines()], '\r\n',
+   '\r' and '\n' all end a line. The mapping holds a file descriptor until
+   it is closed, close(keep=True) copies the lines into memory first:
+
+   >>> config.close(keep=True)
+
+   RegexStructure.load maps files larger than _mmap_threshold, and closes the
+   mapping after parsing.
+"""
+
+
+_NEWLINE = re.compile(b'\r\n?|\n')
+_TEXT_NEWLINE = re.compile(u'\r\n?|\n')
+
+
+if str is bytes:
+    def _decode(line):
+        return line
+else:
+    def _decode(line):
+        return line.decode('utf-8', 'replace')
+
+
+def _line_offsets(buffer):
+    """Returns an array with the offset of the start of each line, and the end of the buffer"""
+    size = len(buffer)
+    offsets = array('I' if size < 1 << 32 else 'L', [0])
+    offsets.extend(match.end() for match in _NEWLINE.finditer(buffer))
+    if offsets[-1] != size:
+        offsets.append(size)
+    return offsets
+
+
+class _Source(object):
+    """The buffer of a ConfigLines and of its views, replacing it replaces it for all views"""
+    __slots__ = ('buffer',)
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+
+class ConfigLines(object):
+    """A read only sequence of the rstripped lines in a buffer.
+
+        - buffer is a mmap (or bytes) with the contents of the file
+        - offsets are the start positions of the lines, followed by the end of the last line
+        - start and stop select the lines of a view, a slice returns a view on the same buffer
+
+        A ConfigLines compares equal to a list with the same lines and is
+        pickled as a list. close() closes a mmap buffer, for this ConfigLines
+        and all views on it.
+    """
+    __slots__ = ('_source', '_offsets', '_start', '_stop')
+    _chunk_size = 256
+
+    def __init__(self, buffer, offsets=None, start=0, stop=None):
+        if offsets is None:
+            offsets = _line_offsets(buffer)
+        self._source = buffer if isinstance(buffer, _Source) else _Source(buffer)
+        self._offsets = offsets
+        self._start = start
+        self._stop = len(offsets) - 1 if stop is None else stop
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def _line(self, i):
+        return _decode(self._source.buffer[self._offsets[i]:self._offsets[i + 1]]).rstrip()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self._line(self._start + i) for i in range(start, stop, step)]
+            return ConfigLines(self._source, self._offsets, self._start + start,
+                               self._start + max(start, stop))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('line index out of range')
+        return self._line(self._start + index)
+
+    def __iter__(self):
+        # decode chunks of lines at once, only a chunk is materialized at a time
+        buffer = self._source.buffer
+        offsets = self._offsets
+        split = _TEXT_NEWLINE.split
+        for start in range(self._start, self._stop, self._chunk_size):
+            stop = min(start + self._chunk_size, self._stop)
+            lines = split(_decode(buffer[offsets[start]:offsets[stop]]))
+            for line in lines[:stop - start]:
+                yield line.rstrip()
+
+    def close(self, keep=False):
+        """Closes a mmap buffer, keep=True copies the buffer into memory first.
+
+        Without keep, reading a line after the close raises a ValueError."""
+        buffer = self._source.buffer
+        if isinstance(buffer, mmap.mmap) and not getattr(buffer, 'closed', False):
+            if keep:
+                self._source.buffer = buffer[:]
+            buffer.close()
+
+    def __eq__(self, other):
+        if isinstance(other, (ConfigLines, list, tuple)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+    def __repr__(self):
+        return '<ConfigLines {} lines>'.format(len(self))
+
+
+def map_config(filename):
+    """Memory maps a config file, returns a ConfigLines or an empty list for an empty file.
+
+    The ConfigLines holds a file descriptor until it is closed, see ConfigLines.close."""
+    with open(filename, 'rb') as fp:
+        try:
+            buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # an empty file can not be mapped
+            return []
+    return ConfigLines(buffer)
@@ -0,0 +1,167 @@
+from __future__ import print_function
+import time
+import heapq
+import marshal
+import cProfile
+import threading
+import functools
+
+
+"""Module that records the time spent in the stages of an inventory run.
+
+   The instrumentation is disabled by default, the instrumented code then only
+   checks the module variable 'enabled'. When enabled the wall time and the
+   number of calls are recorded per category and name:
+
+   - construct  RegexStructure subclasses, e.g. 'MPLSRouter' or 'Interface'
+   - stage      the stages of RegexStructure, e.g. 'Interface.attributes', 'Router.tree', 'Router.read'
+   - attribute  the single attribute regexes per class, e.g. 'Interface.ip'
+   - function   the functions decorated with timed, e.g. 'tools.combine3'
+
+   The times are inclusive: the time of 'MPLSRouter' includes the time of its
+   Interfaces. The slowest configs that are loaded are kept as well.
+
+   >>> instrument.enable()
+   >>> routers = read_files_to_objects(ROUTER_DIR, MPLSRouter, id='hostname')
+   >>> print(instrument.report())
+   >>> instrument.dump_stats('run.pstats')   # python -m pstats run.pstats
+
+   Objects that are created in worker processes (workers > 1) are not recorded.
+"""
+
+
+enabled = False
+per_attribute = True
+slowest_configs = 20
+
+clock = getattr(time, 'perf_counter', time.time)
+
+_stats = {}          # (category, name): [calls, seconds]
+_slowest = []        # heap of (seconds, class name, path)
+_lock = threading.Lock()
+
+
+def enable(attributes=True, slowest=20):
+    """Starts recording, attributes=False skips the timing of every attribute regex"""
+    global enabled, per_attribute, slowest_configs
+    per_attribute = attributes
+    slowest_configs = slowest
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        del _slowest[:]
+
+
+def record(category, name, seconds, calls=1):
+    with _lock:
+        entry = _stats.get((category, name))
+        if entry is None:
+            _stats[(category, name)] = [calls, seconds]
+        else:
+            entry[0] += calls
+            entry[1] += seconds
+
+
+def record_config(path, class_name, seconds):
+    """Keeps the slowest_configs configs that took the most time to load"""
+    with _lock:
+        item = (seconds, class_name, path)
+        if len(_slowest) < slowest_configs:
+            heapq.heappush(_slowest, item)
+        elif _slowest and item > _slowest[0]:
+            heapq.heapreplace(_slowest, item)
+
+
+def call(category, name, function, *args, **kwargs):
+    """Returns function(*args, **kwargs), the time is recorded as (category, name) if enabled"""
+    if not enabled:
+        return function(*args, **kwargs)
+    start = clock()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        record(category, name, clock() - start)
+
+
+def timed(name=None):
+    """Decorator that records the calls of a function in the category 'function'.
+
+    The name defaults to the module and function name, e.g. 'tools.combine3'."""
+    def decorator(function):
+        key = name or function.__module__.split('.')[-1] + '.' + function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record('function', key, clock() - start)
+        return wrapper
+    return decorator
+
+
+def stats(category=None):
+    """Returns a list of (category, name, calls, seconds), the slowest first"""
+    with _lock:
+        result = [(c, name, calls, seconds) for (c, name), (calls, seconds) in _stats.items()
+                  if category is None or c == category]
+    result.sort(key=lambda item: item[3], reverse=True)
+    return result
+
+
+def slowest():
+    """Returns a list of (seconds, class name, path) of the slowest configs, the slowest first"""
+    with _lock:
+        return sorted(_slowest, reverse=True)
+
+
+def report(limit=20):
+    """Returns the recorded times as text, the limit is the number of lines per category"""
+    lines = []
+    for category in ('function', 'construct', 'stage', 'attribute'):
+        items = stats(category)
+        if not items:
+            continue
+        lines.append('{:<50} {:>10} {:>12} {:>12}'.format(category, 'calls', 'seconds', 'per call'))
+        for _, name, calls, seconds in items[:limit]:
+            lines.append('  {:<48} {:>10} {:>12.4f} {:>12.6f}'.format(name, calls, seconds, seconds / calls))
+        lines.append('')
+    if _slowest:
+        lines.append('slowest configs')
+        for seconds, class_name, path in slowest()[:limit]:
+            lines.append('  {:>10.4f}  {:<16} {}'.format(seconds, class_name, path))
+    return '\n'.join(lines)
+
+
+def dump_stats(filename):
+    """Writes the recorded times in the format of cProfile, it can be read with pstats.Stats(filename).
+
+    The category is used as file name and the name as function name. The times
+    are inclusive, so the own time (tottime) is the same as the cumulative time."""
+    result = {}
+    for category, name, calls, seconds in stats():
+        result[(category, 0, name)] = (calls, calls, seconds, seconds, {})
+    with open(filename, 'wb') as fp:
+        marshal.dump(result, fp)
+
+
+def profile(filename, function, *args, **kwargs):
+    """Runs function(*args, **kwargs) with cProfile and writes the stats to filename.
+
+    Shows the time per Python function, e.g. the regex searches, instead of per stage."""
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args, **kwargs)
+    finally:
+        profiler.dump_stats(filename)
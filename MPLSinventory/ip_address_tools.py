@@ -1,4 +1,8 @@
+import re
 import sys
+import socket
+import struct
+from functools import total_ordering
 
 PYTHON2 = sys.version_info[0] < 3
 
@@ -36,6 +40,18 @@ else:
 
     >>> IPv4Address('10.0.1.1') in IPv4Interface('10.0.1.20/20').network
     True
+
+    The IntIPv4Address, IntIPv4Interface and IntIPv4Network objects store an address and
+    a prefix length as plain ints, they are smaller and faster to create than the objects
+    of ipaddress and ipaddr and are used for the parsed configs:
+    >>> ip = IntIPv4Interface('10.0.1.20 255.255.255.0')
+    >>> str(ip), str(ip.ip), str(ip.network)
+    ('10.0.1.20/24', '10.0.1.20', '10.0.1.0/24')
+    >>> IntIPv4Address('10.0.1.1') in ip.network
+    True
+
+    They are equal to, and have the same hash as, the IPv4Address, IPv4Interface and
+    IPv4Network of ipaddress, to_stdlib() returns such an object.
 """
 
 
@@ -55,3 +71,282 @@ else:
 #         return ip_address in ip_network
 #     else:
 #         return ip_address in ip_network.network
+
+
+_STRING_TYPES = (str, unicode) if PYTHON2 else (str,)
+
+_OCTETS_REGEX = re.compile(r'^(0|[1-9][0-9]{0,2})\.(0|[1-9][0-9]{0,2})\.(0|[1-9][0-9]{0,2})\.(0|[1-9][0-9]{0,2})\Z')
+
+
+def ip_to_int(address):
+    """Returns the int of a dotted address '10.0.1.20', raises a ValueError for an invalid address.
+
+    Like ipaddress, only four decimal octets without leading zeros are accepted."""
+    match = _OCTETS_REGEX.match(address) if isinstance(address, _STRING_TYPES) else None
+    if match:
+        a, b, c, d = [int(octet) for octet in match.groups()]
+        if a <= 255 and b <= 255 and c <= 255 and d <= 255:
+            return (a << 24) | (b << 16) | (c << 8) | d
+    raise ValueError('invalid IPv4 address: {!r}'.format(address))
+
+
+def int_to_ip(value):
+    return socket.inet_ntoa(struct.pack('!I', value))
+
+
+_prefixlens = {}
+
+
+def netmask_to_prefixlen(netmask):
+    """Returns the prefix length of a dotted netmask '255.255.255.0' or of a prefix length '24'"""
+    prefixlen = _prefixlens.get(netmask)
+    if prefixlen is None:
+        if netmask.isdigit():
+            prefixlen = int(netmask)
+        else:
+            hostmask = ~ip_to_int(netmask) & 0xffffffff
+            if hostmask & (hostmask + 1):
+                raise ValueError('invalid IPv4 netmask: {!r}'.format(netmask))
+            prefixlen = 32 - hostmask.bit_length()
+        if not 0 <= prefixlen <= 32:
+            raise ValueError('invalid IPv4 prefix length: {!r}'.format(netmask))
+        _prefixlens[netmask] = prefixlen
+    return prefixlen
+
+
+def _check_prefixlen(prefixlen):
+    if not 0 <= prefixlen <= 32:
+        raise ValueError('invalid IPv4 prefix length: {!r}'.format(prefixlen))
+    return prefixlen
+
+
+def _check_ip(ip):
+    if not 0 <= ip <= 0xffffffff:
+        raise ValueError('invalid IPv4 address: {!r}'.format(ip))
+    return ip
+
+
+def prefix_mask(prefixlen):
+    """Returns the netmask of a prefix length as an int, e.g. 0xffffff00 for 24"""
+    return (0xffffffff << (32 - prefixlen)) & 0xffffffff
+
+
+def _split(address):
+    """Returns (ip, prefixlen) as ints of '10.0.1.20/24', '10.0.1.20/255.255.255.0' or '10.0.1.20 255.255.255.0'"""
+    parts = address.split('/') if '/' in address else address.split()
+    if len(parts) == 1:
+        return ip_to_int(parts[0]), 32
+    if len(parts) == 2:
+        return ip_to_int(parts[0]), netmask_to_prefixlen(parts[1])
+    raise ValueError('invalid IPv4 interface: {!r}'.format(address))
+
+
+@total_ordering
+class IntIPv4Address(object):
+    """IPv4 address stored as an int, e.g. IntIPv4Address('10.0.1.20') or IntIPv4Address(167772436)"""
+    __slots__ = ('_ip',)
+    _version = 4
+
+    def __init__(self, address):
+        if isinstance(address, int) or (PYTHON2 and isinstance(address, long)):
+            self._ip = int(_check_ip(address))
+        elif hasattr(address, '_ip') and getattr(address, '_version', 4) == 4 and not hasattr(address, '_prefixlen'):
+            self._ip = int(address._ip)
+        else:
+            self._ip = ip_to_int(str(address).strip())
+
+    def __int__(self):
+        return self._ip
+
+    __index__ = __int__
+
+    def __str__(self):
+        return int_to_ip(self._ip)
+
+    def __repr__(self):
+        return "{}('{}')".format(type(self).__name__, self)
+
+    def __eq__(self, other):
+        try:
+            return self._ip == other._ip and self._version == other._version and not hasattr(other, '_prefixlen')
+        except AttributeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __lt__(self, other):
+        if not isinstance(other, IntIPv4Address):
+            return NotImplemented
+        return self._ip < other._ip
+
+    def __hash__(self):
+        return hash(hex(self._ip))
+
+    def __reduce__(self):
+        return type(self), (self._ip,)
+
+    def to_stdlib(self):
+        """Returns the IPv4Address of ipaddress (ipaddr in python2)"""
+        return IPv4Address(str(self))
+
+
+@total_ordering
+class IntIPv4Network(object):
+    """IPv4 network stored as ints, the host bits of the address are removed: IntIPv4Network('10.0.1.20/24')
+
+    An address, e.g. an IntIPv4Address or an IPv4Address, can be checked with 'in'."""
+    __slots__ = ('_ip', '_prefixlen')
+    _version = 4
+
+    def __init__(self, address):
+        if isinstance(address, tuple):
+            ip, prefixlen = _check_ip(address[0]), _check_prefixlen(address[1])
+        else:
+            ip, prefixlen = _split(str(address).strip())
+        self._prefixlen = prefixlen
+        self._ip = ip & prefix_mask(prefixlen)
+
+    @property
+    def network_address(self):
+        return IntIPv4Address(self._ip)
+
+    @property
+    def broadcast_address(self):
+        return IntIPv4Address(self._ip | (~prefix_mask(self._prefixlen) & 0xffffffff))
+
+    @property
+    def netmask(self):
+        return IntIPv4Address(prefix_mask(self._prefixlen))
+
+    @property
+    def prefixlen(self):
+        return self._prefixlen
+
+    @property
+    def num_addresses(self):
+        return 1 << (32 - self._prefixlen)
+
+    @property
+    def with_prefixlen(self):
+        return str(self)
+
+    def __contains__(self, address):
+        if hasattr(address, '_prefixlen') or getattr(address, '_version', 4) != 4:
+            return False
+        return int(address) & prefix_mask(self._prefixlen) == self._ip
+
+    def __str__(self):
+        return '{}/{}'.format(int_to_ip(self._ip), self._prefixlen)
+
+    def __repr__(self):
+        return "{}('{}')".format(type(self).__name__, self)
+
+    def __eq__(self, other):
+        try:
+            return (self._version == other._version and self._ip == int(other.network_address) and
+                    prefix_mask(self._prefixlen) == int(other.netmask))
+        except AttributeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __lt__(self, other):
+        if not isinstance(other, IntIPv4Network):
+            return NotImplemented
+        return (self._ip, self._prefixlen) < (other._ip, other._prefixlen)
+
+    def __hash__(self):
+        return hash(self._ip ^ prefix_mask(self._prefixlen))
+
+    def __reduce__(self):
+        return type(self), ((self._ip, self._prefixlen),)
+
+    def to_stdlib(self):
+        """Returns the IPv4Network of ipaddress (ipaddr in python2)"""
+        return IPv4Network(str(self))
+
+
+@total_ordering
+class IntIPv4Interface(object):
+    """IPv4 address with a network, stored as ints.
+
+    IntIPv4Interface('10.0.1.20 255.255.255.0'), IntIPv4Interface('10.0.1.20/24') and
+    IntIPv4Interface('10.0.1.20/255.255.255.0') are the same. ip returns the
+    IntIPv4Address, network the IntIPv4Network."""
+    __slots__ = ('_ip', '_prefixlen')
+    _version = 4
+
+    def __init__(self, address):
+        if isinstance(address, tuple):
+            self._ip, self._prefixlen = _check_ip(address[0]), _check_prefixlen(address[1])
+        else:
+            self._ip, self._prefixlen = _split(str(address).strip())
+
+    @property
+    def ip(self):
+        return IntIPv4Address(self._ip)
+
+    @property
+    def network(self):
+        return IntIPv4Network((self._ip, self._prefixlen))
+
+    @property
+    def netmask(self):
+        return IntIPv4Address(prefix_mask(self._prefixlen))
+
+    @property
+    def prefixlen(self):
+        return self._prefixlen
+
+    @property
+    def with_prefixlen(self):
+        return str(self)
+
+    @property
+    def with_netmask(self):
+        return '{} {}'.format(int_to_ip(self._ip), int_to_ip(prefix_mask(self._prefixlen)))
+
+    def __int__(self):
+        return self._ip
+
+    def __str__(self):
+        return '{}/{}'.format(int_to_ip(self._ip), self._prefixlen)
+
+    def __repr__(self):
+        return "{}('{}')".format(type(self).__name__, self)
+
+    def __eq__(self, other):
+        try:
+            if self._ip != other._ip or self._version != other._version:
+                return False
+        except AttributeError:
+            return NotImplemented
+        try:
+            return self.network == other.network
+        except AttributeError:
+            # an address without a network is not equal to an interface, as in ipaddress
+            return False
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __lt__(self, other):
+        if not isinstance(other, IntIPv4Interface):
+            return NotImplemented
+        return (self._ip & prefix_mask(self._prefixlen), self._prefixlen, self._ip) < \
+               (other._ip & prefix_mask(other._prefixlen), other._prefixlen, other._ip)
+
+    def __hash__(self):
+        return hash((self._ip, self._prefixlen, self._ip & prefix_mask(self._prefixlen)))
+
+    def __reduce__(self):
+        return type(self), ((self._ip, self._prefixlen),)
+
+    def to_stdlib(self):
+        """Returns the IPv4Interface of ipaddress (ipaddr in python2)"""
+        return IPv4Interface(str(self))
@@ -0,0 +1,175 @@
+"""Module that provides a longest prefix match index of IPv4 networks.
+
+   The PrefixTrie is a binary radix trie over the 32 bits of the network
+   addresses. It answers which interfaces own an IP address or a subnet:
+
+   >>> trie = index_interfaces(routers)
+   >>> trie.lookup('192.168.100.1')
+   [('router-1-eth', 'GigabitEthernet0/1.101')]
+   >>> trie.lookup_many(['10.0.10.20', '10.0.20.0/25', '172.31.0.1'])
+   [[('router-1-eth', 'GigabitEthernet0/0.100')], [('router-1-eth', 'GigabitEthernet0/0.200')], []]
+
+   A prefix can have multiple values, e.g. the routers of a HSRP pair share a network.
+   lookup_many uses numpy, if available, to match many addresses at once.
+"""
+from __future__ import print_function
+from MPLSinventory.ip_address_tools import IntIPv4Address, IntIPv4Interface, IntIPv4Network, int_to_ip, prefix_mask
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def parse_prefix(prefix):
+    """Returns (network, prefix length) as ints.
+
+    prefix can be an address '10.0.0.1' (a /32), a network or interface '10.0.0.1/30',
+    an address with a dotted mask '10.0.0.1 255.255.255.252', an (int, length) tuple,
+    or an address, network or interface object of ip_address_tools. The host bits are removed."""
+    if isinstance(prefix, tuple):
+        address, length = prefix
+    elif isinstance(prefix, (IntIPv4Interface, IntIPv4Network)):
+        address, length = prefix._ip, prefix._prefixlen
+    elif isinstance(prefix, IntIPv4Address):
+        address, length = prefix._ip, 32
+    else:
+        interface = IntIPv4Interface(prefix)
+        address, length = interface._ip, interface._prefixlen
+    return address & prefix_mask(length), length
+
+
+class PrefixTrie(object):
+    """Binary radix trie of IPv4 prefixes for longest prefix matching.
+
+        - insert(prefix, value) adds a value to a prefix, see parse_prefix for the formats
+        - lookup(address) returns the values of the longest prefix that contains the address
+          or the subnet, an empty list if there is no such prefix
+        - match(address) returns (prefix, values) of the longest prefix, or None
+        - lookup_many(addresses) returns the values for each address
+
+        A node is a list [child for bit 0, child for bit 1, values or None].
+    """
+
+    def __init__(self, prefixes=()):
+        self._root = [None, None, None]
+        self._count = 0
+        self._tables = None
+        for prefix, value in prefixes:
+            self.insert(prefix, value)
+
+    def insert(self, prefix, value):
+        network, length = parse_prefix(prefix)
+        node = self._root
+        for i in range(length):
+            bit = (network >> (31 - i)) & 1
+            child = node[bit]
+            if child is None:
+                child = node[bit] = [None, None, None]
+            node = child
+        if node[2] is None:
+            node[2] = []
+            self._count += 1
+        node[2].append(value)
+        self._tables = None
+
+    def _match(self, network, length):
+        """Returns (depth, values) of the deepest node with values on the path of network/length"""
+        node = self._root
+        best = (0, node[2]) if node[2] is not None else None
+        for i in range(length):
+            node = node[(network >> (31 - i)) & 1]
+            if node is None:
+                break
+            if node[2] is not None:
+                best = (i + 1, node[2])
+        return best
+
+    def match(self, address):
+        """Returns (prefix, values) of the longest prefix that contains the address, or None"""
+        network, length = parse_prefix(address)
+        best = self._match(network, length)
+        if best is None:
+            return None
+        depth, values = best
+        return '{}/{}'.format(int_to_ip(network & prefix_mask(depth)), depth), values
+
+    def lookup(self, address):
+        """Returns the values of the longest prefix that contains the address, an empty list if none"""
+        return self._lookup(*parse_prefix(address))
+
+    def _lookup(self, network, length):
+        best = self._match(network, length)
+        return best[1] if best is not None else []
+
+    def lookup_many(self, addresses):
+        """Returns a list with the values of lookup for each address"""
+        parsed = [parse_prefix(address) for address in addresses]
+        if np is None or len(parsed) < 64:
+            return [self._lookup(network, length) for network, length in parsed]
+
+        if self._tables is None:
+            self._tables = self._build_tables()
+        tables, values = self._tables
+        networks = np.array([network for network, _ in parsed], dtype=np.uint32)
+        lengths = np.array([length for _, length in parsed], dtype=np.uint8)
+        found = np.full(len(parsed), -1, dtype=np.int64)
+        for length, keys, offset in tables:
+            pending = np.nonzero((found < 0) & (lengths >= length))[0]
+            if not len(pending):
+                continue
+            masked = networks[pending] & np.uint32(prefix_mask(length))
+            positions = np.minimum(np.searchsorted(keys, masked), len(keys) - 1)
+            hits = keys[positions] == masked
+            found[pending[hits]] = offset + positions[hits]
+        return [values[i] if i >= 0 else [] for i in found.tolist()]
+
+    def _build_tables(self):
+        """Returns ([(length, sorted network array, offset)], values) with the longest prefixes first"""
+        per_length = {}
+        for network, length, values in self._prefixes():
+            per_length.setdefault(length, []).append((network, values))
+        tables = []
+        all_values = []
+        for length in sorted(per_length, reverse=True):
+            items = sorted(per_length[length], key=lambda item: item[0])
+            tables.append((length, np.array([network for network, _ in items], dtype=np.uint32),
+                           len(all_values)))
+            all_values.extend(values for _, values in items)
+        return tables, all_values
+
+    def _prefixes(self):
+        """Yields (network, length, values) for every prefix"""
+        stack = [(self._root, 0, 0)]
+        while stack:
+            node, network, depth = stack.pop()
+            if node[2] is not None:
+                yield network, depth, node[2]
+            for bit in (1, 0):
+                if node[bit] is not None:
+                    stack.append((node[bit], network | (bit << (31 - depth)), depth + 1))
+
+    def items(self):
+        """Returns a list of (prefix, values) sorted by network and prefix length"""
+        return [('{}/{}'.format(int_to_ip(network), length), values)
+                for network, length, values in sorted(self._prefixes(), key=lambda item: item[:2])]
+
+    def __len__(self):
+        return self._count
+
+
+def index_interfaces(routers):
+    """Returns a PrefixTrie of the networks of all interfaces, the values are (key, interface name).
+
+    routers is a dictionary of Router objects, e.g. from read_files_to_objects,
+    or of json_objects from create_dict_from_objects without attributes."""
+    trie = PrefixTrie()
+    for key, router in routers.items():
+        if isinstance(router, dict):
+            interfaces = [(name, interface.get('ip')) for name, interface in router.get('interfaces', {}).items()]
+        else:
+            interfaces = [(name, interface.ip) for name, interface in router.interfaces.items()]
+        for name, ip in interfaces:
+            if ip:
+                trie.insert(ip, (key, name))
+    return trie
@@ -1,9 +1,52 @@
 from __future__ import print_function
 """ Match rules for matching dictionary entries.
     can be used by tools.combine
-    match_function(json_object, dict2) will return the best matching json_object from dict2 """
+    match_function(json_object, dict2) will return the best matching json_object from dict2
 
+    A match rule that matches on equal keys can declare these keys with match_on,
+    tools.combine then looks up the matches in an index instead of calling the rule
+    for every json_object.
 
+    Score functions for tools.combine3 return a score for a pair of json_objects,
+    with score_on they can be vectorized with numpy. """
+
+
+def match_on(key1, key2):
+    """Decorator that declares the keys of a match rule.
+
+    - key1(json_object1) returns the key of a json_object from dict1
+    - key2(json_object2) returns the key of a json_object from dict2
+
+    The rule must return the first json_object2 in dict2 with key2(json_object2) == key1(json_object1).
+    """
+    def decorator(match_function):
+        match_function.match_keys = (key1, key2)
+        return match_function
+    return decorator
+
+
+def score_on(fields1, fields2):
+    """Decorator that declares a vectorized score function for tools.combine3.
+
+    - fields1 are the keys of the json_objects in dict1 that are used for the score
+    - fields2 are the keys of the json_objects in dict2 that are used for the score
+
+    The score function is called with two dictionaries field -> numpy array,
+    one item per json_object, and returns the 2-D numpy array of scores
+    with a row per json_object of dict1 and a column per json_object of dict2.
+
+    @score_on(['hostname'], ['name'])
+    def score_hostname(routers, sp_routers):
+        return routers['hostname'][:, None] == sp_routers['name'][None, :]
+    """
+    def decorator(score_function):
+        score_function.score_fields = (list(fields1), list(fields2))
+        return score_function
+    return decorator
+
+
+@match_on(lambda router: (router["interfaces['Loopback1'].ip.ip"], router["hostname"]),
+          lambda telnet: (telnet['ip'], telnet['hostname']))
 def match_telnet_to_router(router_json_object, telnet_dict):
     """match if loopback and hostname of the router correspend to the telnet_dict"""
     router_ip = router_json_object["interfaces['Loopback1'].ip.ip"]
@@ -16,6 +59,8 @@ def match_telnet_to_router(router_json_object, telnet_dict):
     return None
 
 
+@match_on(lambda showversion: (showversion['ip'], showversion['hostname']),
+          lambda showint: (showint['ip'], showint['hostname']))
 def match_show_commands(showversion_json_object, showint_dict):
     for showint_json_object in showint_dict.values():
         if showversion_json_object['ip'] == showint_json_object['ip']:
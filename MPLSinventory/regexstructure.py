@@ -1,9 +1,13 @@
 from __future__ import print_function
 import os
+import re
 from collections import OrderedDict
+from MPLSinventory import instrument
 from MPLSinventory.tools import search
+from MPLSinventory.configsource import ConfigLines, map_config
 
 
+@instrument.timed()
 def search_configlets(key, config, delimiter='!'):
     """Search a config and return a list of configlets that starts with the key.
 
@@ -11,12 +15,13 @@ def search_configlets(key, config, delimiter='!'):
         - config should be a list of lines or a string that can be split in multiple lines
 
         The configlet starts with the key, lines are added untill the delimiter or the key is found
-        Todo:
-        - stop when the indentation stops, see vrf configuration in BGP
+
+        RegexStructure uses the indentation aware ConfigBlock tree instead,
+        see parse_config_tree.
     """
     result = []
     if isinstance(config, str):
-        config = config.splitlines
+        config = config.splitlines()
     configlet = []
     track = False
     for line in config:
@@ -38,6 +43,217 @@ def search_configlets(key, config, delimiter='!'):
     return result
 
 
+class ConfigBlock(object):
+    """A block of an IOS configuration: a line and all the lines indented below it.
+
+        - source is the list of lines (or ConfigLines) of the complete configuration
+        - start and end are the line numbers of the block in the source
+
+        The children are the blocks that are indented one level deeper.
+        The root of a tree has no header line and spans the complete source.
+        Children are indexed by the keyword (first word) of their header line.
+    """
+    __slots__ = ('source', 'start', 'end', 'keyword', 'children', '_index')
+
+    def __init__(self, source, start=None, end=None, keyword=''):
+        self.source = source
+        self.start = start
+        self.end = end
+        self.keyword = keyword
+        self.children = []
+        self._index = None
+
+    @property
+    def header(self):
+        if self.start is None:
+            return None
+        return self.source[self.start]
+
+    @property
+    def lines(self):
+        if self.start is None:
+            return self.source
+        return self.source[self.start:self.end]
+
+    def index(self):
+        """Returns a dictionary keyword -> list of child blocks"""
+        if self._index is None:
+            self._index = {}
+            for child in self.children:
+                self._index.setdefault(child.keyword, []).append(child)
+        return self._index
+
+    def find(self, key):
+        """Returns the child blocks whose header line starts with the regex key, e.g. 'router bgp'"""
+        literal = re.match(r'[\w-]*', key).group()
+        if not literal or '|' in key or key[len(literal):len(literal)+1] in ('?', '*', '{'):
+            candidates = self.children
+        else:
+            candidates = []
+            for keyword, blocks in self.index().items():
+                if keyword.startswith(literal):
+                    candidates.extend(blocks)
+            candidates.sort(key=lambda block: block.start)
+        regex = r'^\s*(' + key + ')'
+        return [block for block in candidates if search(regex, block.header)]
+
+
+def parse_config_tree(config):
+    """Parse a config in a single pass into a tree of ConfigBlocks, returns the root block.
+
+        - config should be a list of lines
+
+        A block ends at the first line that is indented at the same level or less.
+        A '!' closes the blocks at the same or deeper indentation, so the
+        ' !' lines between the address-families of a BGP configuration do not
+        end the 'router bgp' block.
+    """
+    root = ConfigBlock(config)
+    stack = [root]
+    indents = [-1]
+    for i, line in enumerate(config):
+        text = line.lstrip()
+        if not text:
+            continue
+        indent = len(line) - len(text)
+        while indent <= indents[-1]:
+            stack.pop().end = i
+            indents.pop()
+        if text.startswith('!'):
+            continue
+        block = ConfigBlock(config, i, keyword=text.split(None, 1)[0])
+        stack[-1].children.append(block)
+        stack.append(block)
+        indents.append(indent)
+    for block in stack[1:]:
+        block.end = len(config)
+    return root
+
+
+class AttributeScanner(object):
+    """Find the first match of a set of attribute regexes in a single pass over a config.
+
+        - single_attributes should be a dictionary like RegexStructure._single_attributes
+
+        The regexes are compiled once. A combined alternation of all regexes is used
+        to skip the lines that do not match any of the attributes, only the remaining
+        lines are tested against the attributes that have not been found yet.
+        The scan stops as soon as every attribute has been found.
+
+        The results are identical to calling search(regex, config) per attribute.
+
+        If the instrumentation is enabled, the time per attribute regex is recorded
+        as 'name.attribute', name is usually the name of the RegexStructure class.
+    """
+
+    def __init__(self, single_attributes, name=''):
+        self.attributes = dict(single_attributes)
+        self.name = name
+        self._rules = []
+        for name, (regex, result_type) in single_attributes.items():
+            compiled_regex = re.compile(regex)
+            self._rules.append((name, compiled_regex.search, compiled_regex.groups))
+        self._prefilter = None
+        if self._rules:
+            try:
+                self._prefilter = re.compile('|'.join('(?:' + regex + ')' for regex, _ in
+                                                      single_attributes.values())).search
+            except re.error:
+                # regexes that can not be combined (e.g. duplicate group names) are tested one by one
+                self._prefilter = None
+
+    def scan(self, config):
+        """Return a list of (name, result) for each attribute, result is the same as search()"""
+        if instrument.enabled and instrument.per_attribute:
+            return self._scan_timed(config)
+        return self._scan(config, self._rules, self._prefilter)
+
+    def _scan(self, config, rules, prefilter):
+        """Scans the config with the rules (name, search function, number of groups)"""
+        found = {}
+        pending = rules
+        empty = True
+        for line in config:
+            empty = False
+            if prefilter is not None and not prefilter(line):
+                continue
+            remaining = []
+            for rule in pending:
+                name, search_line, n = rule
+                match = search_line(line)
+                if match:
+                    result = match.groups('')
+                    if n == 1:
+                        result = result[0]
+                    elif not any(result):
+                        result = ''
+                    if result:
+                        found[name] = result
+                        continue
+                remaining.append(rule)
+            pending = remaining
+            if not pending:
+                break
+
+        results = []
+        for name, _, n in rules:
+            if name in found:
+                result = found[name]
+            elif empty:
+                result = ()
+            elif n == 1:
+                result = ''
+            else:
+                result = tuple(n * [''])
+            results.append((name, result))
+        return results
+
+    def _scan_timed(self, config):
+        """The same as scan, records the time and number of searches per attribute regex"""
+        counters = {}
+
+        def timed(key, search_line):
+            clock = instrument.clock
+            counter = counters[key] = [0, 0.0]
+
+            def timed_search(line):
+                start = clock()
+                match = search_line(line)
+                counter[1] += clock() - start
+                counter[0] += 1
+                return match
+            return timed_search
+
+        rules = [(name, timed(name, search_line), n) for name, search_line, n in self._rules]
+        prefilter = None
+        if self._prefilter is not None:
+            prefilter = timed('(prefilter)', self._prefilter)
+        results = self._scan(config, rules, prefilter)
+
+        prefix = self.name + '.' if self.name else ''
+        for key, (calls, seconds) in counters.items():
+            if calls:
+                instrument.record('attribute', prefix + key, seconds, calls)
+        return results
+
+
+_ATTRIBUTE_SCANNERS = {}
+
+
+def attribute_slots(single_attributes, *names):
+    """Returns the __slots__ for a RegexStructure subclass.
+
+    The slots are the names of the single_attributes, 'config' and the additional names.
+    Classes that are created by the hundreds per router can use __slots__
+    instead of a __dict__ per instance:
+
+    class QoSClass(RegexStructure):
+        _single_attributes = {'name': (CLASS_NAME_REGEX, str)}
+        __slots__ = attribute_slots(_single_attributes)
+    """
+    return tuple(single_attributes) + ('config',) + names
+
+
 class RegexStructure(object):
     """Create attributes by applying a regex search on a config.
 
@@ -61,6 +277,8 @@ class RegexStructure(object):
 
     The regex should contain one match group '()'. The search function converts the
     configuration to a list of text strings, and searches for the first hit.
+    All attributes are retrieved in a single pass over the config by an AttributeScanner
+    that is compiled once per class.
 
     The type conversion usually is str, but can be any function.
 
@@ -78,52 +296,128 @@ class RegexStructure(object):
      - define object-list (interfaces etc.)
 
     """
+    __slots__ = ()
     _single_attributes = {}
     _multiple_children = {}
     _single_children = {}
     _json_simplify = []
+    # increase when the parsing in __init__ changes, this invalidates cached objects
+    _parser_version = 1
+    # files larger than this are memory mapped instead of read, see configsource
+    _mmap_threshold = 1 << 20
+    # True if the config is a single configlet, e.g. a policy-map, see _config_tree
+    _configlet = False
 
     def __init__(self, config):
-        if isinstance(config, str):
-            config = config.splitlines
-        config = [line.rstrip() for line in config]
+        block = None
+        if isinstance(config, ConfigBlock):
+            # the lines of a block are already stripped
+            block = config
+            config = block.lines
+        elif not isinstance(config, ConfigLines):
+            # the lines of a ConfigLines are stripped when they are read
+            if isinstance(config, str):
+                config = config.splitlines()
+            config = [line.rstrip() for line in config]
         self.config = config
-        for name, (regex, result_type) in self._single_attributes.items():
-            self._add_single_attribute(name, regex, result_type)
-        for name, (key, result_type) in self._multiple_children.items():
-            self._add_multiple_children(name, key, result_type)
-        for name, (key, result_type) in self._single_children.items():
-            self._add_single_children(name, key, result_type)
-
-    def _add_single_attribute(self, name, regex, result_type):
-        result = search(regex, self.config)
-        if result:
-            result = result_type(result)
-        setattr(self, name, result)
+        timing = instrument.enabled
+        if timing:
+            start = instrument.clock()
+        for name, result in self._attribute_scanner().scan(config):
+            if result:
+                result = self._single_attributes[name][1](result)
+            setattr(self, name, result)
+        if timing:
+            instrument.record('stage', type(self).__name__ + '.attributes', instrument.clock() - start)
+        if self._multiple_children or self._single_children:
+            if block is None:
+                if timing:
+                    start = instrument.clock()
+                block = self._config_tree(config)
+                if timing:
+                    instrument.record('stage', type(self).__name__ + '.tree', instrument.clock() - start)
+            for name, (key, result_type) in self._multiple_children.items():
+                self._add_multiple_children(name, key, result_type, block)
+            for name, (key, result_type) in self._single_children.items():
+                self._add_single_children(name, key, result_type, block)
 
-    def _add_multiple_children(self, name, key, result_type):
+    @classmethod
+    def _config_tree(cls, config):
+        """Returns the block in which the children are searched.
+
+        The config of a _configlet class, e.g. a policy-map, is a single configlet,
+        the children are the blocks within the configlet. A child object that is
+        created by its parent gets its block and does not need the tree."""
+        tree = parse_config_tree(config)
+        if cls._configlet and tree.children:
+            tree = tree.children[0]
+        return tree
+
+    @classmethod
+    def _attribute_scanner(cls):
+        """Returns the AttributeScanner for the _single_attributes of this class."""
+        scanner = _ATTRIBUTE_SCANNERS.get(cls)
+        if scanner is None or scanner.attributes != cls._single_attributes:
+            scanner = AttributeScanner(cls._single_attributes, cls.__name__)
+            _ATTRIBUTE_SCANNERS[cls] = scanner
+        return scanner
+
+    def _add_multiple_children(self, name, key, result_type, block=None):
         result = []
         if hasattr(result_type, '_single_attributes'):
             if 'name' in result_type._single_attributes.keys():
                 result = {}
-        configlets = search_configlets(key, self.config)
-        for configlet in configlets:
-            child = result_type(configlet)
+        if block is None:
+            block = self._config_tree(self.config)
+        for configlet in block.find(key):
+            child = instrument.call('construct', result_type.__name__, result_type, configlet)
             if isinstance(result, dict):
                 result[child.name] = child
             else:
                 result.append(child)
         setattr(self, name, result)
 
-    def _add_single_children(self, name, key, result_type):
+    def _add_single_children(self, name, key, result_type, block=None):
         result = ''
-        configlets = search_configlets(key, self.config)
+        if block is None:
+            block = self._config_tree(self.config)
+        configlets = block.find(key)
         if configlets:
-            result = result_type(configlets[0])
+            result = instrument.call('construct', result_type.__name__, result_type, configlets[0])
         setattr(self, name, result)
 
+    def _attributes(self):
+        """Returns a list of (name, value) of the attributes in __slots__ and __dict__"""
+        result = []
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if name not in ('__dict__', '__weakref__') and hasattr(self, name):
+                    result.append((name, getattr(self, name)))
+        result.extend(getattr(self, '__dict__', {}).items())
+        return result
+
+    def release_config(self, _released=None):
+        """Removes the config lines from this object and all its children to save memory.
+
+        The attributes are not changed, but the config can not be analysed any further."""
+        if _released is None:
+            _released = set()
+        if id(self) in _released:
+            return
+        _released.add(id(self))
+        if hasattr(self, 'config'):
+            del self.config
+        for name, value in self._attributes():
+            if isinstance(value, dict):
+                value = list(value.values())
+            elif not isinstance(value, list):
+                value = [value]
+            for child in value:
+                if isinstance(child, RegexStructure):
+                    child.release_config(_released)
+
     def json(self):
-        r = {k: self._make_json(v) for k, v in self.__dict__.items() if k != 'config'}
+        r = {k: self._make_json(v) for k, v in self._attributes() if k != 'config'}
         for key in self._json_simplify:
             if key in r.keys() and r[key]:
                 if 'name' in r[key].keys():
@@ -154,12 +448,45 @@ class RegexStructure(object):
             return obj
 
     @classmethod
-    def load(cls, filename, path=''):
+    def load(cls, filename, path='', cache=None, keep_config=True):
+        """Loads a config file, returns None if the file has less than 2 lines.
+
+        - cache can be a ParseCache, unchanged files are then loaded from the cache.
+        - keep_config=False releases the config lines after parsing, see release_config.
+        - files larger than _mmap_threshold bytes are memory mapped, see map_config. The
+          mapping is closed after parsing, with keep_config the lines are copied into memory.
+
+        If the instrumentation is enabled, the time to load the file is recorded in
+        the slowest configs, see instrument.slowest."""
+        timing = instrument.enabled
+        if timing:
+            start = instrument.clock()
         path = os.path.join(path, filename)
-        config = ''
-        if os.path.isfile(path):
-            with open(path, 'r') as fp:
-                config = fp.readlines()
+        if cache is not None:
+            result = cache.load(cls, path)
+        else:
+            config = ''
+            if os.path.isfile(path):
+                if os.path.getsize(path) > cls._mmap_threshold:
+                    config = map_config(path)
+                else:
+                    with open(path, 'r') as fp:
+                        config = fp.readlines()
+            if timing:
+                instrument.record('stage', cls.__name__ + '.read', instrument.clock() - start)
+            try:
+                result = cls.from_lines(config)
+            finally:
+                if isinstance(config, ConfigLines):
+                    config.close(keep=keep_config)
+        if result is not None and not keep_config:
+            result.release_config()
+        if timing:
+            instrument.record_config(path, cls.__name__, instrument.clock() - start)
+        return result
+
+    @classmethod
+    def from_lines(cls, config):
         if len(config) < 2:
             return None
-        return cls(config)
+        return instrument.call('construct', cls.__name__, cls, config)
@@ -1,32 +1,92 @@
 from __future__ import print_function
 import re
-from MPLSinventory.regexstructure import RegexStructure
+from collections import namedtuple, OrderedDict
+from MPLSinventory import instrument
+from MPLSinventory.regexstructure import RegexStructure, attribute_slots
 from MPLSinventory.telnet import ShowVersion, ShowIPInterfacesBrief, ShowIPBGPSum
 from MPLSinventory.tools import search, search_all, assign_attr_if_better
-from MPLSinventory.ip_address_tools import IPv4Address, IPv4Interface
+from MPLSinventory.ip_address_tools import IntIPv4Address, IntIPv4Interface
+from MPLSinventory.iptrie import PrefixTrie
+
+
+BGP_neighbor_config = namedtuple('BGP_neighbor_config', ['ip', 'vrf', 'remote_as', 'shutdown',
+                                                         'peer_group', 'update_source', 'description'])
 
 
 class RouterBGP(RegexStructure):
-    """Class that analyses and stores the settings for BGP configuration"""
+    """Class that analyses and stores the settings for BGP configuration
+
+        The neighbor_table has a BGP_neighbor_config for each neighbor ip per vrf,
+        it is built in a single pass over the config.
+
+        neighbor_table[0] -> BGP_neighbor_config(ip=IntIPv4Address('10.0.10.2'), vrf='', remote_as=65012,
+                                                 shutdown=True, peer_group='', update_source='',
+                                                 description='')
+
+        The neighbors are (ip, remote_as) of the neighbors that are not shutdown.
+
+        The vrf of a neighbor is set by the 'address-family ... vrf' line before it, an
+        'address-family' line without a vrf or 'exit-address-family' resets it.
+
+        neighbor_table is part of json(), as a list of dictionaries with the fields of
+        BGP_neighbor_config. InventoryStore reads the bgp_neighbors table from it.
+    """
 
     _single_attributes = {
         'local_as': (r'^s*router\sbgp\s+(\d+)\s*$', int)
     }
 
+    _neighbor_regex = re.compile(r'^\s*neighbor\s+(\d+\.\d+\.\d+\.\d+)\s+(\S+)\s*(.*?)\s*$')
+    _address_family_regex = re.compile(r'^\s*address-family\s+\S+(?:\s+(?!vrf\b)\S+)*(?:\s+vrf\s+(\S+))?')
+    _exit_address_family_regex = re.compile(r'^\s*exit-address-family')
+    _parser_version = 2
+
     def __init__(self, config):
         super(RouterBGP, self).__init__(config)
+        self.neighbor_table = self._get_bgp_neighbor_table()
         self.neighbors = self._get_bgp_neighbors()
 
+    def _get_bgp_neighbor_table(self):
+        settings = OrderedDict()
+        vrf = ''
+        for line in self.config:
+            match = self._neighbor_regex.match(line)
+            if match:
+                neighbor, command, argument = match.groups()
+                neighbor_settings = settings.setdefault((vrf, neighbor), {})
+                if command == 'remote-as':
+                    neighbor_settings['remote_as'] = int(argument) if argument.isdigit() else argument
+                elif command == 'shutdown':
+                    neighbor_settings['shutdown'] = True
+                elif command in ('peer-group', 'update-source', 'description'):
+                    neighbor_settings[command.replace('-', '_')] = argument
+                continue
+            match = self._address_family_regex.match(line)
+            if match:
+                vrf = match.group(1) or ''
+            elif self._exit_address_family_regex.match(line):
+                vrf = ''
+
+        neighbor_table = []
+        for (vrf, neighbor), neighbor_settings in settings.items():
+            neighbor_table.append(BGP_neighbor_config(ip=IntIPv4Address(neighbor),
+                                                      vrf=vrf,
+                                                      remote_as=neighbor_settings.get('remote_as', ''),
+                                                      shutdown=neighbor_settings.get('shutdown', False),
+                                                      peer_group=neighbor_settings.get('peer_group', ''),
+                                                      update_source=neighbor_settings.get('update_source', ''),
+                                                      description=neighbor_settings.get('description', '')))
+        return neighbor_table
+
     def _get_bgp_neighbors(self):
         active_neighbors = []
-        regex = r'^\s*neighbor\s+(\d+\.\d+\.\d+\.\d+)\s+remote-as\s+(\d+)$'
-        all_neighbors = search_all(regex, self.config)
-        for neighbor, remote_as in all_neighbors:
-            regex = r'^\s*neighbor\s+('+neighbor+')\s+shutdown'
-            shutdown = bool(search(regex, self.config))
-            if not shutdown:
-                active_neighbors.append((IPv4Address(neighbor), int(remote_as)))
-        active_neighbors = list(set(active_neighbors))
+        found = set()
+        for neighbor in self.neighbor_table:
+            if isinstance(neighbor.remote_as, int) and not neighbor.shutdown:
+                active_neighbor = (neighbor.ip, neighbor.remote_as)
+                if active_neighbor not in found:
+                    found.add(active_neighbor)
+                    active_neighbors.append(active_neighbor)
         return active_neighbors
 
 
@@ -45,6 +105,7 @@ class QoSClass(RegexStructure):
         'police':            (r'^\s*(?:police|police\srate)\s(\d+)\s*',
                               lambda x: int(x)/1000)
         }
+    __slots__ = attribute_slots(_single_attributes)
 
     def __init__(self, config):
         super(QoSClass, self).__init__(config)
@@ -67,6 +128,7 @@ class QoSPolicy(RegexStructure):
     _multiple_children = {
         'qos_classes': ('class', QoSClass)
     }
+    _configlet = True
 
     def __init__(self, config):
         super(QoSPolicy, self).__init__(config)
@@ -111,12 +173,12 @@ class Interface(RegexStructure):
         'name':               (r'^interface\s(\S+)\s*.*$', str),
         'description':        (r'^\s*description\s+(.+)$', str),
         'ip':                 (r'^\s*ip\saddress\s(\d+\.\d+\.\d+\.\d+\s+\d+\.\d+\.\d+\.\d+)\s*$',
-                               lambda ip: IPv4Interface(re.sub(r'\s+', '/', ip))),
+                               IntIPv4Interface),
         'ip_unnumbered':      (r'^\s*ip\s+unnumbered\s+(\S+)\s*$', str),
         'ip_negotiated':      (r'^\s*ip\saddress\s(negotiated)\s*$', str),
         'admin_bandwidth':    (r'^\s*bandwidth\s+(\d+)', int),
         'hsrp':               (r'^\s*standby\s+\d+\s+ip\s+(\d+\.\d+\.\d+\.\d+)\s*$',
-                               IPv4Address),
+                               IntIPv4Address),
         'policy_in':          (r'^\s*service-policy\s+input\s+(\S+)\s*$', str),
         'policy_out':         (r'^\s*service-policy\s+output\s+(\S+)\s*$', str),
         'atm_bandwidth':      (r'^\s*(?:cbr|vbr-nrt)\s+(\d+)\s*', int),
@@ -127,6 +189,7 @@ class Interface(RegexStructure):
         'dialer_pool_member': (r'^\s*dialer\s+pool-member\s+(\d+)\s*$', int),
         'dial_pool_number':   (r'^\s*.+dial-pool-number\s+(\d+)\s*$', int)
         }
+    __slots__ = attribute_slots(_single_attributes, 'parent', 'status', 'helpers', 'vlan')
 
     _json_simplify = ['parent']
 
@@ -139,7 +202,7 @@ class Interface(RegexStructure):
     def _load_interface_details(self):
         regex = r'^\s*ip\s+helper-address\s+(\d+\.\d+\.\d+\.\d+)\s*$'
         helpers = search_all(regex, self.config)
-        helpers = map(lambda ip: IPv4Address(ip), helpers)
+        helpers = map(IntIPv4Address, helpers)
         self.helpers = list(set(helpers))
 
         regex = r'^\s*Vlan\s*(\d+)\s*$'
@@ -177,16 +240,23 @@ class Router(RegexStructure):
         super(Router, self).__init__(config)
         self._set_parent_interfaces()
 
-    def add_telnet_state(self, ip):
+    @instrument.timed('router.add_telnet_state')
+    def add_telnet_state(self, ip, store=None):
+        """Adds the status of the interfaces and bgp neighbors from the show commands for ip.
+
+        store can be a TelnetStateStore, the show commands are then looked up
+        in the store instead of loaded from the telnet_dir."""
         self.state_found = False
-        self.show_version = ShowVersion.load(ip, self.telnet_dir)
-        self.show_ip_interfaces_brief = ShowIPInterfacesBrief.load(ip, self.telnet_dir)
-        self.show_ip_bgp_sum = ShowIPBGPSum.load(ip, self.telnet_dir)
+        if store is None:
+            self.show_version = ShowVersion.load(ip, self.telnet_dir, keep_config=False)
+            self.show_ip_interfaces_brief = ShowIPInterfacesBrief.load(ip, self.telnet_dir, keep_config=False)
+            self.show_ip_bgp_sum = ShowIPBGPSum.load(ip, self.telnet_dir, keep_config=False)
+        else:
+            self.show_version = store.get(ShowVersion, ip)
+            self.show_ip_interfaces_brief = store.get(ShowIPInterfacesBrief, ip)
+            self.show_ip_bgp_sum = store.get(ShowIPBGPSum, ip)
 
         if self.show_version:
-            del self.show_version.config
-            del self.show_ip_interfaces_brief.config
-            del self.show_ip_bgp_sum.config
             if self.hostname == self.show_version.hostname:
                 self.state_found = True
         if self.state_found:
@@ -194,6 +264,16 @@ class Router(RegexStructure):
             self._set_bgp_status()
             self._set_version()
 
+    def interface_trie(self):
+        """Returns a PrefixTrie of the networks of the interfaces, the values are the interfaces.
+
+        A new trie is built on every call, keep the trie to look up many addresses."""
+        trie = PrefixTrie()
+        for interface in self.interfaces.values():
+            if interface.ip:
+                trie.insert(interface.ip, interface)
+        return trie
+
     def _set_parent_interfaces(self):
         """Sets the parent attribute of an interface to the name of the parent interface.
 
@@ -209,33 +289,40 @@ class Router(RegexStructure):
             if parent in self.interfaces.keys():
                 self.interfaces[name].parent = self.interfaces[parent]
 
+        # index the interfaces that encapsulate a ppp Virtual-Template
+        # and the members of dialer pools, the first interface is used
+        templates = {}
+        dialer_pools = {}
+        regex = r'^\s*encapsulation.+ppp\s*(Virtual-Template\d+)'
+        for interface in self.interfaces.values():
+            template = search(regex, interface.config)
+            if template:
+                templates.setdefault(template, interface)
+            for pool in (interface.dialer_pool_member, interface.dial_pool_number):
+                if pool:
+                    dialer_pools.setdefault(pool, interface)
+
         # find the parent interface for a ppp Virtual-Template
-        for name1 in self.interfaces.keys():
-            if 'Virtual-Template' in name1:
-                for name2, interface2 in self.interfaces.items():
-                    regex = r'^\s*encapsulation.+ppp\s*(Virtual-Template\d+)'
-                    if name1 == search(regex, interface2.config):
-                        self.interfaces[name1].parent = interface2
-                        break
+        for name, interface in self.interfaces.items():
+            if 'Virtual-Template' in name and name in templates:
+                interface.parent = templates[name]
 
         # find the parent interface for dialer interfaces
-        for name1, interface1 in self.interfaces.items():
-            if interface1.dialer_pool:
-                for interface2 in self.interfaces.values():
-                    if interface1.dialer_pool == interface2.dialer_pool_member:
-                        self.interfaces[name1].parent = interface2
-                        break
-                    elif interface1.dialer_pool == interface2.dial_pool_number:
-                        self.interfaces[name1].parent = interface2
-                        break
+        for interface in self.interfaces.values():
+            if interface.dialer_pool in dialer_pools:
+                interface.parent = dialer_pools[interface.dialer_pool]
 
     def _set_interface_status(self):
+        if self.show_ip_interfaces_brief is None:
+            return
         interface_status = self.show_ip_interfaces_brief.interface_status
         for interface in self.interfaces.keys():
             if interface in interface_status.keys():
                 self.interfaces[interface].status = interface_status[interface].status
 
     def _set_bgp_status(self):
+        if self.show_ip_bgp_sum is None or not self.bgp:
+            return
         bgp_neighbor_status = self.show_ip_bgp_sum.neighbors
         if bgp_neighbor_status:
             for neighbor, asnr in self.bgp.neighbors:
@@ -279,12 +366,15 @@ class MPLSRouter(Router):
         self.pair_with = ''
 
     def _get_wan_interface(self):
+        """Returns the interface with the longest network that contains the bgp wan neighbor.
+
+        Called once per router, the trie of interface_trie is not kept."""
         wan = ''
         bgp_wan_ip = self._bgp_wan_neighbor()
         if bgp_wan_ip:
-            for name, interface in self.interfaces.items():
-                if interface.ip and bgp_wan_ip in interface.ip.network:
-                    wan = interface
+            interfaces = self.interface_trie().lookup(bgp_wan_ip)
+            if interfaces:
+                wan = interfaces[-1]
         return wan
 
     def _bgp_wan_neighbor(self):
@@ -0,0 +1,282 @@
+from __future__ import print_function
+import os
+import json
+import time
+import threading
+import traceback
+from MPLSinventory.router import MPLSRouter
+from MPLSinventory.tools import list_files, attribute_getter, iter_dict_from_objects, load_file
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+"""Module that keeps an inventory up to date while the configurations change.
+
+   The InventoryService polls the config and telnet directories, only the
+   configurations that changed (or whose telnet outputs changed) are parsed
+   again. The inventory is served as json over http:
+
+   - GET /inventory             all routers
+   - GET /inventory/<hostname>  a single router
+   - GET /status                number of routers, errors and refresh statistics
+
+   >>> service = InventoryService(ROUTER_DIR, TELNET_DIR, attributes=['hostname', 'bandwidth'])
+   >>> service.start(interval=300)
+   >>> service.serve(port=8080)
+   >>> service.stop()
+"""
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime, stat.st_size
+
+
+def _missing_show_commands(obj, ip):
+    """Returns an error if some, but not all, show commands for ip were found, else None"""
+    outputs = [(name, getattr(obj, name, None))
+               for name in ('show_version', 'show_ip_interfaces_brief', 'show_ip_bgp_sum')]
+    missing = [name for name, output in outputs if output is None]
+    if missing and len(missing) < len(outputs):
+        return 'incomplete telnet state for {}, missing {}'.format(ip, ', '.join(missing))
+    return None
+
+
+class InventoryService(object):
+    """Keeps the objects and inventory dict for the configs in config_dir up to date.
+
+    - result_type, regex and id are used as in read_files_to_objects.
+    - attributes are the attributes per router in the inventory, see create_dict_from_objects.
+      all attributes (obj.json()) are used if no attributes are given.
+    - telnet_dir is the directory with the show command outputs, see ParseShowCommand.
+      the telnet state of a router is added with the ip found with ip_attribute.
+    - cache can be a ParseCache, reparsing a router for a changed telnet output
+      then reads the config from the cache.
+    """
+
+    def __init__(self, config_dir, telnet_dir=None, result_type=MPLSRouter, regex=r'(.+)',
+                 id='hostname', attributes=None, ip_attribute="interfaces['Loopback1'].ip.ip",
+                 cache=None):
+        self.config_dir = config_dir
+        self.telnet_dir = telnet_dir
+        self.result_type = result_type
+        self.regex = regex
+        self.id = id
+        self.attributes = attributes or []
+        self.ip_attribute = ip_attribute
+        self.cache = cache
+
+        self.inventory = {}
+        self.objects = {}
+        self.errors = {}
+        self.refreshes = 0
+        self.last_refresh = None
+        self.last_parsed = 0
+        self.refresh_time = 0.0
+        self.refresh_error = None
+        self.failed_refreshes = 0
+
+        self._config_files = {}     # file_name: (mtime, size)
+        self._telnet_files = {}     # path: (mtime, size)
+        self._keys = {}             # file_name: inventory key
+        self._ips = {}              # file_name: telnet ip
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._poller = None
+        self._server = None
+
+    def refresh(self):
+        """Parses the new and changed files again and updates the inventory.
+
+        Returns the file names of the configs that were parsed."""
+        with self._refresh_lock:
+            start = time.time()
+            config_files = self._scan_config_files()
+            changed = set(file_name for file_name, signature in config_files.items()
+                          if self._config_files.get(file_name) != signature)
+            removed = set(self._config_files) - set(config_files)
+
+            telnet_files = self._scan_telnet_files()
+            changed_paths = set(path for path in set(telnet_files) | set(self._telnet_files)
+                                if telnet_files.get(path) != self._telnet_files.get(path))
+            changed_ips = set(os.path.splitext(os.path.basename(path))[0] for path in changed_paths)
+            changed.update(file_name for file_name, ip in self._ips.items()
+                           if ip in changed_ips and file_name in config_files)
+
+            updates = {}
+            for file_name in sorted(changed):
+                updates[file_name] = self._parse(file_name)
+
+            with self._lock:
+                for file_name in removed:
+                    self._remove(file_name)
+                    self._ips.pop(file_name, None)
+                    self.errors.pop(file_name, None)
+                for file_name, (obj, key, value, ip, error) in updates.items():
+                    self._remove(file_name)
+                    self._ips[file_name] = ip
+                    self.errors.pop(file_name, None)
+                    if error:
+                        self.errors[file_name] = error
+                    if obj is not None:
+                        self.objects[file_name] = obj
+                        self._keys[file_name] = key
+                        self.inventory[key] = value
+                self._config_files = config_files
+                self._telnet_files = telnet_files
+                self.refreshes += 1
+                self.last_refresh = time.time()
+                self.last_parsed = len(changed)
+                self.refresh_time = self.last_refresh - start
+            return sorted(changed)
+
+    def _scan_config_files(self):
+        return dict((file_name, _file_signature(os.path.join(self.config_dir, file_name)))
+                    for file_name in list_files(self.regex, self.config_dir))
+
+    def _scan_telnet_files(self):
+        telnet_files = {}
+        if self.telnet_dir and os.path.isdir(self.telnet_dir):
+            for sub_dir in sorted(os.listdir(self.telnet_dir)):
+                sub_path = os.path.join(self.telnet_dir, sub_dir)
+                if os.path.isdir(sub_path):
+                    for file_name in list_files(r'(.+\.txt)$', sub_path):
+                        path = os.path.join(sub_path, file_name)
+                        telnet_files[path] = _file_signature(path)
+        return telnet_files
+
+    def _parse(self, file_name):
+        """Returns (obj, key, json_object, ip, error) for a config file.
+
+        obj is None if the file could not be parsed or the telnet state could not
+        be added, error is then the traceback or None. If only some of the show
+        commands of a router are found, e.g. while the collector writes them, obj
+        is returned and error lists the missing show commands."""
+        obj, error = load_file(self.result_type, file_name, self.config_dir, capture_errors=True, cache=self.cache)
+        ip = ''
+        if obj is None:
+            return None, None, None, ip, error
+        try:
+            if self.telnet_dir:
+                try:
+                    ip = attribute_getter(self.ip_attribute)(obj)
+                except (AttributeError, KeyError, IndexError, TypeError):
+                    ip = ''
+                if ip:
+                    ip = str(ip)
+                    obj.telnet_dir = self.telnet_dir
+                    obj.add_telnet_state(ip)
+                    error = _missing_show_commands(obj, ip)
+            obj.release_config()
+            key = getattr(obj, self.id, file_name)
+            _, value = next(iter_dict_from_objects([(key, obj)], self.attributes))
+        except Exception:
+            return None, None, None, ip, traceback.format_exc()
+        return obj, key, value, ip, error
+
+    def _remove(self, file_name):
+        self.objects.pop(file_name, None)
+        if file_name in self._keys:
+            key = self._keys.pop(file_name)
+            if key not in self._keys.values():
+                self.inventory.pop(key, None)
+
+    def get(self, key=None):
+        """Returns a copy of the inventory, or the json object of a single router"""
+        with self._lock:
+            if key is None:
+                return dict(self.inventory)
+            return self.inventory.get(key)
+
+    def status(self):
+        with self._lock:
+            return {'routers': len(self.inventory),
+                    'files': len(self._config_files),
+                    'errors': sorted(self.errors),
+                    'refreshes': self.refreshes,
+                    'last_refresh': self.last_refresh,
+                    'last_parsed': self.last_parsed,
+                    'refresh_time': self.refresh_time,
+                    'refresh_error': self.refresh_error,
+                    'failed_refreshes': self.failed_refreshes}
+
+    def start(self, interval=60):
+        """Refreshes the inventory every interval seconds in a background thread.
+
+        A refresh that fails, e.g. because the config_dir is not available, does not
+        stop the polling. The traceback is stored in refresh_error, see status."""
+        self._stop.clear()
+
+        def poll():
+            while not self._stop.is_set():
+                try:
+                    self.refresh()
+                except Exception:
+                    with self._lock:
+                        self.refresh_error = traceback.format_exc()
+                        self.failed_refreshes += 1
+                else:
+                    with self._lock:
+                        self.refresh_error = None
+                self._stop.wait(interval)
+
+        self._poller = threading.Thread(target=poll)
+        self._poller.daemon = True
+        self._poller.start()
+
+    def serve(self, host='127.0.0.1', port=8080):
+        """Serves the inventory over http in a background thread, returns the (host, port)"""
+        self._server = _InventoryHTTPServer((host, port), _InventoryHandler)
+        self._server.service = self
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self._server.server_address
+
+    def stop(self):
+        self._stop.set()
+        if self._poller is not None:
+            self._poller.join()
+            self._poller = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class _InventoryHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _InventoryHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        service = self.server.service
+        parts = [part for part in self.path.split('?')[0].split('/') if part]
+        result = None
+        if parts == ['inventory']:
+            result = service.get()
+        elif len(parts) == 2 and parts[0] == 'inventory':
+            result = service.get(parts[1])
+        elif parts == ['status']:
+            result = service.status()
+        if result is None:
+            self._send(404, {'error': 'not found: {}'.format(self.path)})
+        else:
+            self._send(200, result)
+
+    def _send(self, code, result):
+        body = json.dumps(result, indent=4, sort_keys=True).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
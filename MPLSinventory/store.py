@@ -0,0 +1,287 @@
+from __future__ import print_function
+import json
+import time
+import sqlite3
+import hashlib
+from MPLSinventory.ip_address_tools import IntIPv4Interface, prefix_mask
+
+
+"""Module that stores the json_objects of MPLSRouters in normalized SQLite tables.
+
+   Instead of loading the complete json file of save_dict_as_json, the routers
+   can be looked up in the store:
+
+   >>> store = InventoryStore('inventory.sqlite')
+   >>> store.upsert(create_dict_from_objects(routers))
+   {'inserted': 2, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+   >>> store.find_by_subnet('192.168.100.1')
+   ['router-1-eth']
+   >>> store.get('router-1-eth')['bandwidth']
+   19800.0
+
+   The tables are routers, interfaces, qos_policies and bgp_neighbors. IP
+   addresses are stored as text and as integers, with the first and last
+   address of the network. The subnet queries look up the first addresses of
+   the networks that can contain an address in an index, see _containing.
+"""
+
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS routers ('
+    'hostname TEXT PRIMARY KEY, loopback_ip TEXT, loopback_int INTEGER, local_as INTEGER, '
+    'wan TEXT, wan_network TEXT, wan_start INTEGER, wan_end INTEGER, bandwidth REAL, '
+    'digest TEXT, updated REAL, data TEXT)',
+    'CREATE INDEX IF NOT EXISTS routers_loopback ON routers (loopback_int)',
+    'CREATE INDEX IF NOT EXISTS routers_wan ON routers (wan_start, wan_end)',
+    'CREATE INDEX IF NOT EXISTS routers_local_as ON routers (local_as)',
+    'CREATE TABLE IF NOT EXISTS interfaces ('
+    'hostname TEXT, name TEXT, ip TEXT, ip_int INTEGER, network_start INTEGER, network_end INTEGER, '
+    'description TEXT, status TEXT, policy_in TEXT, policy_out TEXT, parent TEXT, data TEXT, '
+    'PRIMARY KEY (hostname, name))',
+    'CREATE INDEX IF NOT EXISTS interfaces_network ON interfaces (network_start, network_end)',
+    'CREATE TABLE IF NOT EXISTS qos_policies ('
+    'hostname TEXT, name TEXT, shaper REAL, qos_bandwidth REAL, sub_policy TEXT, priority_class TEXT, '
+    'data TEXT, PRIMARY KEY (hostname, name))',
+    'CREATE TABLE IF NOT EXISTS bgp_neighbors ('
+    'hostname TEXT, vrf TEXT, ip TEXT, ip_int INTEGER, remote_as, shutdown INTEGER, peer_group TEXT, '
+    'update_source TEXT, description TEXT, PRIMARY KEY (hostname, vrf, ip))',
+    'CREATE INDEX IF NOT EXISTS bgp_neighbors_ip ON bgp_neighbors (ip_int)',
+]
+
+# table: (columns, number of primary key columns after the hostname)
+CHILD_TABLES = {
+    'interfaces': (('hostname', 'name', 'ip', 'ip_int', 'network_start', 'network_end', 'description',
+                    'status', 'policy_in', 'policy_out', 'parent', 'data'), 1),
+    'qos_policies': (('hostname', 'name', 'shaper', 'qos_bandwidth', 'sub_policy', 'priority_class',
+                      'data'), 1),
+    'bgp_neighbors': (('hostname', 'vrf', 'ip', 'ip_int', 'remote_as', 'shutdown', 'peer_group',
+                       'update_source', 'description'), 2),
+}
+
+
+def ip_range(address):
+    """Returns (ip, first, last) as integers for '10.0.0.1/30' or '10.0.0.1', None if there is no address.
+
+    A ValueError is raised for an invalid address, see ip_address_tools.ip_to_int."""
+    if not address:
+        return None
+    interface = IntIPv4Interface(str(address))
+    network = interface.network
+    return int(interface.ip), int(network.network_address), int(network.broadcast_address)
+
+
+def _ip_int(address):
+    return ip_range(address)[0]
+
+
+def _containing(start_column, end_column, ip):
+    """Returns (condition, parameters) for the rows with a network from start_column to end_column that contains ip.
+
+    The first address of such a network is ip with the mask of one of the 33 prefix
+    lengths, these are looked up in the index on (start_column, end_column)."""
+    starts = sorted(set(ip & prefix_mask(length) for length in range(33)))
+    return ('{} IN ({}) AND {}>=?'.format(start_column, ', '.join('?' * len(starts)), end_column),
+            starts + [ip])
+
+
+def _null(value):
+    """'' is used by the parser for a value that is not found, it is stored as NULL"""
+    return None if value == '' else value
+
+
+def _name(value):
+    """Returns the name of a child object, e.g. the parent of an interface, or the value"""
+    if isinstance(value, dict):
+        return value.get('name', '')
+    return value
+
+
+def _interface_row(hostname, interface):
+    ip = ip_range(interface.get('ip'))
+    return (hostname, interface['name'], _null(interface.get('ip', '')),
+            ip[0] if ip else None, ip[1] if ip else None, ip[2] if ip else None,
+            _null(interface.get('description', '')), _null(interface.get('status', '')),
+            _null(interface.get('policy_in', '')), _null(interface.get('policy_out', '')),
+            _null(_name(interface.get('parent', ''))), json.dumps(interface, sort_keys=True))
+
+
+def _qos_policy_row(hostname, qos_policy):
+    return (hostname, qos_policy['name'], _null(qos_policy.get('shaper', '')),
+            _null(qos_policy.get('qos_bandwidth', '')), _null(qos_policy.get('sub_policy', '')),
+            _null(_name(qos_policy.get('priority_class', ''))), json.dumps(qos_policy, sort_keys=True))
+
+
+def _bgp_neighbor_row(hostname, neighbor):
+    return (hostname, neighbor.get('vrf', ''), neighbor['ip'], _ip_int(neighbor['ip']),
+            _null(neighbor.get('remote_as', '')), int(bool(neighbor.get('shutdown'))),
+            _null(neighbor.get('peer_group', '')), _null(neighbor.get('update_source', '')),
+            _null(neighbor.get('description', '')))
+
+
+class InventoryStore(object):
+    """Inventory of MPLSRouter json_objects in a SQLite database.
+
+       - filename is the SQLite database, it is created if it does not exist.
+       - loopback is the name of the interface that is stored as loopback_ip
+
+       upsert only writes the routers that changed since the previous run, and
+       within a changed router only the interfaces, qos policies and bgp
+       neighbors that changed.
+    """
+
+    def __init__(self, filename, loopback='Loopback1'):
+        self.filename = filename
+        self.loopback = loopback
+        self._connection = None
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            connection = sqlite3.connect(self.filename, timeout=60, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def upsert(self, routers, delete_missing=False):
+        """Stores the json_objects of routers, returns the number of inserted, updated, unchanged
+        and deleted routers.
+
+        - routers is a dictionary of json_objects, e.g. from create_dict_from_objects without
+          attributes, or an iterable of (key, json_object) pairs. The key is used as hostname.
+        - delete_missing=True deletes the routers that are not in routers
+        """
+        result = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+        if isinstance(routers, dict):
+            routers = routers.items()
+        digests = dict(self.connection.execute('SELECT hostname, digest FROM routers'))
+        seen = set()
+        with self.connection:
+            for hostname, json_object in routers:
+                seen.add(hostname)
+                digest = hashlib.sha1(json.dumps(json_object, sort_keys=True, default=str)
+                                      .encode('utf-8')).hexdigest()
+                if digests.get(hostname) == digest:
+                    result['unchanged'] += 1
+                    continue
+                result['updated' if hostname in digests else 'inserted'] += 1
+                self._write_router(hostname, json_object, digest)
+            if delete_missing:
+                for hostname in set(digests) - seen:
+                    self._delete_router(hostname)
+                    result['deleted'] += 1
+        return result
+
+    def upsert_objects(self, objects, delete_missing=False):
+        """Stores objects, e.g. the MPLSRouters of read_files_to_objects, see upsert"""
+        if isinstance(objects, dict):
+            objects = objects.items()
+        return self.upsert(((key, obj.json()) for key, obj in objects), delete_missing=delete_missing)
+
+    def _write_router(self, hostname, json_object, digest):
+        interfaces = json_object.get('interfaces') or {}
+        loopback = interfaces.get(self.loopback, {}).get('ip', '')
+        loopback_ip = loopback.split('/')[0] if loopback else None
+        wan = _name(json_object.get('wan') or '')
+        wan_network = interfaces.get(wan, {}).get('ip', '') if wan else ''
+        wan_range = ip_range(wan_network)
+        self.connection.execute('INSERT OR REPLACE INTO routers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                (hostname, loopback_ip, _ip_int(loopback_ip) if loopback_ip else None,
+                                 _null(json_object.get('local_as', '')), _null(wan), _null(wan_network),
+                                 wan_range[1] if wan_range else None, wan_range[2] if wan_range else None,
+                                 _null(json_object.get('bandwidth', '')), digest, time.time(),
+                                 json.dumps(json_object, sort_keys=True, default=str)))
+
+        bgp = json_object.get('bgp') or {}
+        rows = {'interfaces': [_interface_row(hostname, interface) for interface in interfaces.values()],
+                'qos_policies': [_qos_policy_row(hostname, qos_policy) for qos_policy in
+                                 (json_object.get('qos_policies') or {}).values()],
+                'bgp_neighbors': [_bgp_neighbor_row(hostname, neighbor) for neighbor in
+                                  bgp.get('neighbor_table', [])]}
+        for table, table_rows in rows.items():
+            self._write_rows(table, hostname, table_rows)
+
+    def _write_rows(self, table, hostname, rows):
+        """Replaces the rows of hostname in table, only the rows that changed are written"""
+        columns, key_length = CHILD_TABLES[table]
+        existing = dict((row[:key_length + 1], row) for row in
+                        self.connection.execute('SELECT {} FROM {} WHERE hostname=?'.format(
+                            ', '.join(columns), table), (hostname,)))
+        new = dict((row[:key_length + 1], row) for row in rows)
+        key_columns = ' AND '.join('{}=?'.format(column) for column in columns[:key_length + 1])
+        self.connection.executemany('DELETE FROM {} WHERE {}'.format(table, key_columns),
+                                    [key for key in existing if key not in new])
+        self.connection.executemany('INSERT OR REPLACE INTO {} VALUES ({})'.format(
+                                    table, ', '.join('?' * len(columns))),
+                                    [row for key, row in new.items() if existing.get(key) != row])
+
+    def _delete_router(self, hostname):
+        for table in ['routers'] + sorted(CHILD_TABLES):
+            self.connection.execute('DELETE FROM {} WHERE hostname=?'.format(table), (hostname,))
+
+    def get(self, hostname):
+        """Returns the json_object of a router, or None"""
+        row = self.connection.execute('SELECT data FROM routers WHERE hostname=?', (hostname,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, hostnames):
+        """Returns a dictionary hostname -> json_object for the hostnames that are stored"""
+        result = {}
+        for hostname in hostnames:
+            json_object = self.get(hostname)
+            if json_object is not None:
+                result[hostname] = json_object
+        return result
+
+    def hostnames(self):
+        return [row[0] for row in self.connection.execute('SELECT hostname FROM routers ORDER BY hostname')]
+
+    def find_by_loopback(self, ip):
+        return self._hostnames('SELECT hostname FROM routers WHERE loopback_int=?', (_ip_int(ip),))
+
+    def find_by_local_as(self, local_as):
+        return self._hostnames('SELECT hostname FROM routers WHERE local_as=?', (int(local_as),))
+
+    def find_by_subnet(self, ip):
+        """Returns the hostnames of the routers with a wan subnet that contains ip"""
+        condition, parameters = _containing('wan_start', 'wan_end', _ip_int(ip))
+        return self._hostnames('SELECT hostname FROM routers WHERE ' + condition, parameters)
+
+    def find_interfaces(self, ip):
+        """Returns (hostname, interface name) for the interfaces with a network that contains ip"""
+        condition, parameters = _containing('network_start', 'network_end', _ip_int(ip))
+        return self.connection.execute('SELECT hostname, name FROM interfaces WHERE ' + condition +
+                                       ' ORDER BY hostname, name', parameters).fetchall()
+
+    def bgp_neighbors(self, hostname=None, ip=None, remote_as=None):
+        """Returns the bgp neighbors as dictionaries, filtered by hostname, neighbor ip and remote_as"""
+        conditions = []
+        parameters = []
+        for column, value in (('hostname', hostname), ('ip_int', ip and _ip_int(ip)), ('remote_as', remote_as)):
+            if value is not None:
+                conditions.append('{}=?'.format(column))
+                parameters.append(value)
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+        return self.query('SELECT hostname, vrf, ip, remote_as, shutdown, peer_group, update_source, '
+                          'description FROM bgp_neighbors' + where + ' ORDER BY hostname, vrf, ip_int',
+                          parameters)
+
+    def query(self, sql, parameters=()):
+        """Executes a SELECT statement, returns a list of dictionaries column -> value"""
+        cursor = self.connection.execute(sql, parameters)
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def _hostnames(self, sql, parameters):
+        return sorted(row[0] for row in self.connection.execute(sql, parameters))
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM routers').fetchone()[0]
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
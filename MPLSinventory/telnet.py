@@ -3,8 +3,8 @@ import os
 import sys
 from collections import namedtuple
 from MPLSinventory.regexstructure import RegexStructure
-from MPLSinventory.tools import search, search_all
-from MPLSinventory.ip_address_tools import IPv4Address
+from MPLSinventory.tools import search, search_all, read_files_to_objects
+from MPLSinventory.ip_address_tools import IntIPv4Address
 
 
 """Module that provides classes to analyse and store the output of CLI commands
@@ -46,15 +46,17 @@ class ParseShowCommand(RegexStructure):
         The 'load' method adds the ip address as a text attribute to the created object.
 
         The _showcommand class variable can be set to the correct subdirectory by the
-        Sub Classes.
+        Sub Classes, the _cli_command is the command that the collector executes
+        on the device to create the file.
     """
     _showcommand = ''
+    _cli_command = ''
 
     def __init__(self, config):
         super(ParseShowCommand, self).__init__(config)
 
     @classmethod
-    def load(cls, ip, path=''):
+    def load(cls, ip, path='', cache=None, keep_config=True):
         """Loads outputs of telnet show commands.
 
            The directory is the path + the class variable _showcommand.
@@ -72,7 +74,7 @@ class ParseShowCommand(RegexStructure):
             filename = filename + '.txt'
         if not path.endswith(cls._showcommand):
             path = os.path.join(path, cls._showcommand)
-        result = super(ParseShowCommand, cls).load(filename, path)
+        result = super(ParseShowCommand, cls).load(filename, path, cache=cache, keep_config=keep_config)
         if result:
             result.ip = filename[:-4]   # remove '.txt' extension
         return result
@@ -97,6 +99,7 @@ class ShowVersion(ParseShowCommand):
     """
 
     _showcommand = 'version'
+    _cli_command = 'show version'
 
     _single_attributes = {
         'model': (r'^\s*.isco\s+(\S+).+memory\.\s*$', str),
@@ -120,6 +123,7 @@ class ShowVersion(ParseShowCommand):
 class ShowInventory(ParseShowCommand):
     # add docstring
     _showcommand = 'inventory'
+    _cli_command = 'show inventory'
     # _single_attributes = {
     #     'chassis_vid': (r'NAME:\s+"Chassis".+\n.+VID:\s+(.+),', str)
     # }
@@ -143,6 +147,7 @@ class ShowInventory(ParseShowCommand):
 class ShowStandby(ParseShowCommand):
     # add docstring
     _showcommand = 'standby'
+    _cli_command = 'show standby'
     _single_attributes = {
         'standby_status': (r'^\s+State\s+is\s+(\w+)\s*$', str)
     }
@@ -178,6 +183,7 @@ class ShowIPInterfacesBrief(ParseShowCommand):
        """
 
     _showcommand = 'int'
+    _cli_command = 'show ip interface brief'
 
     def __init__(self, config):
         super(ShowIPInterfacesBrief, self).__init__(config)
@@ -235,7 +241,7 @@ class ShowIPBGPSum(ParseShowCommand):
 
         c.neighbors.keys() -> ['10.0.10.2', '10.0.10.3', '192.168.100.1']
 
-        c.neighbor['10.0.10.2'].ip -> IPv4Address('10.0.10.2')
+        c.neighbor['10.0.10.2'].ip -> IntIPv4Address('10.0.10.2')
         c.neighbor['10.0.10.2'].remote_as -> 65012
         c.neighbor['10.0.10.2'].up_down -> 'never'
         c.neighbor['10.0.10.2'].state -> 'Idle (Admin)'
@@ -245,6 +251,8 @@ class ShowIPBGPSum(ParseShowCommand):
        """
 
     _showcommand = 'bgp'
+    _cli_command = 'show ip bgp summary'
+    _parser_version = 2
 
     def __init__(self, config):
         super(ShowIPBGPSum, self).__init__(config)
@@ -256,7 +264,56 @@ class ShowIPBGPSum(ParseShowCommand):
         for neighbor, remote_as, up_down, state in search_all(regex, self.config):
             if state.isdigit():
                 state = int(state)
-            self.neighbors[neighbor] = BGP_neighbor(ip=IPv4Address(neighbor),
+            self.neighbors[neighbor] = BGP_neighbor(ip=IntIPv4Address(neighbor),
                                                     remote_as=int(remote_as),
                                                     up_down=up_down,
                                                     state=state)
+
+
+class TelnetStateStore(object):
+    """ Class that loads the outputs of the show commands for all devices at once.
+
+        Every subdirectory of the telnet directory is listed once and parsed with
+        read_files_to_objects, optionally in a pool of worker processes. The
+        results are indexed by the IP address in the filename:
+
+        store = TelnetStateStore('telnet', workers=4)
+        store.get(ShowVersion, '192.168.0.92').hostname -> 'router-1-eth'
+        router.add_telnet_state('192.168.0.92', store=store)
+
+        The config of the show commands is released after parsing.
+        Missing subdirectories are skipped, errors and cache are passed to
+        read_files_to_objects.
+    """
+
+    show_commands = (ShowVersion, ShowIPInterfacesBrief, ShowIPBGPSum, ShowStandby, ShowInventory)
+
+    def __init__(self, path='', show_commands=None, workers=1, errors=None, cache=None):
+        self.path = path
+        if show_commands is not None:
+            self.show_commands = tuple(show_commands)
+        self.outputs = {}
+        for show_command in self.show_commands:
+            directory = os.path.join(path, show_command._showcommand)
+            if os.path.isdir(directory):
+                self.outputs[show_command] = read_files_to_objects(directory, show_command, regex=r'(.+\.txt)$',
+                                                                   id='ip', workers=workers, errors=errors,
+                                                                   cache=cache, keep_config=False)
+            else:
+                self.outputs[show_command] = {}
+
+    def get(self, show_command, ip):
+        """returns the parsed output of show_command for ip, or None"""
+        return self.outputs.get(show_command, {}).get(str(ip))
+
+    def ips(self):
+        result = set()
+        for outputs in self.outputs.values():
+            result.update(outputs)
+        return sorted(result)
+
+    def __contains__(self, ip):
+        return any(str(ip) in outputs for outputs in self.outputs.values())
+
+    def __len__(self):
+        return len(self.ips())
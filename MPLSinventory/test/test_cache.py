@@ -0,0 +1,75 @@
+from __future__ import print_function
+import unittest
+import os
+import shutil
+import tempfile
+import MPLSinventory.tools as tools
+from MPLSinventory.cache import ParseCache, parser_fingerprint
+from MPLSinventory.router import MPLSRouter, Interface
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+ROUTER_DIR = os.path.join(BASE_PATH, 'sample_configs')
+FILENAME_ETH = 'router_1_eth_conf.cfg'
+
+
+class ChangedInterface(Interface):
+    _single_attributes = dict(Interface._single_attributes)
+    _single_attributes['mtu'] = (r'^\s*ip\s+mtu\s+(\d+)\s*$', int)
+
+
+class TestParseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config_dir = os.path.join(self.tmp_dir, 'configs')
+        shutil.copytree(ROUTER_DIR, self.config_dir)
+        self.cache = ParseCache(os.path.join(self.tmp_dir, 'cache.sqlite'))
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_load_from_cache(self):
+        r1 = MPLSRouter.load(FILENAME_ETH, self.config_dir, cache=self.cache)
+        r2 = MPLSRouter.load(FILENAME_ETH, self.config_dir, cache=self.cache)
+        self.assertEqual((1, 1), (self.cache.misses, self.cache.hits))
+        self.assertEqual(r1.json(), r2.json())
+
+    def test_form_feed(self):
+        path = os.path.join(self.config_dir, FILENAME_ETH)
+        with open(path) as fp:
+            config = fp.read().replace('*** LAN interface ***', 'LAN\x0c200  *** wireless lan ***')
+        with open(path, 'w') as fp:
+            fp.write(config)
+        router = MPLSRouter.load(FILENAME_ETH, self.config_dir)
+        cached = MPLSRouter.load(FILENAME_ETH, self.config_dir, cache=self.cache)
+        self.assertEqual(router.json(), cached.json())
+        self.assertEqual(router.config, cached.config)
+
+    def test_changed_file(self):
+        MPLSRouter.load(FILENAME_ETH, self.config_dir, cache=self.cache)
+        with open(os.path.join(self.config_dir, FILENAME_ETH), 'a') as fp:
+            fp.write('hostname changed\n')
+        MPLSRouter.load(FILENAME_ETH, self.config_dir, cache=self.cache)
+        self.assertEqual((2, 0), (self.cache.misses, self.cache.hits))
+        self.assertEqual(1, len(self.cache))
+
+    def test_read_files_to_objects(self):
+        routers1 = tools.read_files_to_objects(self.config_dir, MPLSRouter, id='hostname',
+                                               cache=self.cache)
+        routers2 = tools.read_files_to_objects(self.config_dir, MPLSRouter, id='hostname',
+                                               cache=self.cache, workers=2)
+        self.assertEqual(list(routers1.keys()), list(routers2.keys()))
+        self.assertEqual(2, self.cache.misses)
+
+    def test_fingerprint_changes_with_attributes(self):
+        self.assertNotEqual(parser_fingerprint(Interface), parser_fingerprint(ChangedInterface))
+
+    def test_lru_eviction(self):
+        self.cache.max_bytes = 1
+        tools.read_files_to_objects(self.config_dir, MPLSRouter, cache=self.cache)
+        self.assertEqual(0, len(self.cache))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+from __future__ import print_function
+import unittest
+import os
+import re
+import shutil
+import asyncio
+import tempfile
+from MPLSinventory.collector import Collector, TelnetTransport, TransportError
+from MPLSinventory.telnet import ShowVersion, ShowIPInterfacesBrief, ShowIPBGPSum, TelnetStateStore
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+TELNET_DIR = os.path.join(BASE_PATH, 'sample_telnet')
+IP1 = '192.168.0.92'
+IP2 = '192.168.1.92'
+SHOW_COMMANDS = (ShowVersion, ShowIPInterfacesBrief, ShowIPBGPSum)
+
+
+def sample_output(show_command, ip):
+    """Returns the output of a sample file without the command and the hostname line"""
+    with open(os.path.join(TELNET_DIR, show_command._showcommand, ip + '.txt')) as fp:
+        lines = fp.read().rstrip().splitlines()
+    if lines[-1] == ShowVersion.load(ip, TELNET_DIR).hostname:
+        lines = lines[:-1]
+    return '\n'.join(lines[1:])
+
+
+class FakeDevice(object):
+    """A telnet server that answers the show commands with the sample outputs.
+
+    The username selects the device, a username of 'slow' never answers.
+    A split_line is sent before each output, in a separate packet."""
+
+    def __init__(self, split_line=None):
+        self.logins = 0
+        self.split_line = split_line
+
+    async def handle(self, reader, writer):
+        try:
+            writer.write(bytes([255, 251, 1, 255, 251, 3]) + b'\r\nUser Access Verification\r\n\r\nUsername: ')
+            # remove the replies to the telnet options
+            ip = re.sub(b'\xff[\xfb-\xfe].', b'', await reader.readline()).decode().strip()
+            writer.write(b'Password: ')
+            await reader.readline()
+            self.logins += 1
+            if ip == 'slow':
+                await asyncio.sleep(60)
+            hostname = ShowVersion.load(ip, TELNET_DIR).hostname
+            outputs = dict((show_command._cli_command, show_command) for show_command in SHOW_COMMANDS)
+            writer.write('\r\n{}#'.format(hostname).encode())
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode().strip()
+                output = ''
+                if command in outputs:
+                    output = sample_output(outputs[command], ip).replace('\n', '\r\n')
+                if self.split_line and command != 'terminal length 0':
+                    writer.write('{}\r\n{}\r\n'.format(command, self.split_line).encode())
+                    await writer.drain()
+                    await asyncio.sleep(0.05)
+                    writer.write('{}\r\n{}#'.format(output, hostname).encode())
+                else:
+                    writer.write('{}\r\n{}\r\n{}#'.format(command, output, hostname).encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+class FlakyTransport(object):
+    """A transport that fails the first connect, and counts the concurrent sessions"""
+    attempts = {}
+    active = 0
+    max_active = 0
+
+    def __init__(self, ip):
+        self.ip = ip
+        self.hostname = 'router-' + ip
+
+    async def connect(self):
+        FlakyTransport.attempts[self.ip] = FlakyTransport.attempts.get(self.ip, 0) + 1
+        if FlakyTransport.attempts[self.ip] == 1:
+            raise TransportError('connection refused')
+        FlakyTransport.active += 1
+        FlakyTransport.max_active = max(FlakyTransport.max_active, FlakyTransport.active)
+        await asyncio.sleep(0.01)
+
+    async def run(self, command):
+        return '{} uptime is 1 week'.format(self.hostname)
+
+    async def close(self):
+        if FlakyTransport.attempts[self.ip] > 1:
+            FlakyTransport.active -= 1
+
+
+class BrokenTransport(FlakyTransport):
+    """A transport that raises an unexpected error for the ips that end with .13"""
+
+    async def connect(self):
+        if self.ip.endswith('.13'):
+            raise ValueError('unexpected output')
+
+    async def close(self):
+        pass
+
+
+class TestCollector(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def collect(self, ips, device=None, **kwargs):
+        """Collects the ips from a fake device server, returns the errors"""
+        device = device or FakeDevice()
+
+        async def run():
+            server = await asyncio.start_server(device.handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            transport = lambda ip: TelnetTransport(ip, host='127.0.0.1', port=port, username=ip, password='x')
+            collector = Collector(self.tmp_dir, show_commands=SHOW_COMMANDS, transport=transport, **kwargs)
+            try:
+                return await collector.collect(ips)
+            finally:
+                server.close()
+                await server.wait_closed()
+        return asyncio.run(run()), device
+
+    def test_collect(self):
+        errors, device = self.collect([IP1, IP2])
+        self.assertEqual({}, errors)
+        store = TelnetStateStore(self.tmp_dir, show_commands=SHOW_COMMANDS)
+        sample = TelnetStateStore(TELNET_DIR, show_commands=SHOW_COMMANDS)
+        for show_command in SHOW_COMMANDS:
+            for ip in (IP1, IP2):
+                self.assertEqual(sample.get(show_command, ip).json(), store.get(show_command, ip).json())
+
+    def test_prompt_in_output(self):
+        errors, device = self.collect([IP1], device=FakeDevice(split_line='core-switch#'))
+        self.assertEqual({}, errors)
+        with open(os.path.join(self.tmp_dir, 'version', IP1 + '.txt')) as fp:
+            lines = fp.read().splitlines()
+        self.assertEqual(['show version', 'core-switch#'], lines[:2])
+        self.assertEqual(sample_output(ShowVersion, IP1).splitlines(), lines[2:-1])
+
+    def test_timeout(self):
+        errors, device = self.collect(['slow'], timeout=0.2, retries=1, retry_delay=0)
+        self.assertIn('timeout', errors['slow'])
+        self.assertEqual(2, device.logins)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, 'version')))
+
+    def test_retries_and_concurrency(self):
+        FlakyTransport.attempts = {}
+        ips = ['10.0.0.{}'.format(i) for i in range(20)]
+        collector = Collector(self.tmp_dir, show_commands=[ShowVersion], transport=FlakyTransport,
+                              concurrency=5, retries=1, retry_delay=0)
+        self.assertEqual({}, collector.run(ips))
+        self.assertEqual(5, FlakyTransport.max_active)
+        self.assertEqual('router-10.0.0.3', ShowVersion.load('10.0.0.3', self.tmp_dir).hostname)
+
+    def test_unexpected_errors(self):
+        ips = ['10.0.0.{}'.format(i) for i in range(12, 15)]
+        collector = Collector(self.tmp_dir, show_commands=[ShowVersion], transport=BrokenTransport, retries=0)
+        self.assertEqual({'10.0.0.13': 'ValueError: unexpected output'}, collector.run(ips))
+        self.assertEqual('router-10.0.0.14', ShowVersion.load('10.0.0.14', self.tmp_dir).hostname)
+        # an error while writing the files
+        with open(os.path.join(self.tmp_dir, 'file'), 'w'):
+            pass
+        collector = Collector(os.path.join(self.tmp_dir, 'file'), show_commands=[ShowVersion],
+                              transport=BrokenTransport, retries=0)
+        self.assertEqual(sorted(ips), sorted(collector.run(ips)))
+
+    def test_no_retries(self):
+        FlakyTransport.attempts = {}
+        collector = Collector(self.tmp_dir, transport=FlakyTransport, retries=0)
+        self.assertEqual({'10.0.0.1': 'TransportError: connection refused'}, collector.run(['10.0.0.1']))
+
+
+if __name__ == '__main__':
+    unittest.main()
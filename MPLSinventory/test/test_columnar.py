@@ -0,0 +1,105 @@
+from __future__ import print_function
+import unittest
+import os
+import json
+import shutil
+import tempfile
+import MPLSinventory.tools as tools
+from MPLSinventory import columnar
+from MPLSinventory.router import MPLSRouter
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+ROUTER_DIR = os.path.join(BASE_PATH, 'sample_configs')
+
+
+@unittest.skipIf(columnar.pa is None, 'pyarrow is not installed')
+class TestColumnar(unittest.TestCase):
+    router_attributes = ['hostname', "interfaces['Loopback1'].ip.ip", 'hsrp', 'wan.name',
+                         'qos_interface', 'bandwidth', 'local_as']
+
+    @classmethod
+    def setUpClass(cls):
+        cls.routers = tools.read_files_to_objects(ROUTER_DIR, MPLSRouter, id='hostname')
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, 'routers.parquet')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip(self):
+        routers_d = tools.create_dict_from_objects(self.routers, attributes=self.router_attributes)
+        columnar.save_dict_as_parquet(routers_d, self.filename)
+        self.assertEqual(routers_d, columnar.read_parquet_as_dict(self.filename))
+
+    def test_column_types(self):
+        routers_d = tools.create_dict_from_objects(self.routers, attributes=self.router_attributes)
+        columnar.save_dict_as_parquet(routers_d, self.filename)
+        schema = columnar.pq.read_schema(self.filename)
+        self.assertEqual(columnar.pa.uint32(), schema.field('hsrp').type)
+        self.assertEqual(columnar.pa.int64(), schema.field('local_as').type)
+        self.assertEqual(columnar.pa.dictionary(columnar.pa.int32(), columnar.pa.string()),
+                         schema.field('hostname').type)
+
+    def test_json_objects_equal_json_file(self):
+        routers_d = tools.create_dict_from_objects(self.routers)
+        columnar.save_dict_as_parquet(routers_d, self.filename)
+        json_filename = os.path.join(self.tmp_dir, 'routers.json')
+        tools.save_dict_as_json(routers_d, json_filename)
+        with open(json_filename) as fp:
+            self.assertEqual(json.load(fp), columnar.read_parquet_as_dict(self.filename))
+
+    def test_save_objects_in_batches(self):
+        columnar.save_objects_as_parquet(self.routers, self.filename, attributes=self.router_attributes,
+                                         batch_size=1)
+        routers_d = tools.create_dict_from_objects(self.routers, attributes=self.router_attributes)
+        self.assertEqual(routers_d, columnar.read_parquet_as_dict(self.filename))
+
+    def test_read_attributes(self):
+        columnar.save_objects_as_parquet(self.routers, self.filename, attributes=self.router_attributes)
+        routers_d = columnar.read_parquet_as_dict(self.filename, attributes=['local_as'])
+        self.assertEqual({'router-1-eth': {'local_as': 64512}, 'router-2-atm': {'local_as': 64513}}, routers_d)
+
+    def test_missing_and_mixed_values(self):
+        jdict = {'a': {'ip': '10.0.0.1', 'speed': '', 'mixed': 1, 'none': None},
+                 'b': {'ip': '', 'speed': 100, 'mixed': 'x', 'none': 2}}
+        columnar.save_dict_as_parquet(jdict, self.filename)
+        self.assertEqual(jdict, columnar.read_parquet_as_dict(self.filename))
+
+    def test_strict_ip_column(self):
+        jdict = {'a': {'ip': '10.1', 'peer': '10.0.0.1'}, 'b': {'ip': '010.0.0.1', 'peer': '10.0.0.2'}}
+        columnar.save_dict_as_parquet(jdict, self.filename)
+        self.assertEqual(jdict, columnar.read_parquet_as_dict(self.filename))
+        schema = columnar.pq.read_schema(self.filename)
+        self.assertEqual(columnar.pa.dictionary(columnar.pa.int32(), columnar.pa.string()), schema.field('ip').type)
+        self.assertEqual(columnar.pa.uint32(), schema.field('peer').type)
+
+    def test_types_from_all_rows(self):
+        jdict = dict(('r{}'.format(i), {'speed': i, 'ip': '', 'bandwidth': i}) for i in range(100))
+        jdict['r50'] = {'speed': 'fast', 'ip': '10.0.0.1', 'bandwidth': 1.5}
+        columnar.save_dict_as_parquet(jdict, self.filename)
+        self.assertEqual(jdict, columnar.read_parquet_as_dict(self.filename))
+        schema = columnar.pq.read_schema(self.filename)
+        self.assertEqual(columnar.pa.uint32(), schema.field('ip').type)
+        self.assertEqual(columnar.pa.float64(), schema.field('bandwidth').type)
+
+    def test_widen_types_in_later_batch(self):
+        pairs = [('a', {'speed': 100, 'ip': '', 'bandwidth': 10, 'up': True}),
+                 ('b', {'speed': 'fast', 'ip': '10.0.0.1', 'bandwidth': 1.5, 'up': 1}),
+                 ('c', {'speed': 10, 'ip': '10.0.0.2', 'bandwidth': 2, 'up': False, 'vrf': 'red'}),
+                 ('d', {'speed': 10, 'ip': None, 'bandwidth': 3, 'up': True})]
+        columnar.save_dict_as_parquet(pairs, self.filename, batch_size=1)
+        expected = dict(pairs)
+        expected['a']['bandwidth'] = 10.0
+        expected['a']['vrf'] = expected['b']['vrf'] = expected['d']['vrf'] = ''
+        self.assertEqual(expected, columnar.read_parquet_as_dict(self.filename))
+        self.assertEqual(1.5, columnar.read_parquet_as_dict(self.filename)['b']['bandwidth'])
+        schema = columnar.pq.read_schema(self.filename)
+        self.assertEqual(columnar.pa.string(), schema.field('ip').type)
+        self.assertEqual(columnar.pa.float64(), schema.field('bandwidth').type)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+from __future__ import print_function
+import unittest
+import os
+import pickle
+import shutil
+import tempfile
+from MPLSinventory.configsource import ConfigLines, map_config
+from MPLSinventory.router import MPLSRouter
+from MPLSinventory.tools import search, search_all
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+ROUTER_DIR = os.path.join(BASE_PATH, 'sample_configs')
+FILENAME_ETH = 'router_1_eth_conf.cfg'
+FILENAME_ATM = 'router_2_atm_conf.cfg'
+
+
+class TestConfigLines(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(ROUTER_DIR, FILENAME_ETH)
+        with open(self.path, 'r') as fp:
+            self.lines = [line.rstrip() for line in fp.readlines()]
+        self.config = map_config(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, data):
+        path = os.path.join(self.tmp_dir, 'config.cfg')
+        with open(path, 'wb') as fp:
+            fp.write(data)
+        return path
+
+    def test_lines_equal_readlines(self):
+        self.assertIsInstance(self.config, ConfigLines)
+        self.assertEqual(len(self.lines), len(self.config))
+        self.assertEqual(self.lines, list(self.config))
+        self.assertEqual(self.lines[5], self.config[5])
+        self.assertEqual(self.lines[-1], self.config[-1])
+
+    def test_slice_is_view(self):
+        view = self.config[10:20]
+        self.assertIsInstance(view, ConfigLines)
+        self.assertEqual(self.lines[10:20], view)
+        self.assertEqual(self.lines[12:15], view[2:5])
+        self.assertEqual(self.lines[10:20:2], view[::2])
+        self.assertEqual([], self.config[20:10])
+
+    def test_index_error(self):
+        with self.assertRaises(IndexError):
+            self.config[len(self.lines)]
+
+    def test_pickle_as_list(self):
+        self.assertEqual(self.lines[:5], pickle.loads(pickle.dumps(self.config[:5])))
+        self.assertIsInstance(pickle.loads(pickle.dumps(self.config)), list)
+
+    def test_crlf_and_no_final_newline(self):
+        config = map_config(self._write(b'hostname r1\r\n!\r\ninterface Loopback1  \r\nend'))
+        self.assertEqual(['hostname r1', '!', 'interface Loopback1', 'end'], config)
+
+    def test_cr_line_endings(self):
+        path = self._write(b'hostname r1\r!\rinterface Loopback1\r\n ip address 10.0.0.1 255.255.255.255\n')
+        with open(path, 'r') as fp:
+            lines = [line.rstrip() for line in fp.readlines()]
+        config = map_config(path)
+        self.assertEqual(4, len(lines))
+        self.assertEqual(lines, config)
+        self.assertEqual(lines[2], config[2])
+
+    def test_close(self):
+        view = self.config[10:20]
+        self.config.close(keep=True)
+        self.assertEqual(self.lines, self.config)
+        self.assertEqual(self.lines[10:20], view)
+        config = map_config(self.path)
+        view = config[10:20]
+        config.close()
+        with self.assertRaises(ValueError):
+            view[0]
+
+    def test_empty_file(self):
+        self.assertEqual([], map_config(self._write(b'')))
+
+    def test_search(self):
+        self.assertEqual('router-1-eth', search(r'^hostname\s+(\S+)$', self.config))
+        regex = r'^interface\s+(\S+)$'
+        self.assertEqual(search_all(regex, self.lines), search_all(regex, self.config))
+
+
+class TestMappedRouter(unittest.TestCase):
+    def test_mapped_router_equals_router(self):
+        for filename in (FILENAME_ETH, FILENAME_ATM):
+            router = MPLSRouter.load(filename, ROUTER_DIR)
+            MPLSRouter._mmap_threshold = 0
+            try:
+                mapped = MPLSRouter.load(filename, ROUTER_DIR)
+            finally:
+                del MPLSRouter._mmap_threshold
+            self.assertIsInstance(mapped.config, ConfigLines)
+            self.assertEqual(router.config, mapped.config)
+            self.assertEqual(router.json(), mapped.json())
+
+    @unittest.skipUnless(os.path.isdir('/proc/self/fd'), 'requires /proc/self/fd')
+    def test_mapping_is_closed(self):
+        MPLSRouter._mmap_threshold = 0
+        try:
+            routers = [MPLSRouter.load(FILENAME_ETH, ROUTER_DIR, keep_config=keep_config)
+                       for keep_config in (True, False)]
+            open_files = []
+            for fd in os.listdir('/proc/self/fd'):
+                try:
+                    open_files.append(os.readlink(os.path.join('/proc/self/fd', fd)))
+                except OSError:
+                    pass
+            self.assertNotIn(os.path.realpath(os.path.join(ROUTER_DIR, FILENAME_ETH)), open_files)
+            self.assertEqual('router-1-eth', search(r'^hostname\s+(\S+)$', routers[0].config))
+        finally:
+            del MPLSRouter._mmap_threshold
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+from __future__ import print_function
+import unittest
+import os
+import shutil
+import pstats
+import tempfile
+from MPLSinventory import instrument
+import MPLSinventory.tools as tools
+from MPLSinventory.router import MPLSRouter
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+ROUTER_DIR = os.path.join(BASE_PATH, 'sample_configs')
+FILENAME_ETH = 'router_1_eth_conf.cfg'
+
+
+class TestInstrument(unittest.TestCase):
+    def setUp(self):
+        instrument.reset()
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        instrument.disable()
+        instrument.reset()
+        shutil.rmtree(self.tmp_dir)
+
+    def _names(self, category):
+        return [name for _, name, _, _ in instrument.stats(category)]
+
+    def test_disabled(self):
+        tools.read_files_to_objects(ROUTER_DIR, MPLSRouter, id='hostname')
+        self.assertEqual([], instrument.stats())
+        self.assertEqual([], instrument.slowest())
+
+    def test_enabled(self):
+        instrument.enable()
+        routers = tools.read_files_to_objects(ROUTER_DIR, MPLSRouter, id='hostname')
+        tools.create_dict_from_objects(routers, attributes=['hostname'])
+        self.assertEqual(['tools.create_dict_from_objects', 'tools.read_files_to_objects'],
+                         sorted(self._names('function')))
+        self.assertIn('MPLSRouter', self._names('construct'))
+        self.assertIn('Interface', self._names('construct'))
+        self.assertIn('MPLSRouter.tree', self._names('stage'))
+        self.assertIn('MPLSRouter.read', self._names('stage'))
+        self.assertIn('Interface.ip', self._names('attribute'))
+        calls = dict((name, calls) for _, name, calls, _ in instrument.stats('construct'))
+        self.assertEqual(2, calls['MPLSRouter'])
+        self.assertEqual(sum(len(router.interfaces) for router in routers.values()), calls['Interface'])
+
+    def test_without_attributes(self):
+        instrument.enable(attributes=False)
+        MPLSRouter.load(FILENAME_ETH, ROUTER_DIR)
+        self.assertEqual([], instrument.stats('attribute'))
+        self.assertIn('Interface.attributes', self._names('stage'))
+
+    def test_results_unchanged(self):
+        router = MPLSRouter.load(FILENAME_ETH, ROUTER_DIR)
+        instrument.enable()
+        self.assertEqual(router.json(), MPLSRouter.load(FILENAME_ETH, ROUTER_DIR).json())
+
+    def test_slowest(self):
+        instrument.enable(slowest=1)
+        tools.read_files_to_objects(ROUTER_DIR, MPLSRouter, id='hostname')
+        slowest = instrument.slowest()
+        self.assertEqual(1, len(slowest))
+        self.assertEqual('MPLSRouter', slowest[0][1])
+
+    def test_report_and_dump_stats(self):
+        instrument.enable()
+        tools.read_files_to_objects(ROUTER_DIR, MPLSRouter, id='hostname')
+        self.assertIn('tools.read_files_to_objects', instrument.report())
+        filename = os.path.join(self.tmp_dir, 'run.pstats')
+        instrument.dump_stats(filename)
+        functions = [function for _, _, function in pstats.Stats(filename).stats.keys()]
+        self.assertIn('MPLSRouter', functions)
+
+    def test_profile(self):
+        filename = os.path.join(self.tmp_dir, 'profile.pstats')
+        router = instrument.profile(filename, MPLSRouter.load, FILENAME_ETH, ROUTER_DIR)
+        self.assertEqual('router-1-eth', router.hostname)
+        self.assertTrue(pstats.Stats(filename).total_calls > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+from __future__ import print_function
+import unittest
+import pickle
+from MPLSinventory.ip_address_tools import IPv4Address, IPv4Interface, IPv4Network, \
+    IntIPv4Address, IntIPv4Interface, IntIPv4Network, netmask_to_prefixlen, prefix_mask
+
+
+class TestIntIPv4Types(unittest.TestCase):
+    def test_address(self):
+        ip = IntIPv4Address('10.0.1.20')
+        self.assertEqual('10.0.1.20', str(ip))
+        self.assertEqual(0x0a000114, int(ip))
+        self.assertEqual(ip, IntIPv4Address(0x0a000114))
+        self.assertEqual(ip, IntIPv4Address(IPv4Address(u'10.0.1.20')))
+        self.assertEqual(IPv4Address(u'10.0.1.20'), ip.to_stdlib())
+        self.assertLess(IntIPv4Address('10.0.1.9'), ip)
+        for address in ('10.0.1', '10.0.1.256', 'a.b.c.d', '', 1 << 32, '010.0.0.1', '10.0.0.0x10',
+                        '10.0.0.01', ' 10.0.0.1.', '1.2.3.4\n5'):
+            self.assertRaises(ValueError, IntIPv4Address, address)
+        self.assertEqual('0.0.0.0', str(IntIPv4Address('0.0.0.0')))
+        self.assertEqual('255.255.255.255', str(IntIPv4Address('255.255.255.255')))
+
+    def test_interface(self):
+        ip = IntIPv4Interface('10.0.1.20 255.255.255.252')
+        self.assertEqual(ip, IntIPv4Interface('10.0.1.20/30'))
+        self.assertEqual(ip, IntIPv4Interface('10.0.1.20/255.255.255.252'))
+        self.assertEqual('10.0.1.20/30', str(ip))
+        self.assertEqual('10.0.1.20', str(ip.ip))
+        self.assertEqual('10.0.1.20/30', ip.with_prefixlen)
+        self.assertEqual('10.0.1.20 255.255.255.252', ip.with_netmask)
+        self.assertEqual('255.255.255.252', str(ip.netmask))
+        self.assertEqual('10.0.1.20/32', str(IntIPv4Interface('10.0.1.20')))
+        self.assertEqual(IPv4Interface(u'10.0.1.20/30'), ip.to_stdlib())
+        self.assertNotEqual(ip, IntIPv4Interface('10.0.1.20/24'))
+        self.assertNotEqual(ip, ip.ip)
+        self.assertNotEqual(ip, IPv4Address(u'10.0.1.20'))
+        self.assertFalse(ip == IPv4Address(u'10.0.1.20'))
+        self.assertRaises(ValueError, IntIPv4Interface, '10.0.1.20 255.0.255.0')
+        self.assertRaises(ValueError, IntIPv4Interface, '10.0.1.20/33')
+        self.assertRaises(ValueError, IntIPv4Interface, (1, 99))
+        self.assertRaises(ValueError, IntIPv4Interface, (1 << 32, 24))
+        self.assertRaises(ValueError, IntIPv4Network, (1, 40))
+        self.assertRaises(ValueError, IntIPv4Network, (1, -1))
+
+    def test_network(self):
+        network = IntIPv4Interface('10.0.1.20 255.255.255.0').network
+        self.assertEqual('10.0.1.0/24', str(network))
+        self.assertEqual(IntIPv4Network('10.0.1.99/24'), network)
+        self.assertEqual('10.0.1.255', str(network.broadcast_address))
+        self.assertEqual(256, network.num_addresses)
+        self.assertIn(IntIPv4Address('10.0.1.1'), network)
+        self.assertIn(IPv4Address(u'10.0.1.1'), network)
+        self.assertNotIn(IntIPv4Address('10.0.2.1'), network)
+        self.assertNotIn(IntIPv4Network('10.0.1.0/25'), network)
+        self.assertIn(IntIPv4Address('10.0.1.1'), IPv4Network(u'10.0.1.0/24'))
+        self.assertEqual(IPv4Network(u'10.0.1.0/24'), network.to_stdlib())
+
+    def test_stdlib_equality(self):
+        pairs = [(IntIPv4Address('10.0.1.20'), IPv4Address(u'10.0.1.20')),
+                 (IntIPv4Interface('10.0.1.20/24'), IPv4Interface(u'10.0.1.20/24')),
+                 (IntIPv4Network('10.0.1.0/24'), IPv4Network(u'10.0.1.0/24'))]
+        for ip, stdlib_ip in pairs:
+            self.assertEqual(ip, stdlib_ip)
+            self.assertEqual(stdlib_ip, ip)
+            self.assertEqual(hash(stdlib_ip), hash(ip))
+            self.assertIn(stdlib_ip, set([ip]))
+
+    def test_pickle(self):
+        for ip in (IntIPv4Address('10.0.1.20'), IntIPv4Interface('10.0.1.20/24'), IntIPv4Network('10.0.1.0/24')):
+            self.assertEqual(ip, pickle.loads(pickle.dumps(ip, pickle.HIGHEST_PROTOCOL)))
+
+    def test_netmask_to_prefixlen(self):
+        self.assertEqual(30, netmask_to_prefixlen('255.255.255.252'))
+        self.assertEqual(0, netmask_to_prefixlen('0.0.0.0'))
+        self.assertEqual(24, netmask_to_prefixlen('24'))
+
+    def test_prefix_mask(self):
+        self.assertEqual(0xfffffffc, prefix_mask(30))
+        self.assertEqual(0, prefix_mask(0))
+        self.assertEqual(0xffffffff, prefix_mask(32))
+
+
+if __name__ == '__main__':
+    unittest.main()
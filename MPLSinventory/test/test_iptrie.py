@@ -0,0 +1,84 @@
+from __future__ import print_function
+import unittest
+import os
+import MPLSinventory.tools as tools
+from MPLSinventory.iptrie import PrefixTrie, parse_prefix, index_interfaces
+from MPLSinventory.router import MPLSRouter
+from MPLSinventory.ip_address_tools import IPv4Address, IPv4Interface
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+ROUTER_DIR = os.path.join(BASE_PATH, 'sample_configs')
+
+
+class TestPrefixTrie(unittest.TestCase):
+    def setUp(self):
+        self.trie = PrefixTrie([('0.0.0.0/0', 'default'),
+                                ('10.0.0.0/8', 'ten'),
+                                ('10.0.10.0/24', 'lan'),
+                                ('10.0.10.1 255.255.255.255', 'host'),
+                                ('10.0.10.0/24', 'hsrp')])
+
+    def test_parse_prefix(self):
+        self.assertEqual((0x0a000004, 30), parse_prefix('10.0.0.5/30'))
+        self.assertEqual((0x0a000004, 30), parse_prefix('10.0.0.5 255.255.255.252'))
+        self.assertEqual((0x0a000005, 32), parse_prefix('10.0.0.5'))
+        self.assertEqual((0x0a000004, 30), parse_prefix(IPv4Interface(u'10.0.0.5/30')))
+        self.assertEqual((0x0a000005, 32), parse_prefix(IPv4Address(u'10.0.0.5')))
+        self.assertEqual((0x0a000000, 8), parse_prefix((0x0a000005, 8)))
+
+    def test_lookup(self):
+        self.assertEqual(4, len(self.trie))
+        self.assertEqual(['host'], self.trie.lookup('10.0.10.1'))
+        self.assertEqual(['lan', 'hsrp'], self.trie.lookup('10.0.10.2'))
+        self.assertEqual(['ten'], self.trie.lookup('10.0.11.1'))
+        self.assertEqual(['default'], self.trie.lookup('172.16.0.1'))
+        self.assertEqual(('10.0.10.0/24', ['lan', 'hsrp']), self.trie.match('10.0.10.200'))
+        self.assertEqual([], PrefixTrie([('10.0.0.0/8', 'ten')]).lookup('11.0.0.1'))
+        self.assertIsNone(PrefixTrie().match('10.0.0.1'))
+
+    def test_lookup_subnet(self):
+        self.assertEqual(['lan', 'hsrp'], self.trie.lookup('10.0.10.0/25'))
+        self.assertEqual(['ten'], self.trie.lookup('10.0.0.0/16'))
+        self.assertEqual(['default'], self.trie.lookup('10.0.0.0/7'))
+
+    def test_lookup_many(self):
+        addresses = ['10.0.10.1', '10.0.10.2', '10.0.11.1', '172.16.0.1', '10.0.10.0/25', '10.0.0.0/7']
+        expected = [self.trie.lookup(address) for address in addresses]
+        self.assertEqual(expected, self.trie.lookup_many(addresses))
+        # enough addresses for the numpy lookup
+        addresses = ['10.0.{}.{}'.format(i % 16, i) for i in range(256)] + ['10.0.10.0/23', '10.0.10.0/24']
+        expected = [self.trie.lookup(address) for address in addresses]
+        self.assertEqual(expected, self.trie.lookup_many(addresses))
+        trie = PrefixTrie([('10.0.0.0/8', 'ten')])
+        self.assertEqual([['ten'], []] * 50, trie.lookup_many(['10.0.0.1', '11.0.0.1'] * 50))
+
+    def test_items(self):
+        self.assertEqual([('0.0.0.0/0', ['default']), ('10.0.0.0/8', ['ten']),
+                          ('10.0.10.0/24', ['lan', 'hsrp']), ('10.0.10.1/32', ['host'])],
+                         self.trie.items())
+
+
+class TestIndexInterfaces(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.routers = tools.read_files_to_objects(ROUTER_DIR, MPLSRouter, id='hostname')
+
+    def test_index_interfaces(self):
+        trie = index_interfaces(self.routers)
+        self.assertEqual([('router-1-eth', 'GigabitEthernet0/1.101')], trie.lookup('192.168.100.1'))
+        self.assertEqual([('router-2-atm', 'Loopback1')], trie.lookup('192.168.1.92'))
+        self.assertEqual([('router-1-eth', 'GigabitEthernet0/0.200')], trie.lookup('10.0.20.0/25'))
+        self.assertEqual([], trie.lookup('172.31.0.1'))
+        trie_d = index_interfaces(tools.create_dict_from_objects(self.routers))
+        self.assertEqual(trie.items(), trie_d.items())
+
+    def test_wan_interface(self):
+        router = self.routers['router-1-eth']
+        self.assertEqual('GigabitEthernet0/1.101', router.wan.name)
+        self.assertEqual([router.interfaces['GigabitEthernet0/0.100']],
+                         router.interface_trie().lookup('10.0.10.3'))
+
+
+if __name__ == '__main__':
+    unittest.main()
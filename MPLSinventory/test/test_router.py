@@ -2,10 +2,13 @@ from __future__ import print_function
 import unittest
 import os
 import sys
+import pickle
 import six
 import q
-from MPLSinventory.router import Router, MPLSRouter
-from MPLSinventory.telnet import ShowVersion, ShowIPInterfacesBrief
+from MPLSinventory.router import Router, MPLSRouter, Interface, RouterBGP, QoSPolicy
+from MPLSinventory.regexstructure import AttributeScanner, parse_config_tree
+from MPLSinventory.tools import search
+from MPLSinventory.telnet import ShowVersion, ShowIPInterfacesBrief, TelnetStateStore
 from MPLSinventory.ip_address_tools import IPv4Address, IPv4Interface
 
 
@@ -166,6 +169,20 @@ class TestRouter(unittest.TestCase):
         # self.assertItemsEqual(bgp_neighbors, self.r1.bgp.neighbors)
         six.assertCountEqual(self, bgp_neighbors, self.r1.bgp.neighbors)
 
+    def test_bgp_neighbor_table(self):
+        neighbors = dict((str(neighbor.ip), neighbor) for neighbor in self.r1.bgp.neighbor_table)
+        self.assertTrue(neighbors['10.0.10.2'].shutdown)
+        self.assertEqual(65012, neighbors['10.0.10.2'].remote_as)
+        self.assertEqual('GigabitEthernet0/1.101', neighbors['192.168.100.1'].update_source)
+        self.assertEqual('*** EBGP to PE router ***', neighbors['192.168.100.1'].description)
+
+    def test_bgp_neighbor_table_json(self):
+        neighbor_table = self.r1.json()['bgp']['neighbor_table']
+        self.assertEqual(3, len(neighbor_table))
+        self.assertEqual({'ip': '10.0.10.2', 'vrf': '', 'remote_as': 65012, 'shutdown': True,
+                          'peer_group': '', 'update_source': '', 'description': ''},
+                         dict(neighbor_table[0]))
+
     def test_add_telnet_state(self):
         state_found = True
         self.r1.add_telnet_state(IP1)
@@ -177,6 +194,141 @@ class TestRouter(unittest.TestCase):
         self.r1.add_telnet_state(IP1)
         self.assertEqual(status, self.r1.interfaces[interface].status)
 
+    def test_add_telnet_state_from_store(self):
+        r = Router.load(FILENAME_ETH, PATH)
+        r.add_telnet_state(IP1, store=TelnetStateStore(Router.telnet_dir))
+        self.assertTrue(r.state_found)
+        self.assertEqual('up', r.interfaces['GigabitEthernet0/1.101'].status)
+
+
+class TestAttributeScanner(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.r1 = Router.load(FILENAME_ETH, PATH)
+
+    def test_scan_equals_search(self):
+        scanner = AttributeScanner(Interface._single_attributes)
+        for interface in self.r1.interfaces.values():
+            for name, result in scanner.scan(interface.config):
+                regex = Interface._single_attributes[name][0]
+                self.assertEqual(search(regex, interface.config), result)
+
+    def test_scan_multiple_groups(self):
+        scanner = AttributeScanner({'ab': (r'^(a)\s(b)?', tuple)})
+        self.assertEqual([('ab', ('a', 'b'))], scanner.scan(['c', 'a', 'a b']))
+        self.assertEqual([('ab', ('', ''))], scanner.scan(['c']))
+        self.assertEqual([('ab', ())], scanner.scan([]))
+
+
+VRF_CONFIG = """hostname router-vrf
+!
+interface Loopback1
+ ip address 192.168.2.92 255.255.255.255
+!
+router bgp 64512
+ bgp log-neighbor-changes
+ neighbor 10.0.10.3 remote-as 64512
+ !
+ address-family ipv4 vrf CUSTOMER
+  neighbor 10.2.0.1 remote-as 65002
+ exit-address-family
+!
+line vty 0 4
+"""
+
+
+DIALER_CONFIG = """hostname router-dialer
+!
+interface ATM0
+ no ip address
+!
+interface ATM0.1 point-to-point
+ pvc 0 0/32
+  dialer pool-member 2
+!
+interface Ethernet0
+ pppoe-client dial-pool-number 1
+!
+interface Dialer1
+ ip address negotiated
+ dialer pool 1
+!
+interface Dialer2
+ ip address negotiated
+ dialer pool 2
+!
+"""
+
+
+class TestParentInterfaces(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.r4 = Router(DIALER_CONFIG)
+
+    def test_dial_pool_number_parent(self):
+        self.assertEqual('Ethernet0', self.r4.interfaces['Dialer1'].parent.name)
+
+    def test_dialer_pool_member_parent(self):
+        self.assertEqual('ATM0.1', self.r4.interfaces['Dialer2'].parent.name)
+
+    def test_subinterface_parent(self):
+        self.assertEqual('ATM0', self.r4.interfaces['ATM0.1'].parent.name)
+
+
+class TestConfigTree(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.r3 = Router(VRF_CONFIG)
+
+    def test_top_level_keywords(self):
+        tree = parse_config_tree(self.r3.config)
+        keywords = ['hostname', 'interface', 'router', 'line']
+        self.assertEqual(keywords, [block.keyword for block in tree.children])
+
+    def test_find_interface(self):
+        tree = parse_config_tree(self.r3.config)
+        blocks = tree.find('interface')
+        self.assertEqual(['interface Loopback1', ' ip address 192.168.2.92 255.255.255.255'],
+                         blocks[0].lines)
+
+    def test_single_block_config(self):
+        # a config with a single top level block is not a configlet of a Router
+        r = Router(['interface Loopback1', ' ip address 192.168.2.92 255.255.255.255'])
+        self.assertEqual(['Loopback1'], list(r.interfaces))
+
+    def test_configlet(self):
+        policy = QoSPolicy(['policy-map WAN-OUT',
+                            ' class PRIORITY',
+                            '  priority 512',
+                            ' class class-default',
+                            '  bandwidth 256'])
+        self.assertEqual(['PRIORITY', 'class-default'], sorted(policy.qos_classes))
+
+    def test_bgp_vrf_config(self):
+        self.assertEqual(' exit-address-family', self.r3.bgp.config[-1])
+
+    def test_bgp_vrf_neighbor_table(self):
+        vrfs = [(str(neighbor.ip), neighbor.vrf) for neighbor in self.r3.bgp.neighbor_table]
+        self.assertEqual([('10.0.10.3', ''), ('10.2.0.1', 'CUSTOMER')], vrfs)
+
+    def test_bgp_address_family_resets_vrf(self):
+        bgp = RouterBGP(['router bgp 64512',
+                         ' address-family ipv4 vrf A',
+                         '  neighbor 10.2.0.1 remote-as 65002',
+                         ' address-family ipv4',
+                         '  neighbor 10.0.10.4 remote-as 64512',
+                         ' address-family ipv4 unicast vrf B',
+                         '  neighbor 10.3.0.1 remote-as 65003',
+                         ' address-family vpnv4',
+                         '  neighbor 10.0.10.5 remote-as 64512'])
+        vrfs = [(str(neighbor.ip), neighbor.vrf) for neighbor in bgp.neighbor_table]
+        self.assertEqual([('10.2.0.1', 'A'), ('10.0.10.4', ''), ('10.3.0.1', 'B'), ('10.0.10.5', '')], vrfs)
+
+    def test_bgp_vrf_neighbors(self):
+        bgp_neighbors = [(IPv4Address('10.0.10.3'), 64512),
+                         (IPv4Address('10.2.0.1'), 65002)]
+        six.assertCountEqual(self, bgp_neighbors, self.r3.bgp.neighbors)
+
 
 class TestMPLSRouter(unittest.TestCase):
     config = None
@@ -222,6 +374,49 @@ class TestMPLSRouter(unittest.TestCase):
         self.assertEqual(self.r1.hsrp, hsrp)
 
 
+class TestReleaseConfig(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.r1 = MPLSRouter.load(FILENAME_ETH, PATH)
+        cls.r2 = MPLSRouter.load(FILENAME_ETH, PATH, keep_config=False)
+
+    def test_config_released(self):
+        self.assertFalse(hasattr(self.r2, 'config'))
+        self.assertFalse(hasattr(self.r2.interfaces['GigabitEthernet0/1.101'], 'config'))
+        self.assertFalse(hasattr(self.r2.qos_policies['SAMPLE-QOS-OUT'], 'config'))
+        self.assertFalse(hasattr(self.r2.qos_policies['SAMPLE-QOS-OUT'].qos_classes['gold_output'], 'config'))
+        self.assertFalse(hasattr(self.r2.bgp, 'config'))
+
+    def test_json_unchanged(self):
+        self.assertEqual(self.r1.json(), self.r2.json())
+
+    def test_add_telnet_state(self):
+        r = MPLSRouter.load(FILENAME_ETH, PATH, keep_config=False)
+        r.add_telnet_state(IP1)
+        self.assertEqual('up', r.interfaces['GigabitEthernet0/1.101'].status)
+
+
+class TestSlots(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.r1 = MPLSRouter.load(FILENAME_ETH, PATH)
+
+    def test_interface_without_dict(self):
+        interface = self.r1.interfaces['GigabitEthernet0/0.100']
+        self.assertFalse(hasattr(interface, '__dict__'))
+        self.assertEqual(100, interface.json()['vlan'])
+
+    def test_qos_class_without_dict(self):
+        qos_class = self.r1.qos_policies['SAMPLE-QOS-OUT'].qos_classes['gold_output']
+        self.assertFalse(hasattr(qos_class, '__dict__'))
+        self.assertEqual({'name': 'gold_output', 'bandwidth': 3635, 'bandwidth_percent': '', 'police': ''},
+                         qos_class.json())
+
+    def test_pickle(self):
+        r = pickle.loads(pickle.dumps(self.r1, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(self.r1.json(), r.json())
+
+
 class TestMPLSRouter_ATM(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -0,0 +1,123 @@
+from __future__ import print_function
+import unittest
+import os
+import json
+import time
+import shutil
+import tempfile
+from MPLSinventory.service import InventoryService
+from MPLSinventory.router import MPLSRouter
+
+try:
+    from urllib.request import urlopen
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import urlopen, HTTPError
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+TELNET_DIR = os.path.join(BASE_PATH, 'sample_telnet')
+ROUTER_DIR = os.path.join(BASE_PATH, 'sample_configs')
+FILENAME_ETH = 'router_1_eth_conf.cfg'
+FILENAME_ATM = 'router_2_atm_conf.cfg'
+
+
+class TestInventoryService(unittest.TestCase):
+    attributes = ['hostname', 'state_found', 'local_as']
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config_dir = os.path.join(self.tmp_dir, 'configs')
+        self.telnet_dir = os.path.join(self.tmp_dir, 'telnet')
+        shutil.copytree(ROUTER_DIR, self.config_dir)
+        shutil.copytree(TELNET_DIR, self.telnet_dir)
+        self.service = InventoryService(self.config_dir, self.telnet_dir, attributes=self.attributes)
+
+    def tearDown(self):
+        self.service.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_refresh(self):
+        self.assertEqual([FILENAME_ETH, FILENAME_ATM], self.service.refresh())
+        self.assertEqual(['router-1-eth', 'router-2-atm'], sorted(self.service.get()))
+        self.assertEqual(True, self.service.get('router-1-eth')['state_found'])
+        self.assertEqual([], self.service.refresh())
+
+    def test_changed_config(self):
+        self.service.refresh()
+        path = os.path.join(self.config_dir, FILENAME_ETH)
+        with open(path) as fp:
+            config = fp.read().replace('hostname router-1-eth', 'hostname router-1-renamed')
+        with open(path, 'w') as fp:
+            fp.write(config)
+        self.assertEqual([FILENAME_ETH], self.service.refresh())
+        self.assertEqual(['router-1-renamed', 'router-2-atm'], sorted(self.service.get()))
+
+    def test_changed_telnet(self):
+        self.service.refresh()
+        os.remove(os.path.join(self.telnet_dir, 'version', '192.168.1.92.txt'))
+        self.assertEqual([FILENAME_ATM], self.service.refresh())
+        self.assertEqual(False, self.service.get('router-2-atm')['state_found'])
+
+    def test_incomplete_telnet(self):
+        os.remove(os.path.join(self.telnet_dir, 'int', '192.168.1.92.txt'))
+        self.assertEqual([FILENAME_ETH, FILENAME_ATM], self.service.refresh())
+        self.assertEqual(['router-1-eth', 'router-2-atm'], sorted(self.service.get()))
+        self.assertEqual([FILENAME_ATM], self.service.status()['errors'])
+        self.assertIn('show_ip_interfaces_brief', self.service.errors[FILENAME_ATM])
+        self.assertIsNone(self.service.status()['refresh_error'])
+
+    def test_telnet_state_error(self):
+        def add_telnet_state(router, ip):
+            if router.hostname == 'router-2-atm':
+                raise AttributeError('broken show command')
+            original(router, ip)
+        original = MPLSRouter.add_telnet_state
+        MPLSRouter.add_telnet_state = add_telnet_state
+        try:
+            self.service.refresh()
+        finally:
+            MPLSRouter.add_telnet_state = original
+        self.assertEqual(['router-1-eth'], sorted(self.service.get()))
+        self.assertIn('broken show command', self.service.errors[FILENAME_ATM])
+
+    def test_removed_config(self):
+        self.service.refresh()
+        os.remove(os.path.join(self.config_dir, FILENAME_ATM))
+        self.assertEqual([], self.service.refresh())
+        self.assertEqual(['router-1-eth'], sorted(self.service.get()))
+        self.assertEqual(1, self.service.status()['routers'])
+
+    def test_poll_continues_after_error(self):
+        shutil.move(self.config_dir, self.config_dir + '.tmp')
+        self.service.start(interval=0.02)
+        for _ in range(250):
+            if self.service.status()['failed_refreshes']:
+                break
+            time.sleep(0.02)
+        self.assertIn('Error', self.service.status()['refresh_error'])
+        shutil.move(self.config_dir + '.tmp', self.config_dir)
+        for _ in range(250):
+            if len(self.service.get()) == 2:
+                break
+            time.sleep(0.02)
+        self.assertEqual(['router-1-eth', 'router-2-atm'], sorted(self.service.get()))
+        self.assertIsNone(self.service.status()['refresh_error'])
+
+    def test_http(self):
+        self.service.refresh()
+        host, port = self.service.serve(port=0)
+        url = 'http://{}:{}'.format(host, port)
+        inventory = json.loads(urlopen(url + '/inventory').read().decode('utf-8'))
+        self.assertEqual(self.service.get(), inventory)
+        router = json.loads(urlopen(url + '/inventory/router-2-atm').read().decode('utf-8'))
+        self.assertEqual('router-2-atm', router['hostname'])
+        status = json.loads(urlopen(url + '/status').read().decode('utf-8'))
+        self.assertEqual(2, status['routers'])
+        with self.assertRaises(HTTPError) as context:
+            urlopen(url + '/inventory/unknown')
+        self.assertEqual(404, context.exception.code)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+from __future__ import print_function
+import unittest
+import os
+import copy
+import json
+import shutil
+import tempfile
+import MPLSinventory.tools as tools
+from MPLSinventory.store import InventoryStore, ip_range, _containing
+from MPLSinventory.router import MPLSRouter
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+ROUTER_DIR = os.path.join(BASE_PATH, 'sample_configs')
+
+
+class TestInventoryStore(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.routers = tools.read_files_to_objects(ROUTER_DIR, MPLSRouter, id='hostname')
+        cls.routers_d = tools.create_dict_from_objects(cls.routers)
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = InventoryStore(os.path.join(self.tmp_dir, 'inventory.sqlite'))
+        self.store.upsert(self.routers_d)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_ip_range(self):
+        self.assertEqual((0x0a000005, 0x0a000004, 0x0a000007), ip_range('10.0.0.5/30'))
+        self.assertEqual((0x0a000005, 0x0a000005, 0x0a000005), ip_range('10.0.0.5'))
+        self.assertEqual((0x0a000005, 0x0a000004, 0x0a000007), ip_range('10.0.0.5 255.255.255.252'))
+        self.assertIsNone(ip_range(''))
+        for address in ('10.1', '010.0.0.1', '10.0.0.1/33'):
+            self.assertRaises(ValueError, ip_range, address)
+
+    def test_get(self):
+        self.assertEqual(['router-1-eth', 'router-2-atm'], self.store.hostnames())
+        expected = json.loads(json.dumps(self.routers_d['router-1-eth']))
+        self.assertEqual(expected, self.store.get('router-1-eth'))
+        self.assertIsNone(self.store.get('unknown'))
+
+    def test_find(self):
+        self.assertEqual(['router-1-eth'], self.store.find_by_loopback('192.168.0.92'))
+        self.assertEqual(['router-2-atm'], self.store.find_by_local_as(64513))
+        self.assertEqual(['router-1-eth'], self.store.find_by_subnet('192.168.100.1'))
+        self.assertEqual([], self.store.find_by_subnet('10.99.0.1'))
+        self.assertIn(('router-1-eth', 'GigabitEthernet0/0.100'), self.store.find_interfaces('10.0.10.20'))
+
+    def test_find_uses_index(self):
+        for table, index, start, end in (('routers', 'routers_wan', 'wan_start', 'wan_end'),
+                                         ('interfaces', 'interfaces_network', 'network_start', 'network_end')):
+            condition, parameters = _containing(start, end, 0x0a000a14)
+            plan = ' '.join(str(row[-1]) for row in self.store.connection.execute(
+                'EXPLAIN QUERY PLAN SELECT * FROM {} WHERE {}'.format(table, condition), parameters))
+            self.assertIn('USING INDEX ' + index + ' (' + start + '=?', plan)
+        self.store.upsert({'router-3': {'interfaces': {'Vlan1': {'name': 'Vlan1', 'ip': '10.0.0.1/8'}}}})
+        self.assertIn(('router-3', 'Vlan1'), self.store.find_interfaces('10.0.10.20'))
+        self.assertEqual([('router-3', 'Vlan1')], self.store.find_interfaces('10.255.255.255'))
+
+    def test_bgp_neighbors(self):
+        neighbors = self.store.bgp_neighbors(hostname='router-1-eth', ip='10.0.10.2')
+        self.assertEqual(1, len(neighbors))
+        self.assertEqual(65012, neighbors[0]['remote_as'])
+        self.assertEqual(1, neighbors[0]['shutdown'])
+        self.assertEqual(['router-1-eth', 'router-2-atm'],
+                         [n['hostname'] for n in self.store.bgp_neighbors(remote_as=10001)])
+
+    def test_upsert_unchanged(self):
+        changes = self.store.connection.total_changes
+        self.assertEqual({'inserted': 0, 'updated': 0, 'unchanged': 2, 'deleted': 0},
+                         self.store.upsert(self.routers_d))
+        self.assertEqual(changes, self.store.connection.total_changes)
+
+    def test_upsert_changed_interface(self):
+        routers_d = copy.deepcopy(self.routers_d)
+        routers_d['router-1-eth']['interfaces']['Loopback1']['description'] = 'changed'
+        changes = self.store.connection.total_changes
+        self.assertEqual({'inserted': 0, 'updated': 1, 'unchanged': 1, 'deleted': 0},
+                         self.store.upsert(routers_d))
+        # the router and a single interface are written
+        self.assertEqual(changes + 2, self.store.connection.total_changes)
+        self.assertEqual('changed', self.store.query('SELECT description FROM interfaces WHERE '
+                                                     "hostname='router-1-eth' AND name='Loopback1'")[0]['description'])
+
+    def test_delete_missing(self):
+        routers_d = {'router-1-eth': self.routers_d['router-1-eth']}
+        self.assertEqual(1, self.store.upsert(routers_d, delete_missing=True)['deleted'])
+        self.assertEqual(['router-1-eth'], self.store.hostnames())
+        self.assertEqual([], self.store.bgp_neighbors(hostname='router-2-atm'))
+
+    def test_upsert_objects(self):
+        store = InventoryStore(os.path.join(self.tmp_dir, 'objects.sqlite'))
+        self.assertEqual(2, store.upsert_objects(self.routers)['inserted'])
+        self.assertEqual(self.store.get('router-2-atm'), store.get('router-2-atm'))
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,8 @@ from __future__ import print_function
 import unittest
 import os
 import six
-from MPLSinventory.telnet import ShowVersion, ShowIPInterfacesBrief, ShowIPBGPSum, IP_interface
+from MPLSinventory.telnet import ShowVersion, ShowIPInterfacesBrief, ShowIPBGPSum, ShowStandby, IP_interface
+from MPLSinventory.telnet import TelnetStateStore
 from MPLSinventory.ip_address_tools import IPv4Address
 
 BASE_PATH = os.path.dirname(os.path.abspath(__file__))
@@ -125,5 +126,30 @@ class TestParseShowVersion(unittest.TestCase):
         neighbor = self.sb2.neighbors['192.168.101.1']
         self.assertEqual(state, neighbor.state)
 
+
+class TestTelnetStateStore(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.store = TelnetStateStore(PATH)
+
+    def test_ips(self):
+        self.assertEqual([IP1, IP2], self.store.ips())
+        self.assertIn(IPv4Address(IP1), self.store)
+
+    def test_get_equals_load(self):
+        for show_command in (ShowVersion, ShowIPInterfacesBrief, ShowIPBGPSum):
+            for ip in (IP1, IP2):
+                loaded = show_command.load(ip, PATH, keep_config=False)
+                self.assertEqual(loaded.json(), self.store.get(show_command, ip).json())
+
+    def test_missing(self):
+        self.assertIsNone(self.store.get(ShowVersion, '10.0.0.1'))
+        self.assertIsNone(self.store.get(ShowStandby, IP1))
+
+    def test_workers(self):
+        store = TelnetStateStore(PATH, show_commands=[ShowVersion], workers=2)
+        self.assertEqual('router-2-atm', store.get(ShowVersion, IP2).hostname)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,12 +1,16 @@
 from __future__ import print_function
 import unittest
 import os
+import re
 import json
+import copy
+import shutil
+import tempfile
 import six
 import MPLSinventory.tools as tools
 from MPLSinventory.router import MPLSRouter
 from MPLSinventory.telnet import ShowVersion, ShowIPInterfacesBrief
-from MPLSinventory.matchrules import match_telnet_to_router, match_show_commands
+from MPLSinventory.matchrules import match_telnet_to_router, match_show_commands, score_on
 
 # test combine -> create json
 
@@ -18,6 +22,29 @@ TELNET_DIR = os.path.join(BASE_PATH, 'sample_telnet')
 ROUTER_DIR = os.path.join(BASE_PATH, 'sample_configs')
 
 
+class BrokenRouter(MPLSRouter):
+    @classmethod
+    def load(cls, filename, path=''):
+        if 'atm' in filename:
+            raise ValueError('broken config')
+        return super(BrokenRouter, cls).load(filename, path)
+
+
+class CountingPool(object):
+    """A pool that runs a submitted function when its result is requested, and counts the submits"""
+
+    def __init__(self):
+        self.submitted = 0
+
+    def apply_async(self, function, args):
+        self.submitted += 1
+
+        class Result(object):
+            def get(self):
+                return function(*args)
+        return Result()
+
+
 class TestTools(unittest.TestCase):
     router_attributes = ['hostname', "interfaces['Loopback1'].ip.ip", 'hsrp',
                          'wan.name', 'wan.parent.name',
@@ -53,6 +80,58 @@ class TestTools(unittest.TestCase):
         router = self.routers['router-1-eth']
         self.assertIsInstance(router, MPLSRouter)
 
+    def test_read_files_with_workers(self):
+        routers = tools.read_files_to_objects(ROUTER_DIR, MPLSRouter, id='hostname', workers=2)
+        self.assertEqual(list(self.routers.keys()), list(routers.keys()))
+        self.assertEqual(self.routers['router-1-eth'].json(), routers['router-1-eth'].json())
+
+    def test_read_files_in_flight_is_bounded(self):
+        pool = CountingPool()
+        jobs = [tools.LoadJob(MPLSRouter, 'router_1_eth_conf.cfg', ROUTER_DIR, False, None, False)] * 20
+        loaded = tools._imap_bounded(pool, jobs, 2, 3)
+        file_name, router, error = next(loaded)
+        self.assertEqual('router-1-eth', router.hostname)
+        self.assertEqual(4, pool.submitted)
+        self.assertEqual(19, len(list(loaded)))
+        self.assertEqual(10, pool.submitted)
+
+    def test_read_files_errors(self):
+        errors = {}
+        routers = tools.read_files_to_objects(ROUTER_DIR, BrokenRouter, id='hostname',
+                                              workers=2, errors=errors)
+        self.assertEqual(['router-1-eth'], list(routers.keys()))
+        self.assertEqual(['router_2_atm_conf.cfg'], list(errors.keys()))
+        self.assertIn('broken config', errors['router_2_atm_conf.cfg'])
+
+    def test_read_files_skipped_in_errors(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            shutil.copy(os.path.join(ROUTER_DIR, 'router_1_eth_conf.cfg'), tmp_dir)
+            with open(os.path.join(tmp_dir, 'empty.cfg'), 'w') as fp:
+                fp.write('\n')
+            errors = {}
+            routers = tools.read_files_to_objects(tmp_dir, MPLSRouter, id='hostname', errors=errors)
+            self.assertEqual(['router-1-eth'], list(routers.keys()))
+            self.assertEqual(['empty.cfg'], list(errors.keys()))
+            self.assertIn('no object loaded', errors['empty.cfg'])
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_read_files_raises(self):
+        with self.assertRaises(ValueError):
+            tools.read_files_to_objects(ROUTER_DIR, BrokenRouter, id='hostname')
+
+    def test_parse_attribute_path(self):
+        self.assertEqual(['interfaces', 'Loopback1', 'ip', 'ip', 0],
+                         tools.parse_attribute_path("interfaces['Loopback1'].ip.ip[0]"))
+        self.assertRaises(ValueError, tools.parse_attribute_path, 'wan-name')
+
+    def test_getattr_recursive(self):
+        router = self.routers['router-1-eth']
+        self.assertEqual('192.168.0.92', str(tools.getattr_recursive(router, "interfaces['Loopback1'].ip.ip")))
+        self.assertEqual('GigabitEthernet0/1', tools.getattr_recursive(router, 'wan.parent.name'))
+        self.assertEqual('', tools.getattr_recursive(router, "interfaces['Loopback9'].ip"))
+
     def test_create_router_dict_hostnames(self):
         routers_d = tools.create_dict_from_objects(self.routers, attributes=self.router_attributes)
         hostnames = ['router-1-eth', 'router-2-atm']
@@ -92,6 +171,19 @@ class TestTools(unittest.TestCase):
         showversion = showversions_d['192.168.0.92']
         six.assertCountEqual(self, keys, showversion.keys())
 
+    def test_combine_indexed_equals_match_function(self):
+        showversions_d = tools.create_dict_from_objects(self.showversions)
+        showinterfaces_d = tools.create_dict_from_objects(self.showinterfaces,
+                                                          attributes=self.show_int_attributes)
+        routers_d1 = tools.create_dict_from_objects(self.routers, attributes=self.router_attributes)
+        routers_d2 = tools.create_dict_from_objects(self.routers, attributes=self.router_attributes)
+        tools.combine(showversions_d, showinterfaces_d, match_show_commands)
+        tools.combine(routers_d1, showversions_d, match_telnet_to_router)
+        tools.combine(routers_d2, showversions_d,
+                      lambda router, telnet_dict: match_telnet_to_router(router, telnet_dict))
+        self.assertEqual(routers_d1, routers_d2)
+        self.assertEqual('2821', routers_d1['router-1-eth']['model'])
+
     def test_save_dict_as_json(self):
         showversions_d = tools.create_dict_from_objects(self.showversions)
         file_name_regex = r'(result_test\.json)'
@@ -113,6 +205,33 @@ class TestTools(unittest.TestCase):
             showversions_l = json.load(fp)
         six.assertCountEqual(self, showversions_d, showversions_l)
 
+    def test_iter_files_to_objects(self):
+        routers = tools.iter_files_to_objects(ROUTER_DIR, MPLSRouter, id='hostname')
+        key, router = next(routers)
+        self.assertEqual('router-1-eth', key)
+        self.assertIsInstance(router, MPLSRouter)
+
+    def test_save_streamed_json(self):
+        routers_d = tools.create_dict_from_objects(self.routers)
+        tools.save_dict_as_json(routers_d, 'result_test.json')
+        with open('result_test.json', 'r') as fp:
+            expected = fp.read()
+        routers = tools.iter_files_to_objects(ROUTER_DIR, MPLSRouter, id='hostname')
+        tools.save_dict_as_json(tools.iter_dict_from_objects(routers), 'result_test.json')
+        with open('result_test.json', 'r') as fp:
+            self.assertEqual(expected, fp.read())
+
+    def test_save_streamed_csv(self):
+        routers_d = tools.create_dict_from_objects(self.routers, attributes=self.router_attributes)
+        tools.save_dict_as_csv(routers_d, 'result_test.csv')
+        with open('result_test.csv', 'r') as fp:
+            expected = fp.read()
+        routers = tools.iter_files_to_objects(ROUTER_DIR, MPLSRouter, id='hostname')
+        routers_d = tools.iter_dict_from_objects(routers, attributes=self.router_attributes)
+        tools.save_dict_as_csv(routers_d, 'result_test.csv')
+        with open('result_test.csv', 'r') as fp:
+            self.assertEqual(expected, fp.read())
+
     def test_ordered_csv(self):
         showversions_d = tools.create_dict_from_objects(self.showversions)
         showinterfaces_d = tools.create_dict_from_objects(self.showinterfaces,
@@ -142,5 +261,125 @@ class TestTools(unittest.TestCase):
         if file_exists:
             os.remove('result_test.csv')
 
+
+class TestGroupKeys(unittest.TestCase):
+    def test_group_keys(self):
+        keylist = ['a', 'b', 'c', 'd', 'e', 'f']
+        group_ids = ['x', '', 'y', 'x', '', 'y']
+        self.assertEqual(['a', 'd', 'b', 'c', 'f', 'e'], tools.group_keys(keylist, group_ids))
+
+    def test_group_keys_unhashable(self):
+        keylist = ['a', 'b', 'c']
+        group_ids = [['x'], ['y'], ['x']]
+        self.assertEqual(['a', 'c', 'b'], tools.group_keys(keylist, group_ids))
+
+
+class TestRegexCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = tools.RegexCache(maxsize=2)
+        cache.compile('a')
+        cache.compile('b')
+        cache.compile('a')      # 'b' is now least recently used
+        cache.compile('c')
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertEqual(2, len(cache))
+        stats = cache.stats()
+        self.assertEqual((1, 3, 1), (stats['hits'], stats['misses'], stats['evictions']))
+        self.assertEqual([('a', 2), ('c', 1)], cache.uses())
+
+    def test_resize(self):
+        cache = tools.RegexCache(maxsize=10)
+        for regex in 'abcde':
+            cache.compile(regex)
+        cache.resize(2)
+        self.assertEqual(2, len(cache))
+        self.assertIn('e', cache)
+        self.assertEqual(3, cache.evictions)
+
+    def test_mapping(self):
+        cache = tools.RegexCache(maxsize=2)
+        cache.compile('a')
+        self.assertEqual(re.compile('a'), cache['a'])
+        self.assertEqual(['a'], list(cache.keys()))
+        cache['b'] = re.compile('b')
+        cache['c'] = re.compile('c')
+        self.assertEqual(['b', 'c'], list(cache))
+        del cache['b']
+        self.assertNotIn('b', cache)
+        self.assertRaises(KeyError, lambda: cache['b'])
+        self.assertEqual([('c', 0)], cache.uses())
+
+    def test_search_uses_cache(self):
+        regex = r'^hostname (test-regex-cache)$'
+        hits = tools.COMPILED_REGEXES.hits
+        lines = ['interface Loopback0', 'hostname test-regex-cache']
+        self.assertEqual('test-regex-cache', tools.search(regex, lines))
+        self.assertEqual(['test-regex-cache'], tools.search_all(regex, lines))
+        self.assertIn(regex, tools.COMPILED_REGEXES)
+        self.assertEqual(hits + 1, tools.regex_cache_stats()['hits'])
+
+
+def score_router_to_sp(router, sp):
+    score = 0
+    if router['hostname'] == sp['name']:
+        score += 2
+    if router['ip'] == sp['wan']:
+        score += 1
+    return score
+
+
+@score_on(['hostname', 'ip'], ['name', 'wan'])
+def score_router_to_sp_vectorized(routers, sp):
+    hostname = routers['hostname'][:, None] == sp['name'][None, :]
+    ip = routers['ip'][:, None] == sp['wan'][None, :]
+    return 2 * hostname + ip
+
+
+class TestCombine3(unittest.TestCase):
+    def setUp(self):
+        self.routers = {'r1': {'hostname': 'a', 'ip': '10.0.0.1'},
+                        'r2': {'hostname': 'b', 'ip': '10.0.1.1'},
+                        'r3': {'hostname': 'c', 'ip': '10.0.2.1'}}
+        self.sp = {'s1': {'name': 'a', 'wan': '10.0.0.1'},
+                   's2': {'name': 'b', 'wan': '10.0.9.9'},
+                   's3': {'name': 'x', 'wan': '10.0.1.1'},
+                   's4': {'name': 'z', 'wan': '10.9.9.9'}}
+
+    def test_combine3(self):
+        tools.combine3(self.routers, self.sp, score_router_to_sp, key_prepend='sp_')
+        self.assertEqual('a', self.routers['r1']['sp_name'])
+        self.assertEqual('b', self.routers['r2']['sp_name'])
+        self.assertEqual('', self.routers['r3']['sp_name'])
+        self.assertEqual('x', self.routers['unknown1']['sp_name'])
+        self.assertEqual('z', self.routers['unknown2']['sp_name'])
+
+    def test_combine3_no_unused(self):
+        tools.combine3(self.routers, self.sp, score_router_to_sp, add_unused=False)
+        six.assertCountEqual(self, ['r1', 'r2', 'r3'], self.routers.keys())
+
+    def test_combine3_block_key(self):
+        tools.combine3(self.routers, self.sp, score_router_to_sp, key_prepend='sp_',
+                       block_key=lambda item: item.get('ip', item.get('wan')).rsplit('.', 1)[0])
+        self.assertEqual('a', self.routers['r1']['sp_name'])
+        self.assertEqual('x', self.routers['r2']['sp_name'])
+        self.assertEqual('b', self.routers['unknown1']['sp_name'])
+
+    @unittest.skipIf(tools.np is None, 'numpy is not installed')
+    def test_combine3_vectorized(self):
+        routers = copy.deepcopy(self.routers)
+        tools.combine3(self.routers, self.sp, score_router_to_sp, key_prepend='sp_')
+        tools.combine3(routers, self.sp, score_router_to_sp_vectorized, key_prepend='sp_')
+        self.assertEqual(self.routers, routers)
+
+    @unittest.skipIf(tools.np is None, 'numpy is not installed')
+    def test_combine3_vectorized_block_key(self):
+        routers = copy.deepcopy(self.routers)
+        block_key = lambda item: item.get('ip', item.get('wan')).rsplit('.', 1)[0]
+        tools.combine3(self.routers, self.sp, score_router_to_sp, block_key=block_key)
+        tools.combine3(routers, self.sp, score_router_to_sp_vectorized, block_key=block_key)
+        self.assertEqual(self.routers, routers)
+
+
 if __name__ == '__main__':
     unittest.main()
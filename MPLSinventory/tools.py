@@ -3,10 +3,132 @@ import os
 import json
 import csv
 import re
+import traceback
+import multiprocessing
+import threading
+import time
 from copy import copy
+from itertools import islice
+from collections import OrderedDict, namedtuple, deque
 from tqdm import tqdm
+from MPLSinventory import instrument
+from MPLSinventory.configsource import ConfigLines
 
-COMPILED_REGEXES = {}
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+
+class RegexCache(MutableMapping):
+    """ Least recently used cache of compiled regexes.
+
+    at most maxsize patterns are kept, the least recently used pattern is
+    dropped when a new one is compiled. hits, misses, evictions and the time
+    spent in re.compile are counted, uses(n) lists the most used patterns.
+
+    it is also a mapping pattern -> compiled regex, like the dictionary that
+    COMPILED_REGEXES used to be. the mapping methods don't change the statistics
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._regexes = OrderedDict()
+        self._uses = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.compile_time = 0.0
+
+    def compile(self, regex):
+        with self._lock:
+            compiled_regex = self._regexes.pop(regex, None)
+            if compiled_regex is None:
+                self.misses += 1
+                start = time.time()
+                compiled_regex = re.compile(regex)
+                self.compile_time += time.time() - start
+                self._uses[regex] = 0
+                self._evict(self.maxsize - 1)
+            else:
+                self.hits += 1
+            self._uses[regex] += 1
+            self._regexes[regex] = compiled_regex   # (re)insert as most recently used
+            return compiled_regex
+
+    def _evict(self, size):
+        while self._regexes and len(self._regexes) > max(size, 0):
+            regex, _ = self._regexes.popitem(last=False)
+            del self._uses[regex]
+            self.evictions += 1
+
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict(maxsize)
+
+    def clear(self):
+        with self._lock:
+            self._regexes.clear()
+            self._uses.clear()
+            self.hits = self.misses = self.evictions = 0
+            self.compile_time = 0.0
+
+    def uses(self, n=None):
+        """ returns [(regex, uses)] for the cached patterns, most used first """
+        with self._lock:
+            result = sorted(self._uses.items(), key=lambda item: item[1], reverse=True)
+        return result[:n] if n is not None else result
+
+    def stats(self):
+        return {'size': len(self._regexes),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'compile_time': self.compile_time}
+
+    def __contains__(self, regex):
+        return regex in self._regexes
+
+    def __getitem__(self, regex):
+        return self._regexes[regex]
+
+    def __setitem__(self, regex, compiled_regex):
+        with self._lock:
+            if self._regexes.pop(regex, None) is None:
+                self._uses[regex] = 0
+                self._evict(self.maxsize - 1)
+            self._regexes[regex] = compiled_regex
+
+    def __delitem__(self, regex):
+        with self._lock:
+            del self._regexes[regex]
+            del self._uses[regex]
+
+    def __iter__(self):
+        return iter(list(self._regexes))
+
+    def __len__(self):
+        return len(self._regexes)
+
+
+COMPILED_REGEXES = RegexCache()
+
+
+def set_regex_cache_size(maxsize):
+    """ bound the number of compiled regexes kept by search and search_all """
+    COMPILED_REGEXES.resize(maxsize)
+
+
+def regex_cache_stats():
+    return COMPILED_REGEXES.stats()
 
 
 def search(regex, thing):
@@ -18,10 +140,14 @@ def search(regex, thing):
      - if the regex has a single capture group a single item is returned
      - if the regex has multiple capture groups, a tuple is returned with all subgroups
     """
+    return _search(COMPILED_REGEXES.compile(regex), thing)
+
+
+def _search(compiled_regex, thing):
     result = ()
-    if isinstance(thing, list):
+    if isinstance(thing, (list, ConfigLines)):
         for item in thing:
-            result = search(regex, item)
+            result = _search(compiled_regex, item)
             if result:
                 if isinstance(result, tuple):
                     if any(result):  # reduce(lambda x, y: bool(x) or bool(y), result):   # test if tuple has results
@@ -30,9 +156,6 @@ def search(regex, thing):
                     break
 
     if isinstance(thing, str):   # or isinstance(thing, unicode):
-        if regex not in COMPILED_REGEXES.keys():
-            COMPILED_REGEXES[regex] = re.compile(regex)
-        compiled_regex = COMPILED_REGEXES[regex]
         n = compiled_regex.groups       # number of capture groups requested
         result = tuple(n * [''])        # create tuple of empty strings
         match = compiled_regex.search(thing)
@@ -54,9 +177,10 @@ def search_all(regex, thing):
     result = []
     if isinstance(thing, str):
         thing = thing.splitlines()
-    if isinstance(thing, list):
+    if isinstance(thing, (list, ConfigLines)):
+        compiled_regex = COMPILED_REGEXES.compile(regex)
         for item in thing:
-            r = search(regex, item)
+            r = _search(compiled_regex, item)
             if isinstance(r, str):
                 if r:
                     result += [r]
@@ -67,32 +191,134 @@ def search_all(regex, thing):
 
 
 def list_files(regex, path):
-    return search_all(regex, os.listdir(path))
+    return search_all(regex, sorted(os.listdir(path)))
+
+
+def load_file(result_type, file_name, path='', capture_errors=False, cache=None, keep_config=True):
+    """Loads a single file as an object of result_type, returns (object, error).
+
+    The object is None if the file can not be loaded. If capture_errors is set,
+    an exception is returned as a traceback string instead of being raised.
+    cache and keep_config are passed to result_type.load."""
+    kwargs = {}
+    if cache is not None:
+        kwargs['cache'] = cache
+    if not keep_config:
+        kwargs['keep_config'] = keep_config
+    if not capture_errors:
+        return result_type.load(file_name, path=path, **kwargs), None
+    try:
+        return result_type.load(file_name, path=path, **kwargs), None
+    except Exception:
+        return None, traceback.format_exc()
+
+
+# the arguments of load_file for a file, send to the workers of read_files_to_objects
+LoadJob = namedtuple('LoadJob', ['result_type', 'file_name', 'path', 'capture_errors', 'cache', 'keep_config'])
+
+
+def _load_file(job):
+    """Loads the file of a LoadJob, returns (file_name, object, error)"""
+    return (job.file_name,) + load_file(*job)
+
+
+# the maximum default chunksize of read_files_to_objects, this limits the objects in memory
+MAX_CHUNKSIZE = 64
+
+
+def _load_files(jobs):
+    """Loads a chunk of LoadJobs in a worker, returns a list of (file_name, object, error)"""
+    return [_load_file(job) for job in jobs]
+
 
+def _imap_bounded(pool, jobs, chunksize, max_chunks):
+    """Yields the results of _load_file for the jobs in order, like pool.imap.
 
-def read_files_to_objects(path, result_type, regex=r'(.+)', id='', verbose=False):
-    result = {}
+    At most max_chunks chunks are submitted to the pool before their results are consumed."""
+    chunks = (jobs[i:i + chunksize] for i in range(0, len(jobs), chunksize))
+    pending = deque(pool.apply_async(_load_files, (chunk,)) for chunk in islice(chunks, max_chunks))
+    while pending:
+        results = pending.popleft().get()
+        for chunk in islice(chunks, 1):
+            pending.append(pool.apply_async(_load_files, (chunk,)))
+        for result in results:
+            yield result
+
+
+@instrument.timed()
+def read_files_to_objects(path, result_type, regex=r'(.+)', id='', verbose=False,
+                          workers=1, chunksize=None, errors=None, cache=None, keep_config=True):
+    """Loads all files in path that match the regex as objects of result_type.
+
+    Returns a dictionary with the attribute 'id' of the objects as keys,
+    or the file name if the object has no such attribute.
+    Files that can not be loaded (result_type.load returns None) are skipped,
+    they are recorded in errors if errors is given.
+
+    - workers > 1 loads the files in a pool of processes, the result is the
+      same dictionary in the same (sorted file name) order.
+    - chunksize is the number of files that is send to a worker at once,
+      by default the files are divided in 4 chunks per worker, with at most
+      MAX_CHUNKSIZE files per chunk.
+    - errors can be a dictionary, exceptions while loading a file are then stored
+      as errors[file_name] = traceback instead of being raised. A file that is
+      skipped is stored with the message 'no object loaded ...'.
+    - cache can be a ParseCache, unchanged files are loaded from the cache.
+    - keep_config=False releases the config lines of the objects after parsing.
+    """
+    return dict(iter_files_to_objects(path, result_type, regex=regex, id=id, verbose=verbose,
+                                      workers=workers, chunksize=chunksize, errors=errors,
+                                      cache=cache, keep_config=keep_config))
+
+
+def iter_files_to_objects(path, result_type, regex=r'(.+)', id='', verbose=False,
+                          workers=1, chunksize=None, errors=None, cache=None, keep_config=True):
+    """Generator that yields (key, object) for each file as soon as it is loaded.
+
+    The same as read_files_to_objects, but only the objects that have not been
+    consumed are kept in memory. With workers > 1 at most 2 chunks per worker
+    are loaded ahead of the consumer.
+    """
     file_names = list_files(regex, path)
-    # if verbose:
-    #     file_names = tqdm(file_names)
     total = len(file_names)
-    for i, file_name in enumerate(file_names, 1):
-        if verbose:
-            # pass
-            print("opening : {}/{} {}/{}...".format(i, total, path, file_name), end="")
-        value = result_type.load(file_name, path=path)
-        if value:
-            key = getattr(value, id, file_name)
-            result[key] = value
-            # del value.config
-            if verbose:
-                # pass
-                print("parsed config for :{}".format(key))
-        else:
+    jobs = [LoadJob(result_type, file_name, path, errors is not None, cache, keep_config)
+            for file_name in file_names]
+    pool = None
+    if workers > 1 and total > 1:
+        if chunksize is None:
+            chunksize = max(1, min(total // (workers * 4), MAX_CHUNKSIZE))
+        pool = multiprocessing.Pool(workers)
+        loaded = _imap_bounded(pool, jobs, chunksize, 2 * workers)
+    else:
+        loaded = (_load_file(job) for job in jobs)
+    completed = False
+    try:
+        for i, (file_name, value, error) in enumerate(loaded, 1):
             if verbose:
-                # pass
-                print("skipping")
-    return result
+                print("opening : {}/{} {}/{}...".format(i, total, path, file_name), end="")
+            if error:
+                errors[file_name] = error
+                if verbose:
+                    print("error")
+            elif value:
+                key = getattr(value, id, file_name)
+                if verbose:
+                    print("parsed config for :{}".format(key))
+                yield key, value
+            else:
+                if errors is not None:
+                    errors[file_name] = 'no object loaded, {}.load returned {!r}'.format(
+                        result_type.__name__, value)
+                if verbose:
+                    print("skipping")
+        completed = True
+    finally:
+        if pool is not None:
+            if completed:
+                pool.close()
+            else:
+                pool.terminate()
+            pool.join()
 
 
 def assign_attr_if_better(attribute_name, obj1, obj2):
@@ -104,6 +330,9 @@ def assign_attr_if_better(attribute_name, obj1, obj2):
         setattr(obj2, attribute_name, attribute_obj1)
 
 
+ATTRIBUTE_GETTERS = {}
+
+
 def getattr_recursive(obj, name):
     """Gets attributes from objects recursively.
 
@@ -111,10 +340,17 @@ def getattr_recursive(obj, name):
     'todo': lists and dicts
 
     """
+    return attribute_getter(name)(obj)
+
 
-    # split the name into a queue of keywords
+def parse_attribute_path(name):
+    """Splits an attribute path into a list of attribute names, dictionary keys and list indexes.
+
+    "interfaces['Loopback1'].ip.ip" -> ['interfaces', 'Loopback1', 'ip', 'ip']
+    """
     name_queue = []
     while name:
+        start = name
         if name[0] == '.':
             name = name[1:]
         attribute, remainder = search(r'^([\w_]+)(.*)', name)           # normal attribute name
@@ -129,53 +365,107 @@ def getattr_recursive(obj, name):
         if index:
             name = remainder
             name_queue.append(int(index))
+        if name == start:
+            raise ValueError('invalid attribute path: {}'.format(name))
+    return name_queue
 
-    # retrieve the keywords from the object.
-    result = obj
-    while name_queue and result:
-        if isinstance(result, list):
-            index = name_queue.pop(0)
-            if index < len(result):
-                result = result[index]
-            else:
-                result = ''
-        elif isinstance(result, dict):
-            key = name_queue.pop(0)
-            if key in result.keys():
-                result = result[key]
-            else:
-                result = ''
-        else:
-            attribute = name_queue.pop(0)
-            result = getattr(result, attribute, '')
-    return result
 
+def attribute_getter(name):
+    """Returns a function that gets the attribute path 'name' from an object, see getattr_recursive.
 
+    The path is parsed only once, the getters are cached in ATTRIBUTE_GETTERS.
+    """
+    getter = ATTRIBUTE_GETTERS.get(name)
+    if getter is None:
+        name_queue = tuple(parse_attribute_path(name))
+
+        def getter(obj):
+            # retrieve the keywords from the object.
+            result = obj
+            for keyword in name_queue:
+                if not result:
+                    break
+                if isinstance(result, list):
+                    if keyword < len(result):
+                        result = result[keyword]
+                    else:
+                        result = ''
+                elif isinstance(result, dict):
+                    if keyword in result:
+                        result = result[keyword]
+                    else:
+                        result = ''
+                else:
+                    result = getattr(result, keyword, '')
+            return result
+
+        ATTRIBUTE_GETTERS[name] = getter
+    return getter
+
+
+@instrument.timed()
 def create_dict_from_objects(objects, attributes=[]):
     """to improve, convert ip objects to str (if type is ip then str(obj))"""
-    result = {}
-    for key, my_obj in objects.items():
+    return dict(iter_dict_from_objects(objects, attributes))
+
+
+def iter_dict_from_objects(objects, attributes=[]):
+    """Generator that yields (key, json_object) for each object, see create_dict_from_objects.
+
+    objects can be a dictionary or an iterable of (key, object) pairs, e.g. from
+    iter_files_to_objects."""
+    if isinstance(objects, dict):
+        objects = objects.items()
+    getters = [(attribute, attribute_getter(attribute)) for attribute in attributes]
+    for key, my_obj in objects:
         if not attributes:
-            result[key] = my_obj.json()
+            yield key, my_obj.json()
         else:
             r = {}
-            for attribute in attributes:
-                item = getattr_recursive(my_obj, attribute)
+            for attribute, getter in getters:
+                item = getter(my_obj)
                 if attribute.endswith('ip') and item:
                     item = str(item)
                 if attribute == 'hsrp' and item:
                     item = str(item)
                 r[attribute] = item
-            result[key] = r
-    return result
+            yield key, r
 
 
+@instrument.timed()
 def save_dict_as_json(dict, filename):
+    """Saves a dictionary as json.
+
+    dict can also be an iterable of (key, json_object) pairs, e.g. from iter_dict_from_objects.
+    The pairs are then written one by one, the file is the same as for a dictionary."""
     with open(filename, 'w') as fp:
-        json.dump(dict, fp, indent=4)
+        if isinstance(dict, type({})):
+            json.dump(dict, fp, indent=4)
+            return
+        separator = '{\n'
+        for key, value in dict:
+            fp.write(separator)
+            # dump as a dictionary without the braces, for identical keys and indentation
+            fp.write(json.dumps({key: value}, indent=4)[2:-2])
+            separator = ',\n'
+        if separator == '{\n':
+            fp.write('{}')
+        else:
+            fp.write('\n}')
 
 
+@instrument.timed()
 def save_dict_as_csv(jdict, filename, attributes=None, sort_by=None, group_by=None):
+    """Saves a dictionary of json_objects as csv, with a column per attribute.
+
+    jdict can also be an iterable of (key, json_object) pairs, e.g. from iter_dict_from_objects.
+    Without sort_by and group_by the rows are then written one by one."""
+    if not isinstance(jdict, dict):
+        if not sort_by and not group_by:
+            with open(filename, 'w') as fp:
+                _write_csv_rows(fp, (item for key, item in jdict), attributes)
+            return
+        jdict = OrderedDict(jdict)
     keylist = list(jdict.keys())
     if attributes is None:
         attributes = list(jdict[keylist[0]].keys())
@@ -185,37 +475,76 @@ def save_dict_as_csv(jdict, filename, attributes=None, sort_by=None, group_by=No
         keylist = sorted(keylist, key=lambda i: jdict[i][sort_by])
         keylist.extend(emptys)
     if group_by:
-        keylist2 = copy(keylist)
-        keylist = []
-        while keylist2:
-            key = keylist2.pop(0)
-            keylist.append(key)
-            if jdict[key][group_by]:
-                group_id = jdict[key][group_by]
-                group = []
-                for key in keylist2:
-                    if jdict[key][group_by] == group_id:
-                        group.append(key)
-                keylist.extend(group)
-                for key in group:
-                    keylist2.remove(key)
+        keylist = group_keys(keylist, [jdict[key][group_by] for key in keylist])
 
     with open(filename, 'w') as fp:
-        f = csv.writer(fp)
+        _write_csv_rows(fp, (jdict[key] for key in keylist), attributes)
+
+
+def group_keys(keylist, group_ids):
+    """Returns the keylist with the other keys of a group directly after the first key of the group.
+
+    - group_ids[i] is the group of keylist[i], keys with an empty group_id are not grouped.
+
+    The groups and the keys within a group keep the order of the keylist.
+    """
+    groups = {}
+    unhashable_groups = []
+
+    def members(group_id):
+        try:
+            return groups.setdefault(group_id, [])
+        except TypeError:
+            for other_id, group in unhashable_groups:
+                if other_id == group_id:
+                    return group
+            unhashable_groups.append((group_id, []))
+            return unhashable_groups[-1][1]
+
+    for key, group_id in zip(keylist, group_ids):
+        if group_id:
+            members(group_id).append(key)
+
+    result = []
+    added = set()
+    for key, group_id in zip(keylist, group_ids):
+        if key in added:
+            continue
+        if group_id:
+            group = members(group_id)
+            result.extend(group)
+            added.update(group)
+        else:
+            result.append(key)
+    return result
+
+
+def _write_csv_rows(fp, items, attributes=None, batch_size=1000):
+    """Writes the json_objects as csv rows, the attributes of the first item are used by default.
+    The rows are written in batches of batch_size rows."""
+    f = csv.writer(fp)
+    if attributes is not None:
         f.writerow(attributes)
-        for key in keylist:
-            item = jdict[key]
-            row = []
-            for attribute in attributes:
-                value = ''
-                if attribute in item.keys():
-                    value = item[attribute]
-                    #  if isinstance(value, list):
-                    #   value = '; '.join(value)      # TODO doesnt work if value is a list of lists or tuples
-                row.append(value)
-            if "lan_ips" in item.keys():
-                row.extend(item["lan_ips"])
-            f.writerow(row)
+    batch = []
+    for item in items:
+        if attributes is None:
+            attributes = list(item.keys())
+            f.writerow(attributes)
+        row = []
+        for attribute in attributes:
+            value = ''
+            if attribute in item.keys():
+                value = item[attribute]
+                #  if isinstance(value, list):
+                #   value = '; '.join(value)      # TODO doesnt work if value is a list of lists or tuples
+            row.append(value)
+        if "lan_ips" in item.keys():
+            row.extend(item["lan_ips"])
+        batch.append(row)
+        if len(batch) >= batch_size:
+            f.writerows(batch)
+            batch = []
+    f.writerows(batch)
 
 
 def create_empty_template(json_object):
@@ -251,9 +580,21 @@ def copy_json_object(json_object1, json_object2, attributes=None, key_prepend=''
         json_object1[key1] = json_object2[attribute]
 
 
+def index_dict(jdict, key_function):
+    """Returns a dictionary key_function(json_object) -> json_object for the values in jdict.
+    If multiple json_objects have the same key, the first one is kept."""
+    index = {}
+    for json_object in jdict.values():
+        index.setdefault(key_function(json_object), json_object)
+    return index
+
+
+@instrument.timed()
 def combine(dict1, dict2, match_function, key_prepend='', verbose=False):
     """combine the json_objects in dict1 with dict2
     - match_function(json_object, dict2) will return the best matching json_object from dict2
+    - if the match_function declares match_keys (see matchrules.match_on), dict2 is indexed
+      once and the matches are looked up in the index
     - dict1 will contain all the combined jsons
     - the keys of the copied items will be prepended with the key_prepend
     - ?? mismatching items will be stored in dict1['mismatch']
@@ -262,6 +603,16 @@ def combine(dict1, dict2, match_function, key_prepend='', verbose=False):
     # empty_json_object2 = create_empty_template(dict2[dict2.keys()[0]])
     empty_json_object2 = create_empty_template(dict2[list(dict2.keys())[0]])
 
+    index = None
+    match_keys = getattr(match_function, 'match_keys', None)
+    if match_keys:
+        key_function1, key_function2 = match_keys
+        try:
+            index = index_dict(dict2, key_function2)
+        except TypeError:
+            # unhashable keys, use the match_function
+            index = None
+
     if verbose:
         keylist = tqdm(dict1.keys())
     else:
@@ -269,12 +620,16 @@ def combine(dict1, dict2, match_function, key_prepend='', verbose=False):
 
     for key1 in keylist:
         json_object1 = dict1[key1]
-        json_object2 = match_function(json_object1, dict2)
+        if index is not None:
+            json_object2 = index.get(key_function1(json_object1))
+        else:
+            json_object2 = match_function(json_object1, dict2)
         if not json_object2:
             json_object2 = empty_json_object2
         copy_json_object(json_object1, json_object2, key_prepend=key_prepend)
 
 
+@instrument.timed()
 def combine2(dict1, dict2, match_function, key_prepend=''):
     """combine the json_objects in dict1 with dict2 and create a new dict
     - match_function(json_object, dict2) will return the best matching json_object from dict2
@@ -303,7 +658,9 @@ def combine2(dict1, dict2, match_function, key_prepend=''):
         dict1['mismatch'+str(i)] = json_object1
 
 
-def combine3(dict1, dict2, score_function, key_prepend='', add_unused=True, verbose=False, unknown='unknown'):
+@instrument.timed()
+def combine3(dict1, dict2, score_function, key_prepend='', add_unused=True, verbose=False, unknown='unknown',
+             block_key=None):
     """combine best match from dict2 to dict1 based on a score.
     For each item in dict1 the best possible candidate from dict2 is combined.
 
@@ -314,47 +671,33 @@ def combine3(dict1, dict2, score_function, key_prepend='', add_unused=True, verb
     If these max(score)'s are identical there is a fit.
     If not, the canidate in dict2 has a better fit to another dict1 item.
 
+    The score matrix is not stored, only the max score per item in dict2 and the
+    max scoring candidates per item in dict1 are kept.
+
+    - block_key(json_object) can return a key for each item, only the items of dict1 and
+      dict2 with the same key are scored, e.g. the /24 of the ip address or a hostname prefix.
+    - if the score_function declares score_fields (see matchrules.score_on), it is called
+      with numpy arrays of these fields and returns a 2-D score matrix for a block of items.
     """
     empty_json_object1 = create_empty_template(dict1[list(dict1.keys())[0]])
     empty_json_object2 = create_empty_template(dict2[list(dict2.keys())[0]])
-    # empty_json_object1 = create_empty_template(dict1.values()[0])
-    # empty_json_object2 = create_empty_template(dict2.values()[0])
     keys1 = list(dict1.keys())
     keys2 = list(dict2.keys())
     used_keys2 = []
-    scores_matrix = []
-    candidates = {}
 
-    if verbose:
-        keylist = tqdm(keys1)
+    if getattr(score_function, 'score_fields', None):
+        candidates, column_max = _score_candidates_vectorized(dict1, dict2, keys1, keys2,
+                                                              score_function, block_key)
     else:
-        keylist = keys1
-
-    for k1 in keylist:
-        # create matrix row
-        row = []
-        for k2 in keys2:
-            score = score_function(dict1[k1], dict2[k2])
-            row.append(score)
-        scores_matrix.append(row)
-
-        # find max scoring elements from dict2 as candidates for dict1[k1]
-        candidates[k1] = []
-        max_score = max(row)
-        # find k2's for that score
-        if max_score > 0:
-            for i, (k2, score) in enumerate(zip(keys2, row)):
-                if score == max_score:
-                    candidates[k1].append((i, k2, score))
+        candidates, column_max = _score_candidates(dict1, dict2, keys1, keys2,
+                                                   score_function, block_key, verbose)
 
     for k1 in keys1:
         json_object1 = dict1[k1]
         json_object2 = empty_json_object2
 
         for i, k2, score in candidates[k1]:
-            keys2_column = column(scores_matrix, i)
-            max_score = max(keys2_column)
-            if max_score == score:
+            if column_max[i] == score:
                 json_object2 = dict2[k2]
                 used_keys2.append(k2)
 
@@ -373,7 +716,8 @@ def combine3(dict1, dict2, score_function, key_prepend='', add_unused=True, verb
         else:
             start_unknown_value = 1
 
-        unused_keys2 = list(set(keys2)-set(used_keys2))
+        used_keys2 = set(used_keys2)
+        unused_keys2 = [k2 for k2 in keys2 if k2 not in used_keys2]
         for i, key2 in enumerate(unused_keys2, start=start_unknown_value):
             json_object1 = copy(empty_json_object1)
             json_object2 = dict2[key2]
@@ -381,5 +725,88 @@ def combine3(dict1, dict2, score_function, key_prepend='', add_unused=True, verb
             dict1[unknown+str(i)] = json_object1
 
 
+def _block_indices(dict1, dict2, keys1, keys2, block_key):
+    """Returns a list of (indices in keys1, indices in keys2) that should be scored"""
+    if not block_key:
+        return [(list(range(len(keys1))), list(range(len(keys2))))]
+    blocks = {}
+    for i, k2 in enumerate(keys2):
+        blocks.setdefault(block_key(dict2[k2]), ([], []))[1].append(i)
+    for i, k1 in enumerate(keys1):
+        block = blocks.get(block_key(dict1[k1]))
+        if block:
+            block[0].append(i)
+    return [block for block in blocks.values() if block[0]]
+
+
+def _score_candidates(dict1, dict2, keys1, keys2, score_function, block_key=None, verbose=False):
+    """Scores the items of dict1 against dict2 for combine3, returns (candidates, column_max).
+
+    - candidates[k1] is a list of (index in keys2, k2, score) for the max scoring items of dict2
+    - column_max[i] is the max score of keys2[i] to all items in dict1
+    """
+    column_max = len(keys2) * [None]
+    candidates = dict((k1, []) for k1 in keys1)
+    for rows, columns in _block_indices(dict1, dict2, keys1, keys2, block_key):
+        if verbose:
+            rows = tqdm(rows)
+        for row in rows:
+            json_object1 = dict1[keys1[row]]
+            # find max scoring elements from dict2 as candidates for dict1[k1]
+            max_score = None
+            row_candidates = []
+            for i in columns:
+                score = score_function(json_object1, dict2[keys2[i]])
+                if column_max[i] is None or score > column_max[i]:
+                    column_max[i] = score
+                if max_score is None or score > max_score:
+                    max_score = score
+                    row_candidates = [i]
+                elif score == max_score:
+                    row_candidates.append(i)
+            if max_score is not None and max_score > 0:
+                candidates[keys1[row]] = [(i, keys2[i], max_score) for i in row_candidates]
+    return candidates, column_max
+
+
+def _field_array(values):
+    """Returns a numpy array of values, mixed types are stored as objects"""
+    array = np.asarray(values)
+    if array.dtype.kind == 'U' and not all(isinstance(value, str) for value in values):
+        array = np.asarray(values, dtype=object)
+    return array
+
+
+def _score_candidates_vectorized(dict1, dict2, keys1, keys2, score_function, block_key=None,
+                                 block_size=1024):
+    """Scores the items of dict1 against dict2 with numpy, returns (candidates, column_max).
+
+    The score_function is called with dictionaries of field arrays for at most block_size
+    items of dict1 and all (blocked) items of dict2, see _score_candidates for the result.
+    """
+    if np is None:
+        raise ImportError('numpy is required for a score_function with score_fields')
+    fields1, fields2 = score_function.score_fields
+    arrays1 = dict((field, _field_array([dict1[k1][field] for k1 in keys1])) for field in fields1)
+    arrays2 = dict((field, _field_array([dict2[k2][field] for k2 in keys2])) for field in fields2)
+    column_max = np.full(len(keys2), -np.inf)
+    candidates = dict((k1, []) for k1 in keys1)
+    for rows, columns in _block_indices(dict1, dict2, keys1, keys2, block_key):
+        rows = np.asarray(rows, dtype=np.intp)
+        columns = np.asarray(columns, dtype=np.intp)
+        block2 = dict((field, array[columns]) for field, array in arrays2.items())
+        for start in range(0, len(rows), block_size):
+            block_rows = rows[start:start + block_size]
+            block1 = dict((field, array[block_rows]) for field, array in arrays1.items())
+            scores = np.asarray(score_function(block1, block2))
+            column_max[columns] = np.maximum(column_max[columns], scores.max(axis=0))
+            row_max = scores.max(axis=1)
+            for j in np.nonzero(row_max > 0)[0]:
+                score = row_max[j].item()
+                candidates[keys1[block_rows[j]]] = [(i, keys2[i], score) for i in
+                                                    columns[scores[j] == row_max[j]].tolist()]
+    return candidates, column_max.tolist()
+
+
 def column(matrix, i):
     return [row[i] for row in matrix]
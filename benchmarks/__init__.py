@@ -0,0 +1 @@
+from __future__ import print_function
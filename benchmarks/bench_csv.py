@@ -0,0 +1,85 @@
+from __future__ import print_function
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from copy import copy
+from MPLSinventory.tools import group_keys, save_dict_as_csv
+
+
+"""Benchmark for save_dict_as_csv with sort_by and group_by.
+
+   Compares the ordering of group_keys with the original quadratic grouping.
+
+   python -m benchmarks.bench_csv --routers 20000
+"""
+
+
+def legacy_group_keys(jdict, keylist, group_by):
+    """The original grouping of save_dict_as_csv"""
+    keylist2 = copy(keylist)
+    keylist = []
+    while keylist2:
+        key = keylist2.pop(0)
+        keylist.append(key)
+        if jdict[key][group_by]:
+            group_id = jdict[key][group_by]
+            group = []
+            for key in keylist2:
+                if jdict[key][group_by] == group_id:
+                    group.append(key)
+            keylist.extend(group)
+            for key in group:
+                keylist2.remove(key)
+    return keylist
+
+
+def routers_dict(routers, seed=1):
+    """Returns a dictionary like create_dict_from_objects, a third of the routers is a pair"""
+    rnd = random.Random(seed)
+    jdict = {}
+    for n in range(routers):
+        pair_with = ''
+        if rnd.random() < 0.66:
+            pair_with = 'site-{}'.format(rnd.randrange(routers // 3 + 1))
+        jdict['router-{}'.format(n)] = {'hostname': 'router-{}'.format(n),
+                                        'pair_with': pair_with,
+                                        'hsrp': '10.0.{}.1'.format(n % 250),
+                                        'bandwidth': rnd.choice([2000, 10000, 20000])}
+    return jdict
+
+
+def timed(function, *args, **kwargs):
+    start = time.time()
+    result = function(*args, **kwargs)
+    return result, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--routers', type=int, default=20000)
+    args = parser.parse_args()
+
+    jdict = routers_dict(args.routers)
+    keylist = sorted(jdict.keys(), key=lambda key: jdict[key]['hostname'])
+
+    legacy, legacy_time = timed(legacy_group_keys, jdict, keylist, 'pair_with')
+    grouped, grouped_time = timed(group_keys, keylist, [jdict[key]['pair_with'] for key in keylist])
+    print('routers={}  legacy grouping={:.3f}s  group_keys={:.3f}s  identical order={}'.format(
+        args.routers, legacy_time, grouped_time, legacy == grouped))
+
+    path = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(path, 'routers.csv')
+        _, csv_time = timed(save_dict_as_csv, jdict, filename, sort_by='hostname', group_by='pair_with')
+        print('save_dict_as_csv(sort_by, group_by)={:.3f}s'.format(csv_time))
+    finally:
+        shutil.rmtree(path)
+    if legacy != grouped:
+        raise SystemExit('the order of group_keys differs from the original grouping')
+
+
+if __name__ == '__main__':
+    main()
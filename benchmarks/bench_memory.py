@@ -0,0 +1,53 @@
+from __future__ import print_function
+import gc
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+from MPLSinventory.router import MPLSRouter
+from MPLSinventory.tools import read_files_to_objects
+from benchmarks.synthetic import write_configs
+
+
+"""Memory benchmark for MPLSRouter objects with and without the config lines.
+
+   python -m benchmarks.bench_memory --routers 500 --interfaces 30
+"""
+
+
+def measure(path, keep_config):
+    """Returns (memory in use, peak memory, number of routers) after loading all configs in path"""
+    gc.collect()
+    tracemalloc.start()
+    routers = read_files_to_objects(path, MPLSRouter, id='hostname', keep_config=keep_config)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, peak, len(routers)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--routers', type=int, default=500)
+    parser.add_argument('--interfaces', type=int, default=30)
+    parser.add_argument('--acl-lines', type=int, default=200)
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp()
+    try:
+        write_configs(path, routers=args.routers, interfaces=args.interfaces, acl_lines=args.acl_lines)
+        results = {}
+        for keep_config in (True, False):
+            results[keep_config] = measure(path, keep_config)
+            current, peak, count = results[keep_config]
+            print('keep_config={!s:5}  routers={}  in use={:8.1f} MiB  peak={:8.1f} MiB'.format(
+                keep_config, count, current / 2.0**20, peak / 2.0**20))
+        saved = results[True][0] - results[False][0]
+        print('saved {:.1f} MiB ({:.0%}) by releasing the config lines'.format(
+            saved / 2.0**20, float(saved) / results[True][0]))
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main()
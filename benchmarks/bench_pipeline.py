@@ -0,0 +1,172 @@
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+from copy import deepcopy
+from MPLSinventory.router import MPLSRouter
+from MPLSinventory.telnet import ShowVersion
+from MPLSinventory.matchrules import match_telnet_to_router, score_on
+from MPLSinventory import tools
+from benchmarks.synthetic import write_configs, write_telnet
+
+
+"""Benchmark of the parser and reconciliation steps of an inventory run.
+
+   Synthetic configs and telnet outputs are generated for each number of
+   routers, every step is timed and the fastest of --repeat runs is reported.
+   The results are written as json to compare releases:
+
+   python -m benchmarks.bench_pipeline --sizes 10,100,1000 --output results.json
+"""
+
+
+ROUTER_ATTRIBUTES = ['hostname', "interfaces['Loopback1'].ip.ip", 'wan.name', 'qos_interface',
+                     'bandwidth', 'hsrp', 'local_as']
+LOOPBACK = "interfaces['Loopback1'].ip.ip"
+
+
+def score_router_to_sp(router, sp):
+    score = 0
+    if router['hostname'] == sp['name']:
+        score += 2
+    if router[LOOPBACK] == sp['loopback']:
+        score += 1
+    return score
+
+
+@score_on(['hostname', LOOPBACK], ['name', 'loopback'])
+def score_router_to_sp_vectorized(routers, sp):
+    return (2 * (routers['hostname'][:, None] == sp['name'][None, :]) +
+            (routers[LOOPBACK][:, None] == sp['loopback'][None, :]))
+
+
+def sp_inventory(routers_d, seed=1):
+    """Returns a Service Provider inventory for the routers, with renamed and missing routers"""
+    rnd = random.Random(seed)
+    sp = {}
+    for i, router in enumerate(sorted(routers_d.values(), key=lambda router: router['hostname'])):
+        r = rnd.random()
+        if r < 0.05:
+            continue
+        name = router['hostname'] if r < 0.9 else 'renamed-{}'.format(i)
+        sp['sp-{}'.format(i)] = {'name': name, 'loopback': router[LOOPBACK], 'bandwidth': router['bandwidth']}
+    return sp
+
+
+def timed(function, *args, **kwargs):
+    start = time.time()
+    result = function(*args, **kwargs)
+    return result, time.time() - start
+
+
+def fastest(repeat, function, *args, **kwargs):
+    """Returns (result of the last run, fastest time of repeat runs)"""
+    best = None
+    for _ in range(repeat):
+        result, elapsed = timed(function, *args, **kwargs)
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def fastest_on_copy(repeat, function, data, *args, **kwargs):
+    """Returns fastest(repeat, function, data, ...), data is copied before each run, outside of the timing"""
+    best = None
+    for _ in range(repeat):
+        result, elapsed = timed(function, deepcopy(data), *args, **kwargs)
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def construct_routers(configs):
+    return [MPLSRouter(config) for config in configs]
+
+
+def bench_size(path, routers, repeat, workers, combine3_limit, **kwargs):
+    """Returns a dictionary step -> seconds for a number of routers"""
+    config_dir = os.path.join(path, 'configs')
+    telnet_dir = os.path.join(path, 'telnet')
+    file_names = write_configs(config_dir, routers=routers, **kwargs)
+    write_telnet(telnet_dir, routers=routers, **kwargs)
+    configs = []
+    for file_name in file_names:
+        with open(os.path.join(config_dir, file_name)) as fp:
+            configs.append(fp.readlines())
+
+    results = {}
+    _, results['construct_mplsrouter'] = fastest(repeat, construct_routers, configs)
+    objects, results['read_files_to_objects'] = fastest(repeat, tools.read_files_to_objects, config_dir,
+                                                        MPLSRouter, id='hostname')
+    if workers > 1:
+        _, results['read_files_to_objects_workers'] = fastest(repeat, tools.read_files_to_objects, config_dir,
+                                                              MPLSRouter, id='hostname', workers=workers)
+    showversions, results['read_show_version'] = fastest(repeat, tools.read_files_to_objects,
+                                                         os.path.join(telnet_dir, 'version'), ShowVersion)
+    routers_d, results['create_dict_from_objects'] = fastest(repeat, tools.create_dict_from_objects, objects,
+                                                             attributes=ROUTER_ATTRIBUTES)
+    _, results['save_dict_as_csv'] = fastest(repeat, tools.save_dict_as_csv, routers_d,
+                                             os.path.join(path, 'routers.csv'), sort_by='hostname')
+
+    showversions_d = tools.create_dict_from_objects(showversions)
+    _, results['combine'] = fastest_on_copy(repeat, tools.combine, routers_d, showversions_d,
+                                            match_telnet_to_router)
+    sp = sp_inventory(routers_d)
+    if routers <= combine3_limit:
+        _, results['combine3'] = fastest_on_copy(repeat, tools.combine3, routers_d, sp, score_router_to_sp,
+                                                 key_prepend='sp_')
+        if tools.np is not None:
+            _, results['combine3_vectorized'] = fastest_on_copy(repeat, tools.combine3, routers_d, sp,
+                                                                score_router_to_sp_vectorized, key_prepend='sp_')
+    block_key = lambda item: item.get(LOOPBACK, item.get('loopback'))
+    _, results['combine3_block_key'] = fastest_on_copy(repeat, tools.combine3, routers_d, sp, score_router_to_sp,
+                                                       key_prepend='sp_', block_key=block_key)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10,100,1000', help='comma separated numbers of routers')
+    parser.add_argument('--interfaces', type=int, default=10)
+    parser.add_argument('--qos-policies', type=int, default=2)
+    parser.add_argument('--bgp-neighbors', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--combine3-limit', type=int, default=2000,
+                        help='largest number of routers for the unblocked combine3 (n x m scores)')
+    parser.add_argument('--output', help='json file for the results, default is stdout')
+    args = parser.parse_args()
+
+    report = {'python': platform.python_version(),
+              'platform': platform.platform(),
+              'numpy': tools.np is not None,
+              'parameters': {'interfaces': args.interfaces, 'qos_policies': args.qos_policies,
+                             'bgp_neighbors': args.bgp_neighbors, 'repeat': args.repeat,
+                             'workers': args.workers},
+              'results': {}}
+    for size in [int(size) for size in args.sizes.split(',')]:
+        path = tempfile.mkdtemp()
+        try:
+            results = bench_size(path, size, args.repeat, args.workers, args.combine3_limit,
+                                 interfaces=args.interfaces, qos_policies=args.qos_policies,
+                                 bgp_neighbors=args.bgp_neighbors)
+        finally:
+            shutil.rmtree(path)
+        report['results'][str(size)] = results
+        print('routers={}  '.format(size) + '  '.join('{}={:.3f}s'.format(step, seconds)
+                                                       for step, seconds in sorted(results.items())),
+              file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=4, sort_keys=True)
+    else:
+        print(json.dumps(report, indent=4, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()
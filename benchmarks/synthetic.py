@@ -0,0 +1,197 @@
+from __future__ import print_function
+import os
+
+
+"""Module that generates synthetic IOS configurations for the benchmarks.
+
+   The configurations follow the layout of the sample configs in
+   MPLSinventory/test/sample_configs, scaled by the number of interfaces,
+   QoS policies, BGP neighbors and access-list lines per router.
+"""
+
+
+def _ip(i):
+    return '.'.join(str((i >> shift) & 255) for shift in (24, 16, 8, 0))
+
+
+def loopback_ip(n):
+    """Returns the Loopback1 address of router n, the ip of its telnet outputs"""
+    return _ip((10 << 24) + (255 << 16) + n)
+
+
+def _lan_network(n, i, interfaces):
+    return (10 << 24) + (((n * interfaces + i) << 8) & 0xffffff)
+
+
+def _wan_network(n):
+    return (172 << 24) + (16 << 16) + 4 * n
+
+
+def _bgp_neighbor(n, i, interfaces):
+    return _ip(_lan_network(n, 0, interfaces) + 3 + i)
+
+
+def router_config(n, interfaces=10, qos_policies=2, bgp_neighbors=3, acl_lines=0):
+    """Returns the configuration of router n as a string"""
+    lines = ['!',
+             'version 15.1',
+             'service timestamps debug datetime msec localtime show-timezone',
+             'service password-encryption',
+             '!',
+             'hostname router-{}'.format(n),
+             '!',
+             'logging buffered 1000',
+             '!']
+
+    for p in range(qos_policies):
+        lines += ['policy-map QOS-OUT-{}'.format(p),
+                  ' description QOS_OUTBOUND_POLICY',
+                  ' class realtime_output',
+                  '  priority percent 30',
+                  '  police 6504000 16000 16000 conform-action transmit  exceed-action drop',
+                  ' class gold_output',
+                  '  bandwidth 3635',
+                  '  random-detect dscp-based',
+                  ' class silver_output',
+                  '  bandwidth 3635',
+                  '  random-detect dscp-based',
+                  ' class class-default',
+                  '  bandwidth 1211',
+                  '  random-detect']
+    lines += ['policy-map SHAPER-OUT',
+              ' class class-default',
+              '  shape average 19800000',
+              '  service-policy QOS-OUT-0',
+              '!']
+
+    lines += ['interface Loopback1',
+              ' description *** management address ***',
+              ' ip address {} 255.255.255.255'.format(loopback_ip(n)),
+              '!',
+              'interface GigabitEthernet0/0',
+              ' description *** LAN trunk ***',
+              ' no ip address',
+              ' duplex auto',
+              ' speed auto',
+              '!']
+    for i in range(interfaces):
+        vlan = 100 + i
+        network = _lan_network(n, i, interfaces)
+        lines += ['interface GigabitEthernet0/0.{}'.format(vlan),
+                  ' description *** LAN vlan {} ***'.format(vlan),
+                  ' encapsulation dot1Q {}'.format(vlan),
+                  ' ip address {} 255.255.255.0'.format(_ip(network + 2)),
+                  ' ip helper-address 10.100.1.1',
+                  ' ip helper-address 10.100.1.2',
+                  ' standby 1 ip {}'.format(_ip(network + 1)),
+                  ' standby 1 priority 110',
+                  ' service-policy input QOS-IN',
+                  '!']
+    wan = _wan_network(n)
+    lines += ['interface GigabitEthernet0/1',
+              ' description *** WAN interface ***',
+              ' bandwidth 20000',
+              ' no ip address',
+              ' service-policy output SHAPER-OUT',
+              '!',
+              'interface GigabitEthernet0/1.101',
+              ' description *** WAN interface ***',
+              ' encapsulation dot1Q 101',
+              ' ip address {} 255.255.255.252'.format(_ip(wan + 2)),
+              ' ip mtu 1500',
+              '!']
+
+    lines += ['router bgp 64512',
+              ' bgp log-neighbor-changes',
+              ' neighbor {} remote-as 10001'.format(_ip(wan + 1)),
+              ' neighbor {} description *** EBGP to PE router ***'.format(_ip(wan + 1)),
+              ' neighbor {} send-community'.format(_ip(wan + 1))]
+    for i in range(bgp_neighbors):
+        neighbor = _bgp_neighbor(n, i, interfaces)
+        lines += [' neighbor {} remote-as 64512'.format(neighbor),
+                  ' neighbor {} next-hop-self'.format(neighbor)]
+    lines += ['!']
+
+    if acl_lines:
+        lines += ['ip access-list extended BLOCK_MGMT']
+        for i in range(acl_lines):
+            lines += [' permit ip host {} any'.format(_ip((192 << 24) + (168 << 16) + i))]
+        lines += ['!']
+    lines += ['line vty 0 4', ' transport input ssh', '!', 'end']
+    return '\n'.join(lines) + '\n'
+
+
+def write_configs(path, routers=100, **kwargs):
+    """Writes the configuration of routers to path, returns the list of file names.
+
+    The keyword arguments are passed to router_config."""
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    file_names = []
+    for n in range(routers):
+        file_name = 'router_{}.cfg'.format(n)
+        with open(os.path.join(path, file_name), 'w') as fp:
+            fp.write(router_config(n, **kwargs))
+        file_names.append(file_name)
+    return file_names
+
+
+def show_version(n):
+    """Returns the output of 'show version' of router n"""
+    lines = ['show version',
+             'Cisco IOS Software, 2800 Software (C2800NM-SPSERVICESK9-M), Version 15.1(4)M7, RELEASE SOFTWARE (fc1)',
+             '',
+             'router-{} uptime is 1 year, 2 days, 27 minutes'.format(n),
+             '',
+             'Cisco 2821 (revision 53.51) with 514048K/10240K bytes of memory.',
+             'Processor board ID FCZ{:08d}'.format(n),
+             '2 Gigabit Ethernet interfaces',
+             '',
+             'router-{}'.format(n)]
+    return '\n'.join(lines) + '\n'
+
+
+def show_ip_interfaces_brief(n, interfaces=10, **kwargs):
+    """Returns the output of 'show ip interfaces brief' of router n"""
+    row = '{:<26} {:<15} YES NVRAM  {:<21} {}'
+    lines = ['show ip int brie',
+             'Interface                  IP-Address      OK? Method Status                Protocol',
+             row.format('GigabitEthernet0/0', 'unassigned', 'up', 'up')]
+    for i in range(interfaces):
+        lines.append(row.format('Gi0/0.{}'.format(100 + i), _ip(_lan_network(n, i, interfaces) + 2), 'up', 'up'))
+    lines += [row.format('GigabitEthernet0/1', 'unassigned', 'up', 'up'),
+              row.format('Gi0/1.101', _ip(_wan_network(n) + 2), 'up', 'up'),
+              row.format('GigabitEthernet0/2', 'unassigned', 'administratively down', 'down'),
+              row.format('Loopback1', loopback_ip(n), 'up', 'up'),
+              'router-{}'.format(n)]
+    return '\n'.join(lines) + '\n'
+
+
+def show_ip_bgp_sum(n, interfaces=10, bgp_neighbors=3, **kwargs):
+    """Returns the output of 'show ip bgp sum' of router n"""
+    row = '{:<15} 4 {:>12} {:>7} {:>7} {:>8}    0    0 {:<8} {}'
+    lines = ['show ip bgp sum',
+             'BGP router identifier {}, local AS number 64512'.format(loopback_ip(n)),
+             '',
+             'Neighbor        V           AS MsgRcvd MsgSent   TblVer  InQ OutQ Up/Down  State/PfxRcd',
+             row.format(_ip(_wan_network(n) + 1), 10001, 2266971, 1872799, 576999, '3y12w', 1620)]
+    for i in range(bgp_neighbors):
+        lines.append(row.format(_bgp_neighbor(n, i, interfaces), 64512, 0, 0, 1, 'never', 'Active'))
+    return '\n'.join(lines) + '\n'
+
+
+def write_telnet(path, routers=100, **kwargs):
+    """Writes the show command outputs of routers to the subdirectories of path.
+
+    The files are named by the Loopback1 address of the router, the keyword
+    arguments are the same as for write_configs."""
+    outputs = {'version': lambda n: show_version(n),
+               'int': lambda n: show_ip_interfaces_brief(n, **kwargs),
+               'bgp': lambda n: show_ip_bgp_sum(n, **kwargs)}
+    for sub_dir, output in outputs.items():
+        directory = os.path.join(path, sub_dir)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        for n in range(routers):
+            with open(os.path.join(directory, loopback_ip(n) + '.txt'), 'w') as fp:
+                fp.write(output(n))